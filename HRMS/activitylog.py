@@ -0,0 +1,88 @@
+# ============================ ACTIVITY LOG WRITER =========================
+"""
+Write-behind buffer for activity_log.
+
+log_activity() only appends to an in-memory buffer; a background thread
+flushes it in one transaction every `flush_interval` seconds or as soon as
+`max_batch` entries are waiting. The same transaction bumps the daily
+activity_rollups counters (day, user, kind), which outlive retention.
+
+Retention is not handled here: old rows move to the yearly archive
+partitions with attendance and notifications (see archive.py).
+"""
+import atexit
+import threading
+
+
+class ActivityLogWriter:
+
+    def __init__(self, connect, flush_interval=0.5, max_batch=200):
+        self.connect = connect
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        atexit.register(self.flush)
+
+    def add(self, user_name, action, task_id, timestamp, kind):
+        with self._lock:
+            self._buffer.append((user_name, action, task_id, timestamp, kind))
+            full = len(self._buffer) >= self.max_batch
+            if self._thread is None or not self._thread.is_alive():
+                # Started lazily so it is created after a pre-fork launcher forks
+                self._thread = threading.Thread(
+                    target=self._run, name="activity-log", daemon=True
+                )
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print("⚠️ Activity log flush error:", e)
+
+    def flush(self):
+        """
+        Write everything buffered so far. Readers call this first so a
+        request sees its own process's latest entries.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+
+            try:
+                with self.connect() as conn:
+                    conn.executemany("""
+                        INSERT INTO activity_log (user_name, action, task_id, timestamp, kind)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, batch)
+
+                    rollups = {}
+                    for user_name, _, _, ts, kind in batch:
+                        key = (ts[:10], user_name, kind or "other")
+                        rollups[key] = rollups.get(key, 0) + 1
+
+                    conn.executemany("""
+                        INSERT INTO activity_rollups (day, user_name, kind, count)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(day, user_name, kind)
+                        DO UPDATE SET count = count + excluded.count
+                    """, [(*key, n) for key, n in rollups.items()])
+                    conn.commit()
+            except Exception:
+                with self._lock:
+                    self._buffer[:0] = batch      # keep for the next attempt
+                raise
+
+            return len(batch)
@@ -1,39 +1,55 @@
 # ============================ IMPORTS & CONFIG ============================
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, request, jsonify, render_template, send_file
 import sqlite3
 import os
 from flask import session
 from datetime import datetime
 from datetime import timedelta
 from werkzeug.security import generate_password_hash,check_password_hash
+from werkzeug.security import safe_join
 from flask import redirect
 import math
 from datetime import time
+from time import monotonic
 from zoneinfo import ZoneInfo
 import csv
+import zipfile
+import zlib
+from xml.sax.saxutils import escape as xml_escape
 import json
-from io import StringIO
+import re
+from io import StringIO, TextIOWrapper
 from flask import Response
+from flask import g, has_app_context
+from flask.ctx import RequestContext
+import queue
+import base64
+from urllib.parse import urlencode
+import threading
+import hashlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from migrations import migrate
+import blobstore
+from thumbnails import ThumbnailPool, SIZES as THUMBNAIL_SIZES
+from activitylog import ActivityLogWriter
+from archive import PartitionArchiver, default_policies, read_through
+from geofence import GeofenceIndex, load_offices, parse_polygon
 # ====================== WHATSAPP UTILITY ======================
-import requests
+# Messages are not sent inline: handlers queue them in the outbox table
+# (see outbox.py) and the background dispatcher calls deliver_whatsapp().
+from outbox import OutboxDispatcher, DeliveryError, enqueue as enqueue_outbox
 
 WHATSAPP_TOKEN = os.environ.get("WHATSAPP_TOKEN")
 WHATSAPP_PHONE_ID = os.environ.get("WHATSAPP_PHONE_ID")
+WHATSAPP_API_URL = os.environ.get("WHATSAPP_API_URL", "https://graph.facebook.com/v19.0")
 
 
-def send_whatsapp_task_assigned(to_number, employee_name, task_title, due_date):
+def whatsapp_task_assigned_payload(to_number, employee_name, task_title, due_date):
     """
-    Sends WhatsApp 'task_assigned' template message.
-    Safe: will never crash task creation.
+    Build the WhatsApp 'task_assigned' template message.
     """
-
-    if not WHATSAPP_TOKEN or not WHATSAPP_PHONE_ID:
-        print("⚠️ WhatsApp credentials missing")
-        return False
-
-    url = f"https://graph.facebook.com/v19.0/{WHATSAPP_PHONE_ID}/messages"
-
-    payload = {
+    return {
         "messaging_product": "whatsapp",
         "to": to_number,
         "type": "template",
@@ -53,25 +69,29 @@ def send_whatsapp_task_assigned(to_number, employee_name, task_title, due_date):
         }
     }
 
+
+def deliver_whatsapp(http, to_number, payload):
+    """
+    Outbox sender for the 'whatsapp' channel. Raises DeliveryError on
+    failure; 429 and 5xx responses are retried, other errors are final.
+    """
+    if not WHATSAPP_TOKEN or not WHATSAPP_PHONE_ID:
+        raise DeliveryError("WhatsApp credentials missing", retryable=False)
+
+    url = f"{WHATSAPP_API_URL}/{WHATSAPP_PHONE_ID}/messages"
+
     headers = {
         "Authorization": f"Bearer {WHATSAPP_TOKEN}",
         "Content-Type": "application/json"
     }
 
-    try:
-        res = requests.post(url, json=payload, headers=headers, timeout=10)
-        data = res.json()
-
-        if res.status_code != 200:
-            print("❌ WhatsApp API error:", data)
-            return False
+    res = http.post(url, json=payload, headers=headers, timeout=10)
 
-        print("✅ WhatsApp sent to", to_number)
-        return True
+    if res.status_code != 200:
+        retryable = res.status_code == 429 or res.status_code >= 500
+        raise DeliveryError(f"WhatsApp API error {res.status_code}: {res.text[:300]}", retryable)
 
-    except Exception as e:
-        print("❌ WhatsApp exception:", e)
-        return False
+    print("✅ WhatsApp sent to", to_number)
 
 
 
@@ -94,13 +114,294 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# New uploads go to the content-addressed store (see blobstore.py);
+# UPLOAD_FOLDER itself still serves files uploaded before it existed.
+BLOB_ROOT = os.path.join(UPLOAD_FOLDER, "blobs")
+app.config['BLOB_ROOT'] = BLOB_ROOT
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
+# Thumbnails / previews are rendered off the request path (see thumbnails.py)
+thumbnail_pool = ThumbnailPool(
+    os.path.join(UPLOAD_FOLDER, "thumbs"),
+    workers=int(os.environ.get("THUMBNAIL_WORKERS", 2))
+)
+
+
+# Connections are pooled per process and handed out once per request via
+# Flask's `g`, so every helper called while handling a request (notifications,
+# activity log, approval side-effects) shares a single connection.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", 5000))
+
+DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped I/O
+    "PRAGMA temp_store=MEMORY",
+)
+
+_db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+
+def open_connection():
+    """
+    Open a new SQLite connection with the per-connection PRAGMAs applied.
+    Prefer get_db() / pooled_db(); this is for scripts and the pool itself.
+    """
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False
+    )
     conn.row_factory = sqlite3.Row
+    for pragma in DB_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
 
+def acquire_connection():
+    try:
+        return _db_pool.get_nowait()
+    except queue.Empty:
+        return open_connection()
+
+
+def release_connection(conn):
+    """
+    Return a connection to the pool. Uncommitted work is rolled back so the
+    next borrower never inherits a half-finished transaction. Connections
+    beyond the pool size are closed instead of kept.
+    """
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        _db_pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+    except sqlite3.Error:
+        conn.close()
+
+
+def close_pool():
+    """
+    Close every idle pooled connection. serve.py calls this before forking
+    workers: SQLite connections must not be carried across fork().
+    """
+    while True:
+        try:
+            _db_pool.get_nowait().close()
+        except queue.Empty:
+            return
+
+
+@contextmanager
+def pooled_db():
+    """
+    Borrow a pooled connection outside of a request (background jobs,
+    scripts). Inside a request use get_db().
+    """
+    conn = acquire_connection()
+    try:
+        yield conn
+    finally:
+        release_connection(conn)
+
+
+def get_db():
+    if not has_app_context():
+        # Outside a request there is no teardown to hand the connection
+        # back, so the caller owns (and must close) this one.
+        return open_connection()
+
+    if "db" not in g:
+        g.db = acquire_connection()
+    return g.db
+
+
+@app.teardown_appcontext
+def close_db(exc):
+    conn = g.pop("db", None)
+    if conn is not None:
+        release_connection(conn)
+
+
+# Bring the schema up to date before serving any request.
+with pooled_db() as _conn:
+    migrate(_conn)
+
+outbox_dispatcher = OutboxDispatcher(
+    pooled_db,
+    senders={"whatsapp": deliver_whatsapp},
+    max_attempts=int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 5)),
+    min_interval=float(os.environ.get("OUTBOX_MIN_INTERVAL", 1.0))
+)
+
+
+# ============================== PAGINATION ===============================
+# List endpoints are keyset-paginated, newest first. The cursor is an opaque
+# token carrying the sort-key values of the last row of the previous page,
+# so fetching page N costs the same as fetching page 1. Every sort is a raw
+# column (or indexed generated key, see migration 17) plus id, so a page is
+# an index range scan. X-Total-Count is opt-in (?count=1).
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def page_args():
+    """
+    Read ?limit= and ?cursor= from the query string.
+    Returns (limit, cursor_values, error_response).
+    """
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    token = request.args.get("cursor")
+    if not token:
+        return limit, None, None
+
+    cursor = decode_cursor(token)
+    if cursor is None:
+        return limit, None, (jsonify({"status": "error", "message": "Invalid cursor"}), 400)
+    return limit, cursor, None
+
+
+def fts_query(q):
+    """
+    FTS5 MATCH expression for free text typed by a user: every word must
+    match, as a prefix ("inv rep" finds "invoice report"). None when `q`
+    has no words.
+    """
+    words = re.findall(r"\w+", q or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def list_filters(where, params, status=None, employee=None, date=None, text=(), search=None):
+    """
+    Translate the shared list filters into SQL conditions. Each keyword is
+    the column the filter applies to on this endpoint:
+
+        ?status=    exact match (case-insensitive)
+        ?employee=  employee id
+        ?from= / ?to=   inclusive date range (YYYY-MM-DD)
+        ?q=         free-text search: through the full-text indexes in
+                    `search` ({fts table: id column}) when given, otherwise
+                    LIKE over the `text` columns
+    """
+    args = request.args
+
+    if status and args.get("status"):
+        where.append(f"{status} = ? COLLATE NOCASE")
+        params.append(args["status"])
+
+    if employee and args.get("employee"):
+        where.append(f"{employee} = ?")
+        params.append(args.get("employee", type=int))
+
+    if date and args.get("from"):
+        where.append(f"{date} >= ?")
+        params.append(args["from"])
+
+    if date and args.get("to"):
+        where.append(f"{date} < date(?, '+1 day')")
+        params.append(args["to"])
+
+    q = (args.get("q") or "").strip()
+    match = fts_query(q) if search and q else None
+    if match:
+        where.append("(" + " OR ".join(
+            f"{col} IN (SELECT rowid FROM {fts} WHERE {fts} MATCH ?)"
+            for fts, col in search.items()
+        ) + ")")
+        params.extend([match] * len(search))
+    elif text and q:
+        where.append("(" + " OR ".join(f"{col} LIKE ?" for col in text) + ")")
+        params.extend([f"%{q}%"] * len(text))
+
+
+def keyset_page(cur, select_sql, where, params, sort, limit, cursor):
+    """
+    Run one page of `select_sql` (a SELECT ... FROM ... [JOIN ...] with no
+    WHERE / ORDER BY) ordered by the `sort` expressions DESC. The last sort
+    expression must be unique (an id) so the ordering is total.
+
+    Returns (rows, total, next_cursor). Counting walks the whole filtered
+    set, so `total` is only computed for a first page (no cursor) that asked
+    for it with ?count=1; otherwise it is None and no count header is sent.
+    """
+    where = list(where)
+    params = list(params)
+
+    total = None
+    if cursor is None:
+        if request.args.get("count") == "1":
+            where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+            cur.execute(f"SELECT COUNT(*) FROM ({select_sql} {where_sql})", params)
+            total = cur.fetchone()[0]
+    elif len(cursor) != len(sort):
+        cursor = None
+    else:
+        where.append(
+            f"({', '.join(sort)}) < ({', '.join('?' for _ in sort)})"
+        )
+        params.extend(cursor)
+
+    keys = ", ".join(f"{expr} AS _k{i}" for i, expr in enumerate(sort))
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    order_sql = ", ".join(f"{expr} DESC" for expr in sort)
+
+    keyed_sql = select_sql.replace("SELECT", f"SELECT {keys},", 1)
+    cur.execute(
+        f"{keyed_sql} {where_sql} ORDER BY {order_sql} LIMIT ?",
+        params + [limit + 1]
+    )
+    fetched = cur.fetchall()
+
+    rows = []
+    for row in fetched[:limit]:
+        item = dict(row)
+        for i in range(len(sort)):
+            item.pop(f"_k{i}")
+        rows.append(item)
+
+    next_cursor = None
+    if len(fetched) > limit:
+        last = fetched[limit - 1]
+        next_cursor = encode_cursor([last[f"_k{i}"] for i in range(len(sort))])
+
+    return rows, total, next_cursor
+
+
+def paginated(response, total, next_cursor):
+    """
+    Attach X-Total-Count / X-Next-Cursor / Link headers to a list response.
+    """
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+    if next_cursor:
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
+
+
 # ============================ AUTHENTICATION ==============================
 @app.route('/')
 def home():
@@ -171,6 +472,105 @@ def employee_dashboard():
         return redirect("/")
     return render_template("employee-dashboard.html")
 
+# =============================== BOOTSTRAP ================================
+# First paint of a dashboard needs a dozen GETs. /employee/bootstrap and
+# /admin/bootstrap run them in one request: each section is dispatched to
+# its normal view in a nested request context that shares this request's
+# app context (so the same pooled connection in g.db) and its already
+# decoded session. ?sections=a,b picks sections (default: all).
+EMPLOYEE_BOOTSTRAP = {
+    "sync": "/sync",                # first: its seq must predate the lists
+    "tasks": "/employee/tasks?limit=500",
+    "notifications": "/employee/notifications",
+    "has_new": "/employee/has-new",
+    "today_attendance": "/employee/today-attendance",
+    "attendance": "/employee/attendance?limit=500",
+    "recent_activity": "/employee/recent-activity",
+    "admins": "/employee/admins",
+    "approvals": "/employee/approvals",
+    "leaves": "/employee/approvals?type=leave",
+    "top_performers": "/employee/top-performers",
+    "profile": "/employee/profile"
+}
+
+ADMIN_BOOTSTRAP = {
+    "employees": "/admin/employees",
+    "tasks": "/admin/all-tasks",
+    "task_summary": "/admin/tasks/summary",
+    "approvals": "/admin/approvals?status=Pending",
+    "attendance": "/admin/attendance",
+    "activity": "/admin/activity",
+    "files": "/files",
+    "announcements": "/announcements"
+}
+
+# Headers a section response passes on to the client
+BOOTSTRAP_HEADERS = ("X-Next-Cursor", "X-Total-Count")
+
+# Outer request state that must not leak into the sections
+BOOTSTRAP_SKIP_ENVIRON = {
+    "werkzeug.request", "HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE",
+    "HTTP_RANGE", "CONTENT_TYPE", "CONTENT_LENGTH"
+}
+
+
+def run_section(url):
+    """
+    GET `url` through the app inside the current request. Returns
+    (metadata dict, JSON body text).
+    """
+    path, _, query = url.partition("?")
+    environ = {k: v for k, v in request.environ.items() if k not in BOOTSTRAP_SKIP_ENVIRON}
+    environ.update(PATH_INFO=path, QUERY_STRING=query, REQUEST_METHOD="GET")
+
+    ctx = RequestContext(app, environ, session=session._get_current_object())
+    try:
+        with ctx:
+            response = app.full_dispatch_request()
+    except Exception as e:
+        print("⚠️ Bootstrap section failed:", url, e)
+        return {"url": url, "status": 500, "headers": {}}, "null"
+
+    meta = {
+        "url": url,
+        "status": response.status_code,
+        "headers": {h: response.headers[h] for h in BOOTSTRAP_HEADERS if h in response.headers}
+    }
+    body = response.get_data(as_text=True) if response.is_json else "null"
+    return meta, body or "null"
+
+
+def bootstrap_response(sections):
+    names = [n for n in request.args.get("sections", ",".join(sections)).split(",") if n]
+    unknown = [n for n in names if n not in sections]
+    if unknown:
+        return jsonify({"status": "error", "message": f"Unknown section: {unknown[0]}"}), 400
+
+    # Section bodies are already JSON; splice them in rather than re-encode
+    chunks = []
+    for name in names:
+        meta, body = run_section(sections[name])
+        chunks.append(f'{json.dumps(name)}:{{{json.dumps(meta)[1:-1]},"data":{body}}}')
+
+    response = Response("{" + ",".join(chunks) + "}", mimetype="application/json")
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@app.route("/employee/bootstrap")
+def employee_bootstrap():
+    if session.get("role") != "employee":
+        return jsonify({"status": "forbidden"}), 403
+    return bootstrap_response(EMPLOYEE_BOOTSTRAP)
+
+
+@app.route("/admin/bootstrap")
+def admin_bootstrap():
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+    return bootstrap_response(ADMIN_BOOTSTRAP)
+
+
 # ============================ ADMIN: USERS ================================
 @app.route('/admin/register-employee', methods=['POST'])
 def register_employee():
@@ -192,14 +592,22 @@ def register_employee():
     if cur.fetchone():
         return jsonify({"status": "error", "message": "Email already exists."})
 
+    # New employees start past every existing broadcast, the same way they
+    # never received per-user notifications sent before they joined.
     cur.execute("""
-        INSERT INTO users (name, email, password, role)
-        VALUES (?, ?, ?, ?)
+        INSERT INTO users (name, email, password, role, broadcast_read_upto, broadcast_cleared_upto)
+        VALUES (
+            ?, ?, ?, ?,
+            (SELECT COALESCE(MAX(id), 0) FROM broadcast_notifications),
+            (SELECT COALESCE(MAX(id), 0) FROM broadcast_notifications)
+        )
     """, (name, email, hashed_password, role))
 
     conn.commit()
+    invalidate_task_caches()
+    refresh_users_cache(cur)
 
-    log_activity("Admin", f"Added employee '{name}'")
+    log_activity("Admin", f"Added employee '{name}'", kind="employee_added")
 
     return jsonify({"status": "success", "message": f"Employee {name} registered."})
 
@@ -232,61 +640,303 @@ def create_task():
     cur = conn.cursor()
 
     # Optional: check if employee exists
-    cur.execute("SELECT * FROM users WHERE id=? AND role='employee'", (assigned_to,))
-    if not cur.fetchone():
+    if str(assigned_to) not in {str(e["id"]) for e in cached_employees()}:
         return jsonify({"status": "error", "message": "Employee not found."})
 
-    ts = now_ist().strftime("%Y-%m-%d %H:%M:%S")
+    task = {
+        "title": title,
+        "description": description,
+        "assigned_to": assigned_to,
+        "due_date": due_date
+    }
+    task_ids = insert_tasks(cur, [task])
+    conn.commit()
+    after_tasks_assigned([task], task_ids)
 
-    cur.execute(
-        """
-        INSERT INTO tasks (
-            title,
-            description,
-            assigned_to,
-            due_date,
-            created_at,
-            updated_at
+    log_activity("Admin", f"Created task '{title}'", task_ids[0], kind="task_created")
+
+    return jsonify({"status": "success", "message": "Task assigned successfully."})
+
+
+# Shared by create_task and the bulk endpoints: everything a new task needs
+# (row, unread counter, notification, queued WhatsApp message) is written in
+# the caller's transaction; after_tasks_assigned() runs once it commits.
+BULK_TASK_LIMIT = 1000
+TASK_STATUSES = ["Pending", "In Progress", "Completed"]
+
+
+def insert_tasks(cur, tasks):
+    """
+    Insert tasks (dicts with title, description, assigned_to, due_date)
+    with their notifications and WhatsApp outbox rows. Does not commit.
+    Returns the new task ids.
+    """
+    ts = now_ist().strftime("%Y-%m-%d %H:%M:%S")
+    task_ids = []
+
+    for task in tasks:
+        cur.execute(
+            """
+            INSERT INTO tasks (
+                title,
+                description,
+                assigned_to,
+                due_date,
+                created_at,
+                updated_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (task["title"], task["description"], task["assigned_to"], task["due_date"], ts, ts)
         )
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (title, description, assigned_to, due_date, ts, ts)
-    )
+        task_ids.append(cur.lastrowid)
 
-    conn.commit()
+    bump_counters(cur, "tasks", user_ids=[task["assigned_to"] for task in tasks])
 
-    create_notification(
-        user_id=assigned_to,
-        title="New task assigned",
-        message=f"{title} (Due: {due_date})",
+    insert_notifications(
+        cur,
+        [
+            (task["assigned_to"], "New task assigned", f"{task['title']} (Due: {task['due_date']})", task_id)
+            for task, task_id in zip(tasks, task_ids)
+        ],
         notif_type="task",
         actor="Admin",
-        ref_type="task",
-        ref_id=cur.lastrowid
+        ref_type="task"
     )
 
-    log_activity("Admin", f"Created task '{title}'", cur.lastrowid)
-
     # ================= WHATSAPP NOTIFICATION =================
-    try:
-        cur.execute("""
-            SELECT name, whatsapp, whatsapp_opt_in
-            FROM users
-            WHERE id = ?
-        """, (assigned_to,))
-        emp = cur.fetchone()
-
-        if emp and emp["whatsapp_opt_in"] == 1 and emp["whatsapp"]:
-            send_whatsapp_task_assigned(
-                to_number=emp["whatsapp"],
-                employee_name=emp["name"],
-                task_title=title,
-                due_date=due_date or "Not specified"
+    # Queued only; the outbox dispatcher delivers it in the background.
+    assignees = sorted({int(task["assigned_to"]) for task in tasks})
+    cur.execute(f"""
+        SELECT id, name, whatsapp
+        FROM users
+        WHERE id IN ({",".join("?" * len(assignees))})
+          AND whatsapp_opt_in = 1
+          AND whatsapp IS NOT NULL AND whatsapp != ''
+    """, assignees)
+    opted_in = {row["id"]: row for row in cur.fetchall()}
+
+    for task, task_id in zip(tasks, task_ids):
+        emp = opted_in.get(int(task["assigned_to"]))
+        if emp:
+            enqueue_outbox(
+                cur,
+                channel="whatsapp",
+                recipient=emp["whatsapp"],
+                payload=whatsapp_task_assigned_payload(
+                    to_number=emp["whatsapp"],
+                    employee_name=emp["name"],
+                    task_title=task["title"],
+                    due_date=task["due_date"] or "Not specified"
+                ),
+                ref_type="task",
+                ref_id=task_id
             )
-    except Exception as e:
-        print("⚠️ WhatsApp notification skipped:", e)
 
-    return jsonify({"status": "success", "message": "Task assigned successfully."})
+    return task_ids
+
+
+def after_tasks_assigned(tasks, task_ids):
+    """
+    Post-commit side effects: cache invalidation, one live event per
+    assignee, and a single wake-up for the outbox dispatcher.
+    """
+    invalidate_task_caches()
+
+    per_user = {}
+    for task in tasks:
+        per_user.setdefault(int(task["assigned_to"]), []).append(task)
+
+    for user_id, user_tasks in per_user.items():
+        if len(user_tasks) == 1:
+            task = user_tasks[0]
+            message = f"{task['title']} (Due: {task['due_date']})"
+        else:
+            message = f"{len(user_tasks)} new tasks"
+        publish_notification("task", "New task assigned", message, "Admin", user_ids=[user_id])
+
+    outbox_dispatcher.start()
+    outbox_dispatcher.wake()
+
+
+def employee_ids():
+    return {e["id"] for e in cached_employees()}
+
+
+@app.route('/admin/tasks/bulk-assign', methods=['POST'])
+def bulk_assign_task():
+    """
+    One task for many employees: {title, description, due_date,
+    assigned_to: [ids] | "all"}. One transaction for the whole batch.
+    """
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+    data = request.get_json() or {}
+
+    if not data.get("title"):
+        return jsonify({"status": "error", "message": "Title is required."}), 400
+    if data.get("due_date") and not valid_date(data["due_date"]):
+        return jsonify({"status": "error", "message": "due_date must be YYYY-MM-DD"}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+    employees = employee_ids()
+
+    assigned_to = data.get("assigned_to")
+    if assigned_to == "all":
+        targets = sorted(employees)
+    elif isinstance(assigned_to, list):
+        try:
+            targets = list(dict.fromkeys(int(u) for u in assigned_to))
+        except (TypeError, ValueError):
+            return jsonify({"status": "error", "message": "assigned_to must be a list of ids"}), 400
+    else:
+        return jsonify({"status": "error", "message": "assigned_to must be a list of ids or 'all'"}), 400
+
+    unknown = [u for u in targets if u not in employees]
+    if unknown:
+        return jsonify({"status": "error", "message": "Employee not found.", "ids": unknown}), 400
+    if not targets or len(targets) > BULK_TASK_LIMIT:
+        return jsonify({"status": "error", "message": f"Assign to 1-{BULK_TASK_LIMIT} employees"}), 400
+
+    tasks = [
+        {
+            "title": data["title"],
+            "description": data.get("description"),
+            "assigned_to": user_id,
+            "due_date": data.get("due_date")
+        }
+        for user_id in targets
+    ]
+    task_ids = insert_tasks(cur, tasks)
+    conn.commit()
+    after_tasks_assigned(tasks, task_ids)
+
+    log_activity("Admin", f"Assigned task '{data['title']}' to {len(tasks)} employees", kind="task_created")
+
+    return jsonify({"status": "success", "created": len(task_ids), "task_ids": task_ids})
+
+
+@app.route('/admin/tasks/import', methods=['POST'])
+def import_tasks():
+    """
+    Create tasks from an uploaded CSV (field "file", columns title,
+    description, assigned_to, due_date; assigned_to is an employee id or
+    email) or JSON {"tasks": [...]}. All rows are validated first; nothing
+    is written unless every row is valid.
+    """
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+
+    if "file" in request.files:
+        stream = TextIOWrapper(request.files["file"].stream, encoding="utf-8-sig")
+        rows = list(csv.DictReader(stream))
+        first_line = 2          # header is line 1
+    else:
+        rows = (request.get_json(silent=True) or {}).get("tasks") or []
+        first_line = 1
+
+    if not rows or len(rows) > BULK_TASK_LIMIT:
+        return jsonify({"status": "error", "message": f"Provide 1-{BULK_TASK_LIMIT} tasks"}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+    by_id, by_email = {}, {}
+    for employee in cached_employees():
+        by_id[str(employee["id"])] = employee["id"]
+        by_email[(employee["email"] or "").lower()] = employee["id"]
+
+    tasks, errors = [], []
+    for line, row in enumerate(rows, start=first_line):
+        row = {k.strip().lower(): (str(v).strip() if v is not None else "") for k, v in row.items() if k}
+        assignee = row.get("assigned_to", "")
+        user_id = by_id.get(assignee) or by_email.get(assignee.lower())
+
+        if not row.get("title"):
+            errors.append({"line": line, "message": "Title is required."})
+        elif user_id is None:
+            errors.append({"line": line, "message": f"Employee not found: {assignee}"})
+        elif row.get("due_date") and not valid_date(row["due_date"]):
+            errors.append({"line": line, "message": "due_date must be YYYY-MM-DD"})
+        else:
+            tasks.append({
+                "title": row["title"],
+                "description": row.get("description") or None,
+                "assigned_to": user_id,
+                "due_date": row.get("due_date") or None
+            })
+
+    if errors:
+        return jsonify({"status": "error", "message": "No tasks imported.", "errors": errors}), 400
+
+    task_ids = insert_tasks(cur, tasks)
+    conn.commit()
+    after_tasks_assigned(tasks, task_ids)
+
+    log_activity("Admin", f"Imported {len(tasks)} tasks", kind="task_created")
+
+    return jsonify({"status": "success", "created": len(task_ids), "task_ids": task_ids})
+
+
+@app.route('/admin/tasks/bulk-update', methods=['POST'])
+def bulk_update_tasks():
+    """
+    {task_ids: [...], status?, due_date?}: set the given fields on every
+    listed task in one UPDATE. Ids that match no task come back in
+    "missing".
+    """
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+    data = request.get_json() or {}
+
+    try:
+        task_ids = list(dict.fromkeys(int(t) for t in data.get("task_ids") or []))
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "task_ids must be a list of ids"}), 400
+    if not task_ids or len(task_ids) > BULK_TASK_LIMIT:
+        return jsonify({"status": "error", "message": f"Provide 1-{BULK_TASK_LIMIT} task ids"}), 400
+
+    changes = {k: data[k] for k in ("status", "due_date") if data.get(k)}
+    if not changes:
+        return jsonify({"status": "error", "message": "Nothing to update"}), 400
+    if "status" in changes and changes["status"] not in TASK_STATUSES:
+        return jsonify({"status": "error", "message": f"status must be one of {', '.join(TASK_STATUSES)}"}), 400
+    if "due_date" in changes and not valid_date(changes["due_date"]):
+        return jsonify({"status": "error", "message": "due_date must be YYYY-MM-DD"}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+    placeholders = ",".join("?" * len(task_ids))
+
+    cur.execute(f"SELECT id FROM tasks WHERE id IN ({placeholders})", task_ids)
+    found = {row["id"] for row in cur.fetchall()}
+    missing = [t for t in task_ids if t not in found]
+    if not found:
+        return jsonify({"status": "error", "message": "No such tasks", "missing": missing}), 404
+
+    cur.execute(f"""
+        UPDATE tasks
+        SET {", ".join(f"{k} = ?" for k in changes)},
+            updated_at = ?, updated_by_role = 'admin'
+        WHERE id IN ({placeholders})
+    """, (*changes.values(), now_ist().strftime("%Y-%m-%d %H:%M:%S"), *task_ids))
+    updated = cur.rowcount
+
+    cur.execute(f"""
+        SELECT DISTINCT assigned_to FROM tasks
+        WHERE id IN ({placeholders}) AND assigned_to IS NOT NULL
+    """, task_ids)
+    assignees = [row["assigned_to"] for row in cur.fetchall()]
+    bump_counters(cur, "tasks", user_ids=assignees)
+    conn.commit()
+    invalidate_task_caches()
+
+    if assignees:
+        event_broker.publish("sections", {"sections": {"tasks": True}}, user_ids=assignees)
+
+    log_activity("Admin", f"Bulk-updated {updated} tasks", kind="task_updated")
+
+    return jsonify({"status": "success", "updated": updated, "missing": missing})
 
 
 # ========================= ADMIN: ANNOUNCEMENTS ===========================
@@ -303,21 +953,18 @@ def create_announcement():
     cur = conn.cursor()
     cur.execute("INSERT INTO announcements (title, message, created_at) VALUES (?, ?, ?)",
                 (title, message, created_at))
+    bump_counters(cur, "announcements", role="employee")
     conn.commit()
 
-    cur.execute("SELECT id FROM users WHERE role='employee'")
-    emps = cur.fetchall()
-
-    for e in emps:
-        create_notification(
-            user_id=e["id"],
-            title="New announcement",
-            message=title,
-            notif_type="announcement",
-            actor="Admin"
-        )
+    notify_role(
+        "employee",
+        title="New announcement",
+        message=title,
+        notif_type="announcement",
+        actor="Admin"
+    )
 
-    log_activity("Admin", f"Posted announcement '{title}'")
+    log_activity("Admin", f"Posted announcement '{title}'", kind="announcement_posted")
 
     return jsonify({"status": "success", "message": "Announcement posted."})
 
@@ -334,14 +981,20 @@ def upload_file():
     if file.filename == '':
         return jsonify({"status":"error", "message":"No selected file"})
 
-    filename = secure_filename(file.filename)
-    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-
     admin_id = session.get("user_id")
 
-    # Save metadata in DB
     conn = get_db()
     cur = conn.cursor()
+
+    filename, sha256, size = blobstore.store_upload(
+        cur,
+        app.config['BLOB_ROOT'],
+        file,
+        secure_filename(file.filename) or "upload",
+        legacy_dir=app.config['UPLOAD_FOLDER']
+    )
+
+    # Save metadata in DB
     uploaded_at = now_ist().strftime("%Y-%m-%d %H:%M:%S")
     shared_with_raw = request.form.get("shared_with", "all")
     if shared_with_raw != "all":
@@ -352,21 +1005,30 @@ def upload_file():
     file_type = request.form.get("file_type", "general")
 
     cur.execute("""
-        INSERT INTO files (filename, uploaded_by, uploaded_at, shared_with, file_type)
-        VALUES (?, ?, ?, ?, ?)
-    """, (filename, admin_id, uploaded_at, shared_with, file_type))
+        INSERT INTO files (filename, uploaded_by, uploaded_at, shared_with, file_type, sha256, size)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (filename, admin_id, uploaded_at, shared_with, file_type, sha256, size))
+
+    if shared_with == "all":
+        bump_counters(cur, "files", role="employee")
+    else:
+        bump_counters(cur, "files", user_ids=[shared_with])
 
     conn.commit()
+    thumbnail_pool.submit(blobstore.blob_path(app.config['BLOB_ROOT'], sha256), sha256)
 
     if shared_with == "all":
-        cur.execute("SELECT id FROM users WHERE role='employee'")
-        targets = cur.fetchall()
+        notify_role(
+            "employee",
+            title="File shared",
+            message=filename,
+            notif_type="file",
+            actor="Admin",
+            ref_type="file"
+        )
     else:
-        targets = [{"id": int(shared_with)}]
-
-    for t in targets:
         create_notification(
-            user_id=t["id"],
+            user_id=int(shared_with),
             title="File shared",
             message=filename,
             notif_type="file",
@@ -374,7 +1036,7 @@ def upload_file():
             ref_type="file"
         )
 
-    log_activity("Admin", f"Uploaded file '{filename}'")
+    log_activity("Admin", f"Uploaded file '{filename}'", kind="file_uploaded")
 
     return jsonify({"status":"success", "message":"File uploaded successfully"})
 
@@ -412,6 +1074,17 @@ def admin_approval_action():
     if not approval:
         return jsonify({"status": "error", "message": "Approval not found"}), 404
 
+    if approval["type"] == "reimbursement":
+        posting = payroll_posting(cur, "reimbursement", approval_id)
+        month = posting["month"] if posting else now_ist().strftime("%Y-%m")
+        if payroll_month_closed(cur, month):
+            return jsonify({"status": "error", "message": f"Payroll for {month} is closed"}), 409
+        amount = reimbursement_amount(json.loads(approval["payload"]))
+        if action == "approve" and amount is None:
+            return jsonify({"status": "error", "message": "Reimbursement has no valid amount"}), 400
+        if action == "reject":
+            unpost_payroll(cur, "reimbursement", approval_id)
+
     # ✅ DECISION (ONLY THIS)
     cur.execute("""
         UPDATE approvals
@@ -430,9 +1103,21 @@ def admin_approval_action():
     ))
 
     # ✅ APPLY EFFECTS ONLY IF APPROVED
+    if action == "approve" and approval["type"] == "reimbursement":
+        # Posted here rather than in apply_approval_effects (which swallows
+        # errors): the ledger must never disagree with the approval
+        try:
+            post_payroll(cur, "reimbursement", approval_id, approval["employee_id"],
+                         month, "reimbursement", amount)
+        except (sqlite3.Error, ValueError) as e:
+            conn.rollback()
+            print("⚠️ Payroll posting failed:", e)
+            return jsonify({"status": "error", "message": "Could not post to payroll"}), 500
+
     if action == "approve":
         apply_approval_effects(approval)
 
+    bump_counters(cur, "approvals", user_ids=[approval["employee_id"]])
     conn.commit()
 
     create_notification(
@@ -447,7 +1132,8 @@ def admin_approval_action():
 
     log_activity(
         "Admin",
-        f"{new_status} {approval['employee_name']}'s approval"
+        f"{new_status} {approval['employee_name']}'s approval",
+        kind="approval_decided"
     )
 
     return jsonify({"status": "success"})
@@ -465,13 +1151,16 @@ def apply_approval_effects(approval_row):
         elif approval_row["type"] == "leave":
             apply_leave(approval_row)
 
-        elif approval_row["type"] == "reimbursement":
-            apply_reimbursement(approval_row)
-
     except Exception as e:
         print("⚠️ Approval side-effect failed:", e)
 
 
+# Announcements and "shared with all" files reach every employee. With
+# broadcasts enabled they are stored once in broadcast_notifications;
+# otherwise one row per employee is written in a single executemany.
+app.config.setdefault("NOTIFICATION_BROADCASTS", True)
+
+
 def create_notification(
     user_id,
     title,
@@ -481,25 +1170,351 @@ def create_notification(
     ref_type=None,
     ref_id=None
 ):
-    conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("""
-        INSERT INTO notifications
-        (user_id, actor_name, type, title, message, reference_type, reference_id, is_read, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
-    """, (
-        user_id,
-        actor,
-        notif_type,
+    create_notifications(
+        [user_id],
         title,
         message,
-        ref_type,
-        ref_id,
-        now_ts()
-    ))
-
-    conn.commit()
+        notif_type,
+        actor=actor,
+        ref_type=ref_type,
+        ref_id=ref_id
+    )
+
+
+def create_notifications(
+    user_ids,
+    title,
+    message,
+    notif_type,
+    actor="System",
+    ref_type=None,
+    ref_id=None
+):
+    """
+    Insert the same notification for many users with one executemany and
+    one commit.
+    """
+    conn = get_db()
+    insert_notifications(
+        conn.cursor(),
+        [(user_id, title, message, ref_id) for user_id in user_ids],
+        notif_type,
+        actor,
+        ref_type
+    )
+    conn.commit()
+
+    publish_notification(notif_type, title, message, actor, user_ids=user_ids)
+
+
+def insert_notifications(cur, rows, notif_type, actor="System", ref_type=None):
+    """
+    executemany for (user_id, title, message, ref_id) rows, inside the
+    caller's transaction (no commit, no live event).
+    """
+    ts = now_ts()
+    cur.executemany("""
+        INSERT INTO notifications
+        (user_id, actor_name, type, title, message, reference_type, reference_id, is_read, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
+    """, [
+        (
+            user_id,
+            actor,
+            notif_type,
+            title,
+            message,
+            ref_type,
+            ref_id,
+            ts
+        )
+        for user_id, title, message, ref_id in rows
+    ])
+
+
+def notify_role(
+    role,
+    title,
+    message,
+    notif_type,
+    actor="System",
+    ref_type=None,
+    ref_id=None
+):
+    """
+    Notify every user with `role`: a single broadcast row, or a bulk
+    fan-out when NOTIFICATION_BROADCASTS is off.
+    """
+    conn = get_db()
+    cur = conn.cursor()
+
+    if not app.config["NOTIFICATION_BROADCASTS"]:
+        cur.execute("SELECT id FROM users WHERE role = ?", (role,))
+        create_notifications(
+            [r["id"] for r in cur.fetchall()],
+            title,
+            message,
+            notif_type,
+            actor=actor,
+            ref_type=ref_type,
+            ref_id=ref_id
+        )
+        return
+
+    cur.execute("""
+        INSERT INTO broadcast_notifications
+        (audience, actor_name, type, title, message, reference_type, reference_id, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        role,
+        actor,
+        notif_type,
+        title,
+        message,
+        ref_type,
+        ref_id,
+        now_ts()
+    ))
+
+    conn.commit()
+
+    publish_notification(notif_type, title, message, actor, role=role)
+
+
+# ============================ LIVE EVENTS (SSE) ===========================
+# In-process pub/sub behind the /events Server-Sent Events stream. Write
+# paths publish small deltas (notification payload + which dashboard
+# sections have something new) to the affected users' open streams, so idle
+# dashboards cost no queries. Subscribers live in this process only; a
+# client that reconnects gets a fresh snapshot.
+SSE_KEEPALIVE_SECONDS = 15
+SSE_QUEUE_SIZE = 100
+
+NOTIFICATION_SECTIONS = {
+    "task": "tasks",
+    "announcement": "announcements",
+    "file": "files",
+    "approval": "approvals"
+}
+
+
+class EventBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}      # user_id -> {queue: role}
+        self.relay = None           # EventRelay when running several workers
+
+    def subscribe(self, user_id, role, q=None):
+        """
+        Register a subscriber queue. Anything with put_nowait() that raises
+        queue.Full works (asgi.py passes an asyncio bridge).
+        """
+        if q is None:
+            q = queue.Queue(maxsize=SSE_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, {})[q] = role
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            queues = self._subscribers.get(user_id, {})
+            queues.pop(q, None)
+            if not queues:
+                self._subscribers.pop(user_id, None)
+
+    def _targets(self, user_ids=None, role=None):
+        with self._lock:
+            if user_ids is not None:
+                wanted = {int(u) for u in user_ids}
+                return [
+                    q for uid, queues in self._subscribers.items()
+                    if uid in wanted
+                    for q in queues
+                ]
+            return [
+                q for queues in self._subscribers.values()
+                for q, r in queues.items()
+                if r == role
+            ]
+
+    def publish(self, event, data, user_ids=None, role=None):
+        if self.relay is not None:
+            self.relay.publish(event, data, user_ids, role)
+        else:
+            self.deliver(event, data, user_ids, role)
+
+    def deliver(self, event, data, user_ids=None, role=None):
+        """
+        Hand an event to this process's subscribers.
+        """
+        message = (event, data)
+        for q in self._targets(user_ids, role):
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                pass    # slow client; it resyncs from the snapshot on reconnect
+
+
+event_broker = EventBroker()
+
+
+EVENT_RELAY_POLL_SECONDS = 1.0
+EVENT_RELAY_RETENTION_SECONDS = 300
+
+
+class EventRelay:
+    """
+    Cross-process fan-out for EventBroker. With several worker processes a
+    write handled by one worker must reach /events streams held by the
+    others, so events go through the event_relay table and every worker
+    polls it (one indexed query per second) and delivers locally.
+    """
+    def __init__(self, broker, connect, poll_interval=EVENT_RELAY_POLL_SECONDS):
+        self.broker = broker
+        self.connect = connect
+        self.poll_interval = poll_interval
+        self._last_id = None
+        self._stop = threading.Event()
+        self._thread = None
+        # Extra per-poll checks, called with the relay's connection
+        self.pollers = []
+
+    def publish(self, event, data, user_ids=None, role=None):
+        with self.connect() as conn:
+            conn.execute("""
+                INSERT INTO event_relay (event, data, user_ids, role, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (
+                event,
+                json.dumps(data),
+                json.dumps([int(u) for u in user_ids]) if user_ids is not None else None,
+                role,
+                now_ist().timestamp()
+            ))
+            conn.commit()
+
+    def start(self):
+        with self.connect() as conn:
+            self._last_id = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM event_relay"
+            ).fetchone()[0]
+
+        self.broker.relay = self
+        self._thread = threading.Thread(target=self._run, name="event-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.broker.relay = None
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print("⚠️ Event relay error:", e)
+
+    def run_once(self):
+        with self.connect() as conn:
+            rows = conn.execute("""
+                SELECT id, event, data, user_ids, role
+                FROM event_relay
+                WHERE id > ?
+                ORDER BY id
+            """, (self._last_id,)).fetchall()
+
+            for row in rows:
+                self._last_id = row["id"]
+                user_ids = json.loads(row["user_ids"]) if row["user_ids"] else None
+                self.broker.deliver(row["event"], json.loads(row["data"]), user_ids, row["role"])
+
+            for poll in self.pollers:
+                poll(conn)
+
+            # Any worker may trim; events only need to outlive one poll
+            conn.execute(
+                "DELETE FROM event_relay WHERE created_at < ?",
+                (now_ist().timestamp() - EVENT_RELAY_RETENTION_SECONDS,)
+            )
+            conn.commit()
+
+
+# Started by serve.py in each worker; single-process servers deliver directly
+event_relay = EventRelay(event_broker, pooled_db)
+
+
+def publish_notification(notif_type, title, message, actor, user_ids=None, role=None):
+    section = NOTIFICATION_SECTIONS.get(notif_type)
+    event_broker.publish("notification", {
+        "notification": {
+            "type": notif_type,
+            "title": title,
+            "message": message,
+            "actor_name": actor,
+            "created_at": now_ts()
+        },
+        "unread_delta": 1,
+        "sections": {section: True} if section else {}
+    }, user_ids=user_ids, role=role)
+
+
+def unread_notification_count(cur, user_id):
+    cur.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM notifications
+             WHERE user_id = u.id AND archived = 0 AND is_read = 0)
+          + (SELECT COUNT(*) FROM broadcast_notifications
+             WHERE audience = u.role
+               AND id > MAX(COALESCE(u.broadcast_read_upto, 0), COALESCE(u.broadcast_cleared_upto, 0)))
+        FROM users u
+        WHERE u.id = ?
+    """, (user_id,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def events_snapshot(cur, user_id, role):
+    snapshot = {"unread": unread_notification_count(cur, user_id)}
+    if role == "employee":
+        snapshot["sections"] = compute_has_new(cur, user_id)
+    return snapshot
+
+
+def sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route("/events")
+def events():
+    user_id = session.get("user_id")
+    role = session.get("role")
+
+    if not user_id:
+        return jsonify({"status": "forbidden"}), 403
+
+    # Snapshot first so the client starts from the current state
+    snapshot = events_snapshot(get_db().cursor(), user_id, role)
+
+    q = event_broker.subscribe(user_id, role)
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            yield sse_message("snapshot", snapshot)
+            while True:
+                try:
+                    event, data = q.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_message(event, data)
+        finally:
+            event_broker.unsubscribe(user_id, q)
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
 
 def apply_regularisation(approval_row):
@@ -622,21 +1637,14 @@ def apply_regularisation(approval_row):
 
     # ---- OVERRIDE LEAVE (NOT APPROVAL STATUS) ----
     cur.execute("""
-        SELECT id, payload
-        FROM approvals
+        UPDATE approvals
+        SET status = 'Cancelled'
         WHERE employee_id = ?
           AND type = 'leave'
           AND status = 'Approved'
-    """, (employee_id,))
-
-    for lr in cur.fetchall():
-        lp = json.loads(lr["payload"])
-        if lp.get("from_date") <= reg_date <= lp.get("to_date"):
-            cur.execute("""
-                UPDATE approvals
-                SET status = 'Cancelled'
-                WHERE id = ?
-            """, (lr["id"],))
+          AND leave_from <= ?
+          AND leave_to >= ?
+    """, (employee_id, reg_date, reg_date))
 
     conn.commit()
 
@@ -647,13 +1655,16 @@ def apply_leave(approval_row):
     """
     pass
 
-def apply_reimbursement(approval_row):
+def reimbursement_amount(payload):
     """
-    Reimbursement side-effects are intentionally empty for now.
-    Approval itself is enough.
-    Accounting / payout logic will be added later.
+    The claimed amount of a reimbursement payload as a positive float, or
+    None when it is missing or not a usable number.
     """
-    pass
+    try:
+        amount = float(payload.get("amount"))
+    except (TypeError, ValueError):
+        return None
+    return amount if math.isfinite(amount) and amount > 0 else None
 
 @app.route("/admin/attendance/audit")
 def get_attendance_audit():
@@ -703,16 +1714,23 @@ def get_employee_tasks():
 
     if not user_id or role != 'employee':
         return jsonify({"status": "forbidden"}), 403
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT *
-        FROM tasks
-        WHERE assigned_to=?
-        ORDER BY datetime(created_at) DESC, id DESC
-    """, (user_id,))
-    tasks = [dict(row) for row in cur.fetchall()]
-    return jsonify(tasks)
+    limit, cursor, error = page_args()
+    if error:
+        return error
+
+    where = ["assigned_to = ?"]
+    params = [user_id]
+    list_filters(where, params, status="status", date="due_date", text=("title", "description"),
+                 search={"search_tasks": "id"})
+
+    tasks, total, next_cursor = keyset_page(
+        get_db().cursor(),
+        "SELECT * FROM tasks",
+        where, params,
+        sort=["created_key", "id"],
+        limit=limit, cursor=cursor
+    )
+    return paginated(jsonify(tasks), total, next_cursor)
 
 # ====================== EMPLOYEE: FILES ======================
 @app.route('/employee/files')
@@ -750,8 +1768,7 @@ def update_task_status():
     task_id = data.get("task_id")
     status = data.get("status")
 
-    allowed_status = ["Pending", "In Progress", "Completed"]
-    if status not in allowed_status:
+    if status not in TASK_STATUSES:
         return jsonify({"status": "error", "message": "Invalid status"}), 400
 
     conn = get_db()
@@ -765,16 +1782,15 @@ def update_task_status():
         return jsonify({"status": "error", "message": "Task not found"}), 404
 
     # Update status
-    cur.execute("SELECT name FROM users WHERE id=?", (user_id,))
-    emp = cur.fetchone()
-    employee_name = emp["name"] if emp else "Unknown"
-    log_activity(employee_name, f"Changed task status to '{status}'", task_id)
+    employee_name = cached_user_name(user_id)
+    log_activity(employee_name, f"Changed task status to '{status}'", task_id, kind="task_status_changed")
     ts = now_ts()
     cur.execute(
         "UPDATE tasks SET status=?, updated_at=?, updated_by_role='employee' WHERE id=?",
         (status, ts, task_id)
     )
     conn.commit()
+    invalidate_task_caches()
 
     return jsonify({"status": "success", "message": "Task status updated"})
 
@@ -787,6 +1803,7 @@ def employee_recent_activity():
     if not user_id or role != 'employee':
         return jsonify({"status": "forbidden"}), 403
 
+    activity_writer.flush()
     conn = get_db()
     cur = conn.cursor()
 
@@ -865,11 +1882,22 @@ def employee_today_attendance():
 def get_announcements():
     if not session.get("user_id"):
         return jsonify({"status": "forbidden"}), 403
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM announcements ORDER BY created_at DESC")
-    announcements = [dict(row) for row in cur.fetchall()]
-    return jsonify(announcements)
+    limit, cursor, error = page_args()
+    if error:
+        return error
+
+    where, params = [], []
+    list_filters(where, params, date="created_at", text=("title", "message"),
+                 search={"search_announcements": "id"})
+
+    announcements, total, next_cursor = keyset_page(
+        get_db().cursor(),
+        "SELECT * FROM announcements",
+        where, params,
+        sort=["created_key", "id"],
+        limit=limit, cursor=cursor
+    )
+    return paginated(jsonify(announcements), total, next_cursor)
 
 # ============================== PUBLIC: FILES =============================
 # Get all files
@@ -877,28 +1905,86 @@ def get_announcements():
 def get_files():
     if not session.get("user_id"):
         return jsonify({"status": "forbidden"}), 403
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM files ORDER BY uploaded_at DESC")
-    files = [dict(row) for row in cur.fetchall()]
-    return jsonify(files)
+    limit, cursor, error = page_args()
+    if error:
+        return error
+
+    where, params = [], []
+    list_filters(where, params, employee="shared_with", date="uploaded_at", text=("filename",),
+                 search={"search_files": "id"})
+    if request.args.get("file_type"):
+        where.append("file_type = ?")
+        params.append(request.args["file_type"])
+
+    files, total, next_cursor = keyset_page(
+        get_db().cursor(),
+        "SELECT * FROM files",
+        where, params,
+        sort=["uploaded_key", "id"],
+        limit=limit, cursor=cursor
+    )
+    return paginated(jsonify(files), total, next_cursor)
 
-@app.route('/uploads/<filename>')
-def uploaded_file(filename):
-    user_id = session.get('user_id')
-    role = session.get('role')
+# ============================ PUBLIC: UPLOADS =============================
+# Uploads are served with strong ETags, Range support and long private cache
+# lifetimes. Authorization grants and name -> (path, etag) lookups are kept
+# in small in-process LRUs, so a repeat view is answered with a 304 without
+# touching the database or the file.
+UPLOAD_MAX_AGE = 30 * 24 * 3600          # seconds
+UPLOAD_CACHE_SIZE = 4096
 
-    if not user_id:
-        return "Unauthorized", 401
 
-    # ✅ ADMIN: full access to uploads (reimbursement bills etc.)
+class LRUCache:
+    """
+    Thread-safe least-recently-used map with a fixed number of entries.
+    With `ttl` (seconds) entries also expire that long after they are put.
+    """
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value, expires = self._data[key]
+            if expires is not None and expires <= monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        expires = monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Only grants are cached: files are never unshared, while a denial could
+# turn into a grant as soon as a file with that name is shared.
+_upload_grants = LRUCache(UPLOAD_CACHE_SIZE)
+_upload_locations = LRUCache(UPLOAD_CACHE_SIZE)
+
+
+def can_view_upload(user_id, role, filename):
     if role == "admin":
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        return True         # full access to uploads (reimbursement bills etc.)
 
-    # 🔒 EMPLOYEE: restrict to shared files only
-    conn = get_db()
-    cur = conn.cursor()
+    key = (user_id, filename)
+    if _upload_grants.get(key):
+        return True
 
+    # 🔒 EMPLOYEE: restrict to shared files only
+    cur = get_db().cursor()
     cur.execute("""
         SELECT 1 FROM files
         WHERE filename = ?
@@ -909,9 +1995,374 @@ def uploaded_file(filename):
     """, (filename, str(user_id)))
 
     if not cur.fetchone():
+        return False
+
+    _upload_grants.put(key, True)
+    return True
+
+
+def locate_upload(filename):
+    """
+    (path, etag) for an upload, or None. Blob-store ETags are the content
+    hash (names never change content); legacy flat files are hashed once and
+    re-hashed only when their mtime changes.
+    """
+    cached = _upload_locations.get(filename)
+
+    if cached and cached["mtime"] is None:
+        return cached["path"], cached["etag"]
+
+    path = blobstore.resolve(get_db().cursor(), app.config['BLOB_ROOT'], filename)
+    if path is not None:
+        if not os.path.exists(path):
+            return None
+        etag, mtime = os.path.basename(path), None
+    else:
+        path = safe_join(app.config['UPLOAD_FOLDER'], filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        mtime = os.stat(path).st_mtime_ns
+        if cached and cached["mtime"] == mtime:
+            return cached["path"], cached["etag"]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(blobstore.CHUNK_SIZE), b""):
+                digest.update(chunk)
+        etag = f"{digest.hexdigest()}-{mtime}"
+
+    _upload_locations.put(filename, {"path": path, "etag": etag, "mtime": mtime})
+    return path, etag
+
+
+def upload_cache_headers(response, etag):
+    response.set_etag(etag)
+    response.cache_control.no_cache = None
+    response.cache_control.public = None
+    response.cache_control.private = True
+    response.cache_control.max_age = UPLOAD_MAX_AGE
+    response.expires = None
+    return response
+
+
+@app.route('/uploads/<filename>')
+def uploaded_file(filename):
+    user_id = session.get('user_id')
+    role = session.get('role')
+
+    if not user_id:
+        return "Unauthorized", 401
+
+    if not can_view_upload(user_id, role, filename):
+        return "Forbidden", 403
+
+    location = locate_upload(filename)
+    if location is None:
+        return "Not found", 404
+    path, etag = location
+
+    if request.if_none_match.contains(etag):
+        return upload_cache_headers(Response(status=304), etag)
+
+    response = send_file(path, download_name=filename, etag=etag, conditional=True)
+    return upload_cache_headers(response, etag)
+
+
+THUMBNAIL_WAIT_SECONDS = 10
+
+
+@app.route('/uploads/<filename>/thumb')
+def upload_thumbnail(filename):
+    """
+    Downscaled rendition of an upload: ?size=thumb (default) or preview.
+    Rendered in the background after upload; older files are rendered on
+    first request.
+    """
+    user_id = session.get('user_id')
+    role = session.get('role')
+
+    if not user_id:
+        return "Unauthorized", 401
+
+    size = request.args.get("size", "thumb")
+    if size not in THUMBNAIL_SIZES:
+        return jsonify({"status": "error", "message": "Unknown size"}), 400
+
+    if not can_view_upload(user_id, role, filename):
         return "Forbidden", 403
 
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    location = locate_upload(filename)
+    if location is None:
+        return "Not found", 404
+    path, etag = location
+
+    thumb = thumbnail_pool.find(etag, size)
+    if thumb is None:
+        future = thumbnail_pool.submit(path, etag)
+        try:
+            future.result(timeout=THUMBNAIL_WAIT_SECONDS)
+        except TimeoutError:
+            response = Response("Preview not ready", status=503)
+            response.headers["Retry-After"] = "5"
+            return response
+
+        thumb = thumbnail_pool.find(etag, size)
+        if thumb is None:
+            return "No preview available", 404
+
+    thumb_path, mimetype = thumb
+    thumb_etag = f"{etag}.{size}"
+
+    if request.if_none_match.contains(thumb_etag):
+        return upload_cache_headers(Response(status=304), thumb_etag)
+
+    response = send_file(thumb_path, mimetype=mimetype, etag=thumb_etag, conditional=True)
+    return upload_cache_headers(response, thumb_etag)
+
+
+# ========================== REFERENCE DATA CACHE ==========================
+# Users rarely change but are read on almost every dashboard request, so
+# those reads go through a bounded LRU whose entries expire after
+# REFERENCE_CACHE_TTL. Entries are tagged with the users version from
+# cache_versions (bumped by triggers) and dropped as soon as it moves:
+#   - writes in this process refresh it right after commit (write-through);
+#   - writes in other worker processes reach it through the event relay's
+#     poll;
+#   - a TTL reload re-reads it too, which also covers scripts that write to
+#     the database directly (add_employee.py).
+# Responses carry an ETag made from the version, so revalidating unchanged
+# data is a 304 answered from memory.
+REFERENCE_CACHE_SIZE = 1024
+REFERENCE_CACHE_TTL = 60                 # seconds
+
+_reference_cache = LRUCache(REFERENCE_CACHE_SIZE, ttl=REFERENCE_CACHE_TTL)
+_users_version = None
+_users_version_lock = threading.Lock()
+
+
+def users_data_version(cur):
+    cur.execute("SELECT version FROM cache_versions WHERE name = 'users'")
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def refresh_users_cache(cur):
+    """
+    Adopt the current users version, dropping cached entries if it moved.
+    Call after committing any write to users.
+    """
+    global _users_version
+
+    version = users_data_version(cur)
+    with _users_version_lock:
+        if version != _users_version:
+            _users_version = version
+            _reference_cache.clear()
+    return version
+
+
+event_relay.pollers.append(lambda conn: refresh_users_cache(conn.cursor()))
+
+
+def cached_reference(key, load):
+    """
+    (version, value) for `key`; load(cur) runs on a miss.
+    """
+    entry = _reference_cache.get(key)
+    if entry is not None and entry[0] == _users_version:
+        return entry
+
+    cur = get_db().cursor()
+    version = refresh_users_cache(cur)       # read before the data, never after
+    entry = (version, load(cur))
+    _reference_cache.put(key, entry)
+    return entry
+
+
+def reference_response(key, load):
+    """
+    JSON response for cached reference data, with an ETag from the users
+    version (304 when the client's copy is current). 404 when load()
+    returns None.
+    """
+    version, value = cached_reference(key, load)
+    if value is None:
+        return jsonify({"status": "error"}), 404
+
+    etag = "users-" + "-".join(str(part) for part in (version, *key))
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(value)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def load_employees(cur):
+    cur.execute("SELECT id, name, email, role FROM users WHERE role = 'employee'")
+    return [dict(row) for row in cur.fetchall()]
+
+
+def load_admins(cur):
+    cur.execute("""
+        SELECT id, name, email
+        FROM users
+        WHERE role = 'admin'
+        ORDER BY name
+    """)
+    return [dict(row) for row in cur.fetchall()]
+
+
+def load_profile(user_id):
+    def load(cur):
+        cur.execute("SELECT id, name, email, role FROM users WHERE id=?", (user_id,))
+        row = cur.fetchone()
+        return dict(row) if row else None
+    return load
+
+
+def cached_employees():
+    return cached_reference(("employees",), load_employees)[1]
+
+
+def cached_user_name(user_id, default="Unknown"):
+    profile = cached_reference(("profile", user_id), load_profile(user_id))[1]
+    return profile["name"] if profile else default
+
+
+# ================================ SEARCH ==================================
+# Ranked full-text search over the FTS5 indexes from migration 13 (kept in
+# sync by triggers). Each kind is read straight from its index, joined to
+# the source row for the title, date and the role's visibility rule; every
+# `?` in a visibility rule is the current user's id. A role without a rule
+# for a kind never sees it.
+#
+# bm25 has to score every match before the best can be picked, so words
+# that occur in a large share of rows are only ranked across the newest
+# SEARCH_RANK_WINDOW matches of each kind the user can see (found by rowid,
+# which is cheap).
+SEARCH_KINDS = {
+    "task": {
+        "fts": "search_tasks",
+        "join": "JOIN tasks r ON r.id = search_tasks.rowid",
+        "title": "r.title",
+        "date": "r.due_date",
+        "weights": "10.0, 1.0",
+        "visible": {"admin": "1", "employee": "r.assigned_to = ?"}
+    },
+    "announcement": {
+        "fts": "search_announcements",
+        "join": "JOIN announcements r ON r.id = search_announcements.rowid",
+        "title": "r.title",
+        "date": "r.created_at",
+        "weights": "10.0, 1.0",
+        "visible": {"admin": "1", "employee": "1"}
+    },
+    "file": {
+        "fts": "search_files",
+        "join": "JOIN files r ON r.id = search_files.rowid",
+        "title": "r.filename",
+        "date": "r.uploaded_at",
+        "weights": "1.0",
+        "visible": {"admin": "1", "employee": "r.shared_with IN ('all', CAST(? AS TEXT))"}
+    },
+    "approval": {
+        "fts": "search_approvals",
+        "join": "JOIN approvals r ON r.id = search_approvals.rowid JOIN users u ON u.id = r.employee_id",
+        "title": "u.name || ' · ' || r.type || ' (' || COALESCE(r.status, '') || ')'",
+        "date": "r.created_at",
+        "weights": "2.0, 1.0",
+        "visible": {"admin": "(r.assigned_to = ? OR r.employee_id = ?)", "employee": "r.employee_id = ?"}
+    },
+    "user": {
+        "fts": "search_users",
+        "join": "JOIN users r ON r.id = search_users.rowid",
+        "title": "r.name",
+        "date": "NULL",
+        "weights": "10.0, 1.0",
+        "visible": {"admin": "1"}
+    }
+}
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+SEARCH_RANK_WINDOW = 5000
+
+
+def search_snippet(raw):
+    """
+    HTML-escaped snippet with matched terms wrapped in <mark>. FTS5 marks
+    them with \x02 / \x03 so the markers survive escaping.
+    """
+    return xml_escape(raw or "").replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+
+@app.route("/search")
+def search():
+    """
+    ?q=       words to find (all must match, each as a prefix)
+    ?types=   comma-separated kinds (default: every kind the role can see)
+    ?limit=   maximum results, best first
+    """
+    user_id = session.get("user_id")
+    role = session.get("role")
+    if not user_id:
+        return jsonify({"status": "forbidden"}), 403
+
+    match = fts_query(request.args.get("q"))
+    if match is None:
+        return jsonify({"status": "error", "message": "Enter something to search for"}), 400
+
+    limit = max(1, min(request.args.get("limit", SEARCH_DEFAULT_LIMIT, type=int), SEARCH_MAX_LIMIT))
+    kinds = [k for k in request.args.get("types", ",".join(SEARCH_KINDS)).split(",") if k]
+    unknown = [k for k in kinds if k not in SEARCH_KINDS]
+    if unknown:
+        return jsonify({"status": "error", "message": f"Unknown type: {unknown[0]}"}), 400
+
+    cur = get_db().cursor()
+    results = []
+    for kind in kinds:
+        spec = SEARCH_KINDS[kind]
+        visible = spec["visible"].get(role)
+        if visible is None:
+            continue
+
+        fts = spec["fts"]
+        user_args = [user_id] * visible.count("?")
+        cur.execute(f"""
+            SELECT {fts}.rowid FROM {fts}
+            {spec["join"]}
+            WHERE {fts} MATCH ? AND {visible}
+            ORDER BY {fts}.rowid DESC LIMIT 1 OFFSET ?
+        """, (match, *user_args, SEARCH_RANK_WINDOW - 1))
+        floor = cur.fetchone()
+
+        cur.execute(f"""
+            SELECT
+                r.id AS id,
+                {spec["title"]} AS title,
+                {spec["date"]} AS date,
+                snippet({fts}, -1, char(2), char(3), '…', 12) AS snippet,
+                bm25({fts}, {spec["weights"]}) AS score
+            FROM {fts}
+            {spec["join"]}
+            WHERE {fts} MATCH ? AND {fts}.rowid >= ? AND {visible}
+            ORDER BY score
+            LIMIT ?
+        """, (match, floor[0] if floor else 0, *user_args, limit))
+
+        for row in cur.fetchall():
+            results.append({
+                "type": kind,
+                "id": row["id"],
+                "title": row["title"],
+                "date": row["date"],
+                "snippet": search_snippet(row["snippet"]),
+                "score": round(row["score"], 4)
+            })
+
+    # bm25 is lower-is-better
+    results.sort(key=lambda r: r["score"])
+    return jsonify({"query": request.args.get("q"), "results": results[:limit]})
 
 
 # ============================= ADMIN: HELPERS =============================
@@ -919,9 +2370,18 @@ def uploaded_file(filename):
 def get_employees():
     if session.get("role") != "admin":
         return jsonify({"status": "forbidden"}), 403
+    if not (request.args.get("q") or "").strip():
+        return reference_response(("employees",), load_employees)
+
+    where, params = ["role = 'employee'"], []
+    list_filters(where, params, text=("name", "email"), search={"search_users": "id"})
+
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("SELECT id, name, email, role FROM users WHERE role='employee'")
+    cur.execute(
+        f"SELECT id, name, email, role FROM users WHERE {' AND '.join(where)}",
+        params
+    )
     employees = [dict(row) for row in cur.fetchall()]
     return jsonify(employees)
 
@@ -930,17 +2390,64 @@ def get_employees():
 def get_all_tasks():
     if session.get("role") != "admin":
         return jsonify({"status": "forbidden"}), 403
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
+    limit, cursor, error = page_args()
+    if error:
+        return error
+
+    where, params = [], []
+    list_filters(
+        where, params,
+        status="tasks.status",
+        employee="tasks.assigned_to",
+        date="tasks.due_date",
+        text=("tasks.title", "tasks.description", "users.name"),
+        search={"search_tasks": "tasks.id", "search_users": "tasks.assigned_to"}
+    )
+
+    tasks, total, next_cursor = keyset_page(
+        get_db().cursor(),
+        """
         SELECT tasks.id, tasks.title, tasks.description, tasks.due_date, tasks.status,
-               users.name AS employee_name
+               tasks.assigned_to, users.name AS employee_name
         FROM tasks
         JOIN users ON tasks.assigned_to = users.id
-        ORDER BY tasks.id DESC
-    """)
-    tasks = [dict(row) for row in cur.fetchall()]
-    return jsonify(tasks)
+        """,
+        where, params,
+        sort=["tasks.id"],
+        limit=limit, cursor=cursor
+    )
+    return paginated(jsonify(tasks), total, next_cursor)
+
+@app.route('/admin/tasks/summary')
+def admin_task_summary():
+    """
+    Dashboard card counts, aggregated in SQL so the dashboard no longer
+    needs the full task list.
+    """
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+
+    today = now_ist().date()
+    week_end = today + timedelta(days=7)
+
+    cur = get_db().cursor()
+    cur.execute("""
+        SELECT
+            COUNT(*) AS total,
+            COALESCE(SUM(CASE WHEN status = 'Completed' COLLATE NOCASE THEN 1 ELSE 0 END), 0) AS completed,
+            COALESCE(SUM(CASE WHEN COALESCE(status, '') != 'Completed' COLLATE NOCASE
+                               AND due_date < ? THEN 1 ELSE 0 END), 0) AS overdue,
+            COALESCE(SUM(CASE WHEN COALESCE(status, '') != 'Completed' COLLATE NOCASE
+                               AND due_date = ? THEN 1 ELSE 0 END), 0) AS due_today,
+            COALESCE(SUM(CASE WHEN COALESCE(status, '') != 'Completed' COLLATE NOCASE
+                               AND due_date > ? AND due_date <= ? THEN 1 ELSE 0 END), 0) AS due_week
+        FROM tasks
+        JOIN users ON tasks.assigned_to = users.id
+    """, (today.isoformat(), today.isoformat(), today.isoformat(), week_end.isoformat()))
+
+    summary = dict(cur.fetchone())
+    summary["pending"] = summary["total"] - summary["completed"]
+    return jsonify(summary)
 
 # =========================== ADMIN: TASK DETAILS ==========================
 @app.route('/admin/task/<int:id>')
@@ -956,8 +2463,60 @@ def get_single_task(id):
         WHERE tasks.id=?
     """, (id,))
     task = cur.fetchone()
-    return jsonify(dict(task))
-
+    if not task:
+        return jsonify({"status": "error", "message": "Task not found"}), 404
+
+    # Latest WhatsApp delivery state for this task, if one was queued
+    cur.execute("""
+        SELECT id, status, attempts, last_error, sent_at
+        FROM outbox
+        WHERE reference_type = 'task' AND reference_id = ?
+        ORDER BY id DESC
+        LIMIT 1
+    """, (id,))
+    delivery = cur.fetchone()
+
+    result = dict(task)
+    result["whatsapp_delivery"] = dict(delivery) if delivery else None
+    return jsonify(result)
+
+
+# ========================== ADMIN: OUTBOX STATUS ==========================
+@app.route('/admin/outbox')
+def admin_outbox():
+    """
+    Delivery status of queued third-party notifications.
+    Filters: status, ref_type + ref_id, from / to, q (recipient).
+    """
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+
+    limit, cursor, error = page_args()
+    if error:
+        return error
+
+    where, params = [], []
+    list_filters(where, params, status="status", date="created_at", text=("recipient",))
+    if request.args.get("ref_type"):
+        where.append("reference_type = ?")
+        params.append(request.args["ref_type"])
+    if request.args.get("ref_id"):
+        where.append("reference_id = ?")
+        params.append(request.args.get("ref_id", type=int))
+
+    rows, total, next_cursor = keyset_page(
+        get_db().cursor(),
+        """
+        SELECT id, channel, recipient, status, attempts, last_error,
+               reference_type, reference_id, created_at, updated_at, sent_at
+        FROM outbox
+        """,
+        where, params,
+        sort=["id"],
+        limit=limit, cursor=cursor
+    )
+    return paginated(jsonify(rows), total, next_cursor)
+
 
 # ============================= ADMIN: EDIT TASK ===========================
 @app.route('/admin/update-task/<int:id>', methods=['PUT'])
@@ -978,9 +2537,15 @@ def update_task(id):
         SET assigned_to=?, status=?, due_date=?, updated_at=?, updated_by_role='admin'
         WHERE id=?
     """, (assigned_to, status, due_date, ts, id))
+    if assigned_to:
+        bump_counters(cur, "tasks", user_ids=[assigned_to])
     conn.commit()
+    invalidate_task_caches()
+
+    log_activity("Admin", f"Updated task {id}", id, kind="task_updated")
 
-    log_activity("Admin", f"Updated task {id}", id)
+    if assigned_to:
+        event_broker.publish("sections", {"sections": {"tasks": True}}, user_ids=[assigned_to])
     print("ADMIN UPDATE TASK HIT", id)
     return jsonify({"status": "success"})
 
@@ -993,8 +2558,9 @@ def delete_task(id):
     cur = conn.cursor()
     cur.execute("DELETE FROM tasks WHERE id=?", (id,))
     conn.commit()
+    invalidate_task_caches()
 
-    log_activity("Admin", f"Deleted task {id}", id)
+    log_activity("Admin", f"Deleted task {id}", id, kind="task_deleted")
 
     return jsonify({"status": "deleted"})
 
@@ -1019,8 +2585,10 @@ def update_employee(id):
 
     cur.execute("UPDATE users SET name=?, email=?, role=? WHERE id=?", (name, email, role, id))
     conn.commit()
+    invalidate_task_caches()
+    refresh_users_cache(cur)
 
-    log_activity("Admin", f"Updated employee '{name}'")
+    log_activity("Admin", f"Updated employee '{name}'", kind="employee_updated")
 
     return jsonify({"status":"success"})
 
@@ -1033,11 +2601,23 @@ def admin_approvals():
     admin_id = session["user_id"]
     status = request.args.get("status", "Pending")
 
-    conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT 
+    limit, cursor, error = page_args()
+    if error:
+        return error
+
+    where = ["a.assigned_to = ?", "a.status = ?"]
+    params = [admin_id, status]
+    list_filters(where, params, employee="a.employee_id", date="a.created_at",
+                 text=("a.payload", "u.name"),
+                 search={"search_approvals": "a.id", "search_users": "a.employee_id"})
+    if request.args.get("type"):
+        where.append("a.type = ?")
+        params.append(request.args["type"])
+
+    rows, total, next_cursor = keyset_page(
+        get_db().cursor(),
+        """
+        SELECT
             a.id,
             a.type,
             a.status,
@@ -1046,14 +2626,13 @@ def admin_approvals():
             u.name AS employee_name
         FROM approvals a
         JOIN users u ON a.employee_id = u.id
-        WHERE a.assigned_to = ?
-          AND a.status = ?
-        ORDER BY datetime(a.created_at) DESC
-    """, (admin_id, status))
-
-    rows = cur.fetchall()
+        """,
+        where, params,
+        sort=["a.created_key", "a.id"],
+        limit=limit, cursor=cursor
+    )
 
-    return jsonify([
+    return paginated(jsonify([
         {
             "id": r["id"],
             "employee": r["employee_name"],
@@ -1063,7 +2642,7 @@ def admin_approvals():
             "created_at": r["created_at"]
         }
         for r in rows
-    ])
+    ]), total, next_cursor)
 
 
 
@@ -1079,36 +2658,48 @@ def delete_employee(id):
     cur.execute("DELETE FROM users WHERE id=?", (id,))
     cur.execute("UPDATE tasks SET assigned_to=NULL WHERE assigned_to=?", (id,))
     conn.commit()
+    invalidate_task_caches()
+    refresh_users_cache(cur)
 
-    log_activity("Admin", f"Deleted employee {id}")
+    log_activity("Admin", f"Deleted employee {id}", kind="employee_deleted")
 
     return jsonify({"status":"deleted"})
 
 @app.route('/admin/clear-activity-log', methods=['POST'])
 def clear_activity_log():
+    activity_writer.flush()
     conn = get_db()
     cur = conn.cursor()
     cur.execute("DELETE FROM activity_log")
     conn.commit()
     return jsonify({"status": "success", "message": "Activity log cleared"})
 
-def log_activity(user_name, action, task_id=None):
+
+# Entries are buffered and written in batches (see activitylog.py); rows older
+# than ACTIVITY_LOG_RETENTION_DAYS move to the yearly archive partitions
+# (see PARTITION ARCHIVE below), while activity_rollups keeps per-day counts
+# forever.
+ACTIVITY_LOG_RETENTION_DAYS = int(os.environ.get("ACTIVITY_LOG_RETENTION_DAYS", 90))
+
+activity_writer = ActivityLogWriter(
+    pooled_db,
+    flush_interval=int(os.environ.get("ACTIVITY_LOG_FLUSH_MS", 500)) / 1000,
+    max_batch=int(os.environ.get("ACTIVITY_LOG_BATCH", 200))
+)
+
+
+def log_activity(user_name, action, task_id=None, kind=None):
     """
-    Insert an activity log entry using the server's local time (not SQLite UTC).
+    Queue an activity log entry using the server's local time (not SQLite UTC).
     """
-    conn = get_db()
-    cursor = conn.cursor()
     # Use Python to generate local timestamp so it matches server timezone (e.g. Asia/Kolkata)
     ts = now_ist().strftime("%Y-%m-%d %H:%M:%S")
-    cursor.execute(
-        "INSERT INTO activity_log (user_name, action, task_id, timestamp) VALUES (?, ?, ?, ?)",
-        (user_name, action, task_id, ts)
-    )
-    conn.commit()
+    activity_writer.add(user_name, action, task_id, ts, kind)
 
 
 @app.route("/admin/activity-log")
 def activity_log():
+    activity_writer.flush()
     conn = get_db()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM activity_log ORDER BY timestamp DESC LIMIT 200")
@@ -1132,6 +2723,7 @@ def admin_activity():
     if session.get("role") != "admin":
         return jsonify({"status": "forbidden"}), 403
 
+    activity_writer.flush()
     conn = get_db()
     cur = conn.cursor()
     cur.execute("""
@@ -1143,23 +2735,297 @@ def admin_activity():
     return jsonify([dict(row) for row in cur.fetchall()])
 
 
-OFFICE_LAT = 20.010681255547066
-OFFICE_LNG = 73.7419943864044
-OFFICE_RADIUS_METERS = 100
+@app.route('/admin/activity-rollups')
+def admin_activity_rollups():
+    """
+    Daily activity counts per user and kind; ?from / ?to (YYYY-MM-DD),
+    ?user, ?kind. Covers history that retention has already archived.
+    """
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+
+    activity_writer.flush()
+
+    where, params = [], []
+    for arg, clause in (
+        ("from", "day >= ?"),
+        ("to", "day <= ?"),
+        ("user", "user_name = ?"),
+        ("kind", "kind = ?")
+    ):
+        if request.args.get(arg):
+            where.append(clause)
+            params.append(request.args[arg])
+
+    cur = get_db().cursor()
+    cur.execute(f"""
+        SELECT day, user_name, kind, count
+        FROM activity_rollups
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY day DESC, user_name, kind
+    """, params)
+    return jsonify([dict(row) for row in cur.fetchall()])
+
+
+# ============================ PARTITION ARCHIVE ===========================
+# Closed periods of attendance, notifications and the activity log move
+# into one SQLite file per year under archive/partitions (see archive.py),
+# in the background, a batch at a time. Reports that can reach back past
+# the archive horizon read through read_through(), which attaches the
+# partitions to the connection behind a <table>_history view.
+partition_archiver = PartitionArchiver(
+    pooled_db,
+    archive_dir=os.path.join(BASE_DIR, "archive", "partitions"),
+    policies=default_policies(
+        attendance_grace_days=int(os.environ.get("ATTENDANCE_ARCHIVE_GRACE_DAYS", 90)),
+        notification_days=int(os.environ.get("NOTIFICATION_RETENTION_DAYS", 90)),
+        activity_log_days=ACTIVITY_LOG_RETENTION_DAYS
+    ),
+    batch_rows=int(os.environ.get("ARCHIVE_BATCH_ROWS", 2000)),
+    interval=float(os.environ.get("ARCHIVE_INTERVAL_SECONDS", 3600))
+)
+
+
+def history_source(conn, table, since=None):
+    return read_through(conn, table, since, partition_archiver.archive_dir)
+
+
+@app.route("/admin/archive")
+def admin_archive():
+    """
+    Archive partitions (table, year, rows moved, cutoff) and how many rows
+    each archived table still keeps hot.
+    """
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+
+    cur = get_db().cursor()
+    cur.execute("""
+        SELECT table_name, period, rows, cutoff, updated_at
+        FROM archive_partitions
+        ORDER BY table_name, period DESC
+    """)
+    partitions = [dict(row) for row in cur.fetchall()]
+
+    hot = {}
+    for table in partition_archiver.policies:
+        cur.execute(f"SELECT COUNT(*) FROM {table}")
+        hot[table] = cur.fetchone()[0]
+
+    return jsonify({"partitions": partitions, "hot_rows": hot})
+
+
+# ============================ OFFICE GEOFENCES ============================
+# Check-ins are matched against every active office through an in-memory
+# grid index (geofence.py), rebuilt when cache_versions('offices') moves, so
+# an office edited in one worker process is picked up by all of them.
+_office_index = (None, None)
+_office_index_lock = threading.Lock()
+
+REVALIDATE_CHUNK = 5000
+
+
+def office_index(cur):
+    global _office_index
+
+    cur.execute("SELECT version FROM cache_versions WHERE name = 'offices'")
+    row = cur.fetchone()
+    version = row[0] if row else 0
+
+    with _office_index_lock:
+        cached_version, index = _office_index
+        if index is None or cached_version != version:
+            index = GeofenceIndex(load_offices(cur))
+            _office_index = (version, index)
+        return index
+
+
+def office_fields(data):
+    """
+    Validated (name, kind, latitude, longitude, radius_meters, polygon JSON)
+    from a request body, or an error message.
+    """
+    name = (data.get("name") or "").strip()
+    kind = data.get("kind") or "circle"
+    if not name:
+        return None, "Name required"
+
+    if kind == "polygon":
+        polygon = parse_polygon(data.get("polygon"))
+        if not polygon:
+            return None, "polygon must be at least three [lat, lng] points"
+        return (name, kind, None, None, None, json.dumps(polygon)), None
+
+    if kind != "circle":
+        return None, "kind must be circle or polygon"
+    try:
+        lat = float(data.get("latitude"))
+        lng = float(data.get("longitude"))
+        radius = float(data.get("radius_meters"))
+    except (TypeError, ValueError):
+        return None, "latitude, longitude and radius_meters required"
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radius <= 0:
+        return None, "Invalid coordinates or radius"
+    return (name, kind, lat, lng, radius, None), None
+
+
+@app.route("/admin/offices")
+def admin_offices():
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+
+    cur = get_db().cursor()
+    cur.execute("""
+        SELECT offices.*,
+               (SELECT COUNT(*) FROM attendance WHERE attendance.office_id = offices.id) AS check_ins
+        FROM offices
+        ORDER BY active DESC, name
+    """)
+    offices = []
+    for row in cur.fetchall():
+        office = dict(row)
+        office["polygon"] = json.loads(office["polygon"]) if office["polygon"] else None
+        offices.append(office)
+    return jsonify(offices)
+
+
+@app.route("/admin/offices", methods=["POST"])
+def create_office():
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+
+    fields, error = office_fields(request.get_json(silent=True) or {})
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+
+    ts = now_ist().strftime("%Y-%m-%d %H:%M:%S")
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO offices
+        (name, kind, latitude, longitude, radius_meters, polygon, active, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)
+    """, (*fields, ts, ts))
+    office_id = cur.lastrowid
+    conn.commit()
+
+    log_activity("Admin", f"Added office '{fields[0]}'", kind="office_added")
+    return jsonify({"status": "success", "id": office_id})
+
+
+@app.route("/admin/offices/<int:id>", methods=["PUT"])
+def update_office(id):
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+
+    data = request.get_json(silent=True) or {}
+    fields, error = office_fields(data)
+    if error:
+        return jsonify({"status": "error", "message": error}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE offices
+        SET name=?, kind=?, latitude=?, longitude=?, radius_meters=?, polygon=?,
+            active=?, updated_at=?
+        WHERE id=?
+    """, (*fields, 0 if data.get("active") is False else 1,
+          now_ist().strftime("%Y-%m-%d %H:%M:%S"), id))
+    if cur.rowcount == 0:
+        return jsonify({"status": "error", "message": "Office not found"}), 404
+    conn.commit()
 
-# OFFICE_LAT = 19.968256137714054
-# OFFICE_LNG = 73.66663090699093
-# OFFICE_RADIUS_METERS = 100
+    log_activity("Admin", f"Updated office '{fields[0]}'", kind="office_updated")
+    return jsonify({"status": "success"})
+
+
+@app.route("/admin/offices/<int:id>", methods=["DELETE"])
+def delete_office(id):
+    """
+    Deactivate an office; attendance rows keep pointing at it.
+    """
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE offices SET active=0, updated_at=? WHERE id=? AND active=1",
+        (now_ist().strftime("%Y-%m-%d %H:%M:%S"), id)
+    )
+    if cur.rowcount == 0:
+        return jsonify({"status": "error", "message": "Office not found"}), 404
+    conn.commit()
+
+    log_activity("Admin", f"Deactivated office {id}", kind="office_deleted")
+    return jsonify({"status": "deleted"})
+
+
+@app.route("/admin/offices/revalidate", methods=["POST"])
+def revalidate_office_matches():
+    """
+    Re-match stored check-in locations (optionally from / to a date) against
+    the current offices and record the matched office and distance. Rows are
+    matched in batches with GeofenceIndex.match_many.
+    """
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
 
-def distance_in_meters(lat1, lon1, lat2, lon2):
-    R = 6371000
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
+    data = request.get_json(silent=True) or {}
+    where = ["latitude IS NOT NULL", "longitude IS NOT NULL", "id > ?"]
+    params = []
+    for key, op in (("from", ">="), ("to", "<=")):
+        if data.get(key):
+            if not valid_date(data[key]):
+                return jsonify({"status": "error", "message": f"{key} must be YYYY-MM-DD"}), 400
+            where.append(f"date {op} ?")
+            params.append(data[key])
 
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-    return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    conn = get_db()
+    cur = conn.cursor()
+    index = office_index(cur)
+
+    checked = matched = changed = 0
+    last_id = 0
+    while True:
+        cur.execute(f"""
+            SELECT id, latitude, longitude, office_id, office_distance
+            FROM attendance
+            WHERE {" AND ".join(where)}
+            ORDER BY id
+            LIMIT ?
+        """, (last_id, *params, REVALIDATE_CHUNK))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        office_ids, distances = index.match_many(
+            [row["latitude"] for row in rows],
+            [row["longitude"] for row in rows]
+        )
+        # Only rows whose match moved are written: every write fires the
+        # change feed and attendance summary triggers
+        updates = []
+        for row, office_id, distance in zip(rows, office_ids, distances):
+            distance = None if distance is None else round(distance, 1)
+            if row["office_id"] != office_id or row["office_distance"] != distance:
+                updates.append((office_id, distance, row["id"]))
+        cur.executemany("UPDATE attendance SET office_id=?, office_distance=? WHERE id=?", updates)
+
+        checked += len(rows)
+        matched += sum(1 for office_id in office_ids if office_id is not None)
+        changed += sum(1 for row, office_id in zip(rows, office_ids) if row["office_id"] != office_id)
+        conn.commit()
 
+    return jsonify({
+        "status": "success",
+        "checked": checked,
+        "matched": matched,
+        "outside": checked - matched,
+        "changed": changed
+    })
 
 
 @app.route("/admin/remunerations")
@@ -1203,6 +3069,20 @@ def admin_remuneration_action():
     conn = get_db()
     cur = conn.cursor()
 
+    cur.execute("SELECT * FROM remunerations WHERE id = ?", (rem_id,))
+    rem = cur.fetchone()
+    if not rem:
+        return jsonify({"status": "error", "message": "Remuneration not found"}), 404
+
+    if payroll_month_closed(cur, rem["month"]):
+        return jsonify({"status": "error", "message": f"Payroll for {rem['month']} is closed"}), 409
+
+    if action == "approve":
+        if rem["type"] in PAYROLL_CATEGORIES:
+            post_payroll(cur, "remuneration", rem["id"], rem["employee_id"], rem["month"], rem["type"], rem["amount"])
+    else:
+        unpost_payroll(cur, "remuneration", rem["id"])
+
     cur.execute("""
         UPDATE remunerations
         SET
@@ -1224,6 +3104,162 @@ def admin_remuneration_action():
     return jsonify({"status": "success"})
 
 
+# ============================= PAYROLL LEDGER =============================
+# payroll_ledger keeps one row of running totals per employee per month.
+# Approving a remuneration or reimbursement posts it once (payroll_postings
+# is keyed by source), rejecting reverses the posting, and both happen in
+# the approval's own transaction. Closed months are frozen: later postings
+# to them are refused.
+PAYROLL_CATEGORIES = ["bonus", "incentive", "overtime", "deduction", "adjustment", "reimbursement"]
+
+
+def payroll_month_closed(cur, month):
+    cur.execute("SELECT 1 FROM payroll_months WHERE month = ?", (month,))
+    return cur.fetchone() is not None
+
+
+def payroll_posting(cur, source_type, source_id):
+    cur.execute("""
+        SELECT * FROM payroll_postings
+        WHERE source_type = ? AND source_id = ?
+    """, (source_type, source_id))
+    return cur.fetchone()
+
+
+def post_payroll(cur, source_type, source_id, employee_id, month, category, amount):
+    """
+    Add one approved item to the ledger. Re-posting the same source is a
+    no-op. Does not commit.
+    """
+    if category not in PAYROLL_CATEGORIES:
+        raise ValueError(f"Unknown payroll category: {category}")
+
+    ts = now_ts()
+    cur.execute("""
+        INSERT OR IGNORE INTO payroll_postings
+        (source_type, source_id, employee_id, month, category, amount, posted_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (source_type, source_id, employee_id, month, category, amount, ts))
+    if not cur.rowcount:
+        return
+
+    cur.execute(f"""
+        INSERT INTO payroll_ledger (employee_id, month, {category}, items, updated_at)
+        VALUES (?, ?, ?, 1, ?)
+        ON CONFLICT(month, employee_id) DO UPDATE SET
+            {category} = {category} + excluded.{category},
+            items = items + 1,
+            updated_at = excluded.updated_at
+    """, (employee_id, month, amount, ts))
+
+
+def unpost_payroll(cur, source_type, source_id):
+    """
+    Reverse a posting (e.g. an approved item later rejected). Does not commit.
+    """
+    posting = payroll_posting(cur, source_type, source_id)
+    if not posting:
+        return
+
+    category = posting["category"]
+    cur.execute(f"""
+        UPDATE payroll_ledger
+        SET {category} = {category} - ?, items = items - 1, updated_at = ?
+        WHERE month = ? AND employee_id = ?
+    """, (posting["amount"], now_ts(), posting["month"], posting["employee_id"]))
+    cur.execute("""
+        DELETE FROM payroll_postings
+        WHERE source_type = ? AND source_id = ?
+    """, (source_type, source_id))
+
+
+def valid_date(value):
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def valid_month(month):
+    try:
+        datetime.strptime(month, "%Y-%m")
+        return True
+    except ValueError:
+        return False
+
+
+@app.route("/admin/payroll/<month>")
+def admin_payroll(month):
+    """
+    Per-employee totals for one month (YYYY-MM) plus the month's totals.
+    """
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+    if not valid_month(month):
+        return jsonify({"status": "error", "message": "Month must be YYYY-MM"}), 400
+
+    cur = get_db().cursor()
+    cur.execute("""
+        SELECT l.*, u.name AS employee
+        FROM payroll_ledger l
+        LEFT JOIN users u ON u.id = l.employee_id
+        WHERE l.month = ?
+        ORDER BY u.name
+    """, (month,))
+    rows = [dict(row) for row in cur.fetchall()]
+
+    cur.execute("SELECT * FROM payroll_months WHERE month = ?", (month,))
+    closed = cur.fetchone()
+
+    totals = {
+        key: round(sum(row[key] for row in rows), 2)
+        for key in PAYROLL_CATEGORIES + ["net", "items"]
+    }
+
+    return jsonify({
+        "month": month,
+        "status": "closed" if closed else "open",
+        "closed_at": closed["closed_at"] if closed else None,
+        "employees": rows,
+        "totals": totals
+    })
+
+
+@app.route("/admin/payroll/<month>/close", methods=["POST"])
+def admin_close_payroll(month):
+    """
+    Freeze a month's ledger: its rows are stamped closed and no further
+    approvals can post to it.
+    """
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+    if not valid_month(month):
+        return jsonify({"status": "error", "message": "Month must be YYYY-MM"}), 400
+    if month >= now_ist().strftime("%Y-%m"):
+        return jsonify({"status": "error", "message": "Only past months can be closed"}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+
+    if payroll_month_closed(cur, month):
+        return jsonify({"status": "error", "message": f"Payroll for {month} is already closed"}), 409
+
+    ts = now_ts()
+    cur.execute("UPDATE payroll_ledger SET closed_at = ? WHERE month = ?", (ts, month))
+    cur.execute("""
+        INSERT INTO payroll_months (month, closed_at, closed_by, employees, total_net)
+        SELECT ?, ?, ?, COUNT(*), COALESCE(SUM(net), 0)
+        FROM payroll_ledger
+        WHERE month = ?
+    """, (month, ts, session["user_id"], month))
+    conn.commit()
+
+    log_activity("Admin", f"Closed payroll for {month}", kind="payroll_closed")
+
+    return jsonify({"status": "success", "month": month})
+
+
 @app.route("/employee/check-in", methods=["POST"])
 
 def employee_check_in():
@@ -1247,7 +3283,9 @@ def employee_check_in():
     lng = data.get("lng")
     late_comment = data.get("late_comment")
 
-    if lat is None or lng is None:
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
         return jsonify({"status": "error", "message": "Location missing"}), 400
 
     now = now_ist()
@@ -1260,17 +3298,17 @@ def employee_check_in():
 
     is_late = now_time > time(10, 30)
 
-    distance = distance_in_meters(lat, lng, OFFICE_LAT, OFFICE_LNG)
+    conn = get_db()
+    cur = conn.cursor()
 
-    if distance > OFFICE_RADIUS_METERS:
+    office, distance = office_index(cur).match(lat, lng)
+
+    if office is None:
         return jsonify({
             "status": "Outside",
-            "distance": round(distance)
+            "distance": None if distance is None else round(distance)
         })
 
-    conn = get_db()
-    cur = conn.cursor()
-
     cur.execute(
         "SELECT 1 FROM attendance WHERE user_id=? AND date=?",
         (user_id, today)
@@ -1285,8 +3323,9 @@ def employee_check_in():
 
     cur.execute("""
         INSERT INTO attendance
-        (user_id, date, check_in_time, latitude, longitude, status, day_type, late_comment)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        (user_id, date, check_in_time, latitude, longitude, status, day_type, late_comment,
+         office_id, office_distance)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (
         user_id,
         today,
@@ -1295,14 +3334,17 @@ def employee_check_in():
         lng,
         "Present",
         day_type,
-        late_comment
+        late_comment,
+        office.id,
+        round(distance, 1)
     ))
 
     conn.commit()
 
     return jsonify({
         "status": "Present",
-        "distance": round(distance)
+        "distance": round(distance),
+        "office": office.name
     })
 
 
@@ -1362,134 +3404,706 @@ def employee_profile():
     if not user_id or role != "employee":
         return jsonify({"status": "forbidden"}), 403
 
+    return reference_response(("profile", user_id), load_profile(user_id))
+
+
+
+@app.route("/admin/attendance")
+def admin_attendance():
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+
+    limit, cursor, error = page_args()
+    if error:
+        return error
+
+    where, params = [], []
+    list_filters(
+        where, params,
+        status="attendance.status",
+        employee="attendance.user_id",
+        date="attendance.date",
+        text=("users.name", "attendance.late_comment")
+    )
+
+    # Unless ?from= starts inside the hot window, read through the archive
     conn = get_db()
+    source = history_source(conn, "attendance", request.args.get("from"))
+
+    rows, total, next_cursor = keyset_page(
+        conn.cursor(),
+        admin_attendance_sql(source),
+        where, params,
+        sort=["attendance.date", "attendance.id"],
+        limit=limit, cursor=cursor
+    )
+    for row in rows:
+        row["overtime_minutes"] = max(0, row["worked_minutes"] - STANDARD_DAY_MINUTES)
+    return paginated(jsonify(rows), total, next_cursor)
+
+
+def admin_attendance_sql(source="attendance"):
+    """
+    SELECT ... FROM for the admin attendance rows (shared with /sync);
+    `source` is the table or read-through view to select from.
+    """
+    return """
+        SELECT
+        attendance.*,
+        attendance.user_id AS user_id,
+        users.name AS employee,
+        offices.name AS office,
+        """ + WORKED_MINUTES_SQL.format(t="attendance") + """ AS worked_minutes,
+        """ + WEEK_START_SQL.format(t="attendance") + """ AS week_start,
+
+        CASE
+            WHEN EXISTS (
+                SELECT 1
+                FROM approvals a
+                WHERE a.employee_id = attendance.user_id
+                AND a.type = 'regularisation'
+                AND a.status = 'Approved'
+                AND a.reg_date = attendance.date
+            )
+            THEN 1
+            ELSE 0
+        END AS regularised
+
+        FROM """ + source + """ AS attendance
+        JOIN users ON users.id = attendance.user_id
+        LEFT JOIN offices ON offices.id = attendance.office_id
+        """
+
+
+# ========================== ATTENDANCE ANALYTICS ==========================
+# Per-employee weekly (Sunday-start, as on the dashboard) and monthly totals.
+# Closed periods are computed once and cached in attendance_summary; the
+# triggers from migration 10 drop a period's cache marker whenever its
+# attendance changes. Only the current period is computed on every request.
+STANDARD_DAY_MINUTES = 8 * 60
+
+# Minutes between check-in and check-out (HH:MM precision, overnight-safe);
+# 0 until the employee has checked out.
+WORKED_MINUTES_SQL = """
+    COALESCE(
+        CASE WHEN {t}.check_in_time > '' AND {t}.check_out_time > '' THEN
+            ((CAST(strftime('%s', '2000-01-01 ' || substr({t}.check_out_time, 1, 5)) AS INTEGER)
+              - CAST(strftime('%s', '2000-01-01 ' || substr({t}.check_in_time, 1, 5)) AS INTEGER)
+             ) / 60 + 1440) % 1440
+        END,
+        0
+    )
+"""
+
+WEEK_START_SQL = "date({t}.date, '-' || strftime('%w', {t}.date) || ' days')"
+
+SUMMARY_PERIODS = {
+    "week": WEEK_START_SQL,
+    "month": "strftime('%Y-%m-01', {t}.date)"
+}
+
+SUMMARY_FIELDS = [
+    "days_present", "worked_minutes", "late_count", "half_days", "overtime_minutes"
+]
+
+
+def period_bounds(period, day):
+    """
+    (start, end) dates of the week / month containing `day`.
+    """
+    if period == "week":
+        start = day - timedelta(days=(day.weekday() + 1) % 7)
+        return start, start + timedelta(days=6)
+    start = day.replace(day=1)
+    next_month = (start + timedelta(days=32)).replace(day=1)
+    return start, next_month - timedelta(days=1)
+
+
+def compute_attendance_summary(cur, period, date_from, date_to, source="attendance"):
+    """
+    One grouped pass over attendance in [date_from, date_to] (read from
+    `source`, a table or read-through view); returns rows keyed by
+    (period_start, user_id).
+    """
+    minutes = WORKED_MINUTES_SQL.format(t="a")
+    cur.execute(f"""
+        SELECT
+            {SUMMARY_PERIODS[period].format(t="a")} AS period_start,
+            a.user_id,
+            COUNT(*) AS days_present,
+            SUM({minutes}) AS worked_minutes,
+            SUM(CASE WHEN a.late_comment > '' THEN 1 ELSE 0 END) AS late_count,
+            SUM(CASE WHEN a.day_type = 'HALF' THEN 1 ELSE 0 END) AS half_days,
+            SUM(MAX(0, {minutes} - ?)) AS overtime_minutes
+        FROM {source} a
+        WHERE a.date BETWEEN ? AND ?
+        GROUP BY 1, 2
+    """, (STANDARD_DAY_MINUTES, date_from, date_to))
+    return [dict(row) for row in cur.fetchall()]
+
+
+def cache_closed_periods(conn, period, starts, source="attendance"):
+    """
+    Make sure every closed period in `starts` has cached totals.
+    """
     cur = conn.cursor()
-    cur.execute(
-        "SELECT id, name, email, role FROM users WHERE id=?",
-        (user_id,)
+    placeholders = ",".join("?" * len(starts))
+    cur.execute(f"""
+        SELECT period_start FROM attendance_summary_periods
+        WHERE period = ? AND period_start IN ({placeholders})
+    """, (period, *starts))
+    missing = sorted(set(starts) - {row["period_start"] for row in cur.fetchall()})
+    if not missing:
+        return
+
+    # Compute and mark in one write transaction, so an attendance change
+    # cannot slip in between and leave a stale period marked as cached.
+    conn.commit()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        first = datetime.strptime(missing[0], "%Y-%m-%d").date()
+        last = datetime.strptime(missing[-1], "%Y-%m-%d").date()
+        rows = [
+            row for row in compute_attendance_summary(
+                cur, period,
+                first.strftime("%Y-%m-%d"),
+                period_bounds(period, last)[1].strftime("%Y-%m-%d"),
+                source
+            )
+            if row["period_start"] in missing
+        ]
+
+        cur.execute(f"""
+            DELETE FROM attendance_summary
+            WHERE period = ? AND period_start IN ({",".join("?" * len(missing))})
+        """, (period, *missing))
+        cur.executemany(f"""
+            INSERT INTO attendance_summary
+            (period, period_start, user_id, {", ".join(SUMMARY_FIELDS)})
+            VALUES (?, ?, ?, {", ".join("?" * len(SUMMARY_FIELDS))})
+        """, [
+            (period, row["period_start"], row["user_id"], *(row[f] for f in SUMMARY_FIELDS))
+            for row in rows
+        ])
+        cur.executemany("""
+            INSERT OR REPLACE INTO attendance_summary_periods
+            (period, period_start, period_end, computed_at)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (
+                period,
+                start,
+                period_bounds(period, datetime.strptime(start, "%Y-%m-%d").date())[1].strftime("%Y-%m-%d"),
+                now_ts()
+            )
+            for start in missing
+        ])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+@app.route("/admin/attendance/summary")
+def admin_attendance_summary():
+    """
+    ?period=week|month, ?from / ?to (YYYY-MM-DD, default: last 8 weeks or
+    12 months), ?employee (id). One row per employee per period.
+    """
+    if session.get("role") != "admin":
+        return jsonify({"status": "forbidden"}), 403
+
+    period = request.args.get("period", "week")
+    if period not in SUMMARY_PERIODS:
+        return jsonify({"status": "error", "message": "Invalid period"}), 400
+
+    today = now_ist().date()
+    try:
+        date_to = datetime.strptime(request.args["to"], "%Y-%m-%d").date() if request.args.get("to") else today
+        date_from = (
+            datetime.strptime(request.args["from"], "%Y-%m-%d").date()
+            if request.args.get("from")
+            else date_to - timedelta(weeks=8) if period == "week"
+            else date_to - timedelta(days=365)
+        )
+    except ValueError:
+        return jsonify({"status": "error", "message": "Dates must be YYYY-MM-DD"}), 400
+
+    current_start, _ = period_bounds(period, today)
+
+    starts = []
+    start, _ = period_bounds(period, date_from)
+    while start <= date_to:
+        starts.append(start)
+        start = period_bounds(period, start)[1] + timedelta(days=1)
+
+    closed = [s.strftime("%Y-%m-%d") for s in starts if s < current_start]
+    conn = get_db()
+    cur = conn.cursor()
+    if closed:
+        source = history_source(conn, "attendance", closed[0])
+        cache_closed_periods(conn, period, closed, source)
+
+    employee = request.args.get("employee", type=int)
+    results = []
+
+    if closed:
+        cur.execute(f"""
+            SELECT s.*
+            FROM attendance_summary s
+            WHERE s.period = ? AND s.period_start IN ({",".join("?" * len(closed))})
+        """, (period, *closed))
+        results.extend(dict(row) for row in cur.fetchall())
+
+    if starts and starts[-1] >= current_start:
+        results.extend(compute_attendance_summary(
+            cur, period,
+            current_start.strftime("%Y-%m-%d"),
+            today.strftime("%Y-%m-%d")
+        ))
+
+    cur.execute("SELECT id, name FROM users")
+    names = {row["id"]: row["name"] for row in cur.fetchall()}
+
+    summary = [
+        {
+            "user_id": row["user_id"],
+            "employee": names.get(row["user_id"]),
+            "period": period,
+            "period_start": row["period_start"],
+            **{f: row[f] for f in SUMMARY_FIELDS}
+        }
+        for row in results
+        if employee is None or row["user_id"] == employee
+    ]
+    summary.sort(key=lambda r: r["employee"] or "")
+    summary.sort(key=lambda r: r["period_start"], reverse=True)
+    return jsonify(summary)
+
+
+# ================================ EXPORTS =================================
+# Exports stream straight from the cursor: rows are pulled in fetchmany()
+# batches and written out as they arrive, so memory stays flat no matter
+# how much history is exported and the first bytes go out immediately.
+EXPORT_BATCH_SIZE = 500
+
+EXPORTS = {
+    "attendance": {
+        "filename": "attendance_log",
+        "sql": """
+            SELECT
+                users.name AS employee,
+                attendance.date,
+                attendance.check_in_time,
+                attendance.check_out_time,
+                attendance.day_type,
+                attendance.late_comment,
+
+                CASE
+                    WHEN EXISTS (
+                        SELECT 1
+                        FROM approvals a
+                        WHERE a.employee_id = attendance.user_id
+                        AND a.type = 'regularisation'
+                        AND a.status = 'Approved'
+                        AND a.reg_date = attendance.date
+                    )
+                    THEN 'Yes'
+                    ELSE 'No'
+                END AS regularised
+
+            FROM {source} AS attendance
+            JOIN users ON users.id = attendance.user_id
+        """,
+        "archive": "attendance",
+        "columns": [
+            ("Employee", "employee"),
+            ("Date", "date"),
+            ("Check In", "check_in_time"),
+            ("Check Out", "check_out_time"),
+            ("Day Type", "day_type"),
+            ("Late Reason", "late_comment"),
+            ("Regularised", "regularised")
+        ],
+        "date": "attendance.date",
+        "employee": "attendance.user_id",
+        "order": "attendance.date DESC, attendance.id DESC"
+    },
+    "tasks": {
+        "filename": "tasks",
+        "sql": """
+            SELECT tasks.*, users.name AS employee
+            FROM tasks
+            LEFT JOIN users ON users.id = tasks.assigned_to
+        """,
+        "columns": [
+            ("ID", "id"),
+            ("Title", "title"),
+            ("Description", "description"),
+            ("Employee", "employee"),
+            ("Status", "status"),
+            ("Due Date", "due_date"),
+            ("Created At", "created_at"),
+            ("Updated At", "updated_at")
+        ],
+        "date": "tasks.created_at",
+        "employee": "tasks.assigned_to",
+        "order": "tasks.id DESC"
+    },
+    "approvals": {
+        "filename": "approvals",
+        "sql": """
+            SELECT a.*, u.name AS employee, ap.name AS approver
+            FROM approvals a
+            JOIN users u ON u.id = a.employee_id
+            LEFT JOIN users ap ON ap.id = a.approved_by
+        """,
+        "columns": [
+            ("ID", "id"),
+            ("Employee", "employee"),
+            ("Type", "type"),
+            ("Status", "status"),
+            ("Details", "payload"),
+            ("Submitted At", "created_at"),
+            ("Approver", "approver"),
+            ("Decided At", "approved_at"),
+            ("Rejection Reason", "rejection_reason")
+        ],
+        "date": "a.created_at",
+        "employee": "a.employee_id",
+        "order": "a.id DESC"
+    },
+    "remunerations": {
+        "filename": "remunerations",
+        "sql": """
+            SELECT r.*, u.name AS employee
+            FROM remunerations r
+            JOIN users u ON u.id = r.employee_id
+        """,
+        "columns": [
+            ("ID", "id"),
+            ("Employee", "employee"),
+            ("Month", "month"),
+            ("Type", "type"),
+            ("Amount", "amount"),
+            ("Reason", "reason"),
+            ("Status", "status"),
+            ("Created At", "created_at"),
+            ("Approved At", "approved_at")
+        ],
+        "date": "r.created_at",
+        "employee": "r.employee_id",
+        "order": "r.id DESC"
+    },
+    "activity_log": {
+        "filename": "activity_log",
+        "sql": "SELECT * FROM {source} AS activity_log",
+        "archive": "activity_log",
+        "columns": [
+            ("ID", "id"),
+            ("User", "user_name"),
+            ("Action", "action"),
+            ("Task ID", "task_id"),
+            ("Timestamp", "timestamp")
+        ],
+        "date": "activity_log.timestamp",
+        "employee": "activity_log.user_name = (SELECT name FROM users WHERE id = ?)",
+        "order": "activity_log.timestamp DESC, activity_log.id DESC"
+    }
+}
+
+
+def export_rows(spec, where, params, since=None):
+    """
+    Yield lists of row values, EXPORT_BATCH_SIZE at a time. Runs on its own
+    pooled connection because the response body is generated after the
+    request's connection has already been released. Archived tables read
+    through their partitions unless `since` is inside the hot window.
+    """
+    keys = [key for _, key in spec["columns"]]
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+    with pooled_db() as conn:
+        sql = spec["sql"]
+        if "archive" in spec:
+            sql = sql.format(source=history_source(conn, spec["archive"], since))
+        cur = conn.cursor()
+        cur.execute(f"{sql} {where_sql} ORDER BY {spec['order']}", params)
+        while True:
+            batch = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if not batch:
+                break
+            yield [[row[k] for k in keys] for row in batch]
+
+
+def stream_csv(header, batches):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header)
+    for batch in batches:
+        writer.writerows(
+            ["" if value is None else value for value in row] for row in batch
+        )
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """
+    Write-only, non-seekable file object that collects what ZipFile writes
+    so the generator can hand it out chunk by chunk.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = xml_escape("" if value is None else str(value))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return "<row>" + "".join(_xlsx_cell(v) for v in values) + "</row>"
+
+
+XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
     )
-    user = cur.fetchone()
+}
+
+
+def stream_xlsx(header, batches):
+    """
+    Minimal single-sheet XLSX writer (inline strings, no styles), streamed
+    through a non-seekable ZipFile so no optional spreadsheet library is
+    needed.
+    """
+    sink = _ChunkSink()
+
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, body in XLSX_STATIC_PARTS.items():
+            zf.writestr(name, body)
+        yield sink.drain()
+
+        with zf.open("xl/worksheets/sheet1.xml", mode="w") as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _xlsx_row(header)
+            ).encode("utf-8"))
+
+            for batch in batches:
+                sheet.write("".join(_xlsx_row(row) for row in batch).encode("utf-8"))
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+
+            sheet.write(b"</sheetData></worksheet>")
 
-    if not user:
-        return jsonify({"status": "error"}), 404
+    yield sink.drain()
 
-    return jsonify(dict(user))
 
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
 
 
-@app.route("/admin/attendance")
-def admin_attendance():
+@app.route("/admin/export/<table>")
+def export_table(table):
+    """
+    Stream an export of attendance, tasks, approvals, remunerations or
+    activity_log.
+
+    Query args: format=csv|xlsx, from / to (YYYY-MM-DD), employee (id).
+    CSV is gzip-encoded when the client accepts it (disable with gzip=0).
+    """
     if session.get("role") != "admin":
         return jsonify({"status": "forbidden"}), 403
 
-    conn = get_db()
-    cur = conn.cursor()
+    spec = EXPORTS.get(table)
+    if not spec:
+        return jsonify({"status": "error", "message": "Unknown export"}), 404
+    if table == "activity_log":
+        activity_writer.flush()
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in ["csv", "xlsx"]:
+        return jsonify({"status": "error", "message": "Invalid format"}), 400
+
+    where, params = [], []
+    list_filters(where, params, date=spec["date"])
+
+    employee_id = request.args.get("employee", type=int)
+    if employee_id:
+        employee_filter = spec["employee"]
+        if "?" not in employee_filter:
+            employee_filter += " = ?"
+        where.append(employee_filter)
+        params.append(employee_id)
+
+    header = [label for label, _ in spec["columns"]]
+    batches = export_rows(spec, where, params, request.args.get("from"))
+
+    headers = {}
+    if fmt == "xlsx":
+        body = stream_xlsx(header, batches)
+        mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        body = stream_csv(header, batches)
+        mimetype = "text/csv"
+        if request.args.get("gzip") != "0" and "gzip" in request.headers.get("Accept-Encoding", ""):
+            body = gzip_stream(body)
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
 
-    cur.execute("""
-        SELECT
-        attendance.*,
-        attendance.user_id AS user_id,
-        users.name AS employee,
+    headers["Content-Disposition"] = f"attachment; filename={spec['filename']}.{fmt}"
+    return Response(body, mimetype=mimetype, headers=headers)
 
-        CASE
-            WHEN EXISTS (
-                SELECT 1
-                FROM approvals a
-                WHERE a.employee_id = attendance.user_id
-                AND a.type = 'regularisation'
-                AND a.status = 'Approved'
-                AND a.payload IS NOT NULL
-                AND json_valid(a.payload)
-                AND json_extract(a.payload, '$.date') = attendance.date
-            )
-            THEN 1
-            ELSE 0
-        END AS regularised
 
-        FROM attendance
-        JOIN users ON users.id = attendance.user_id
-        ORDER BY attendance.date DESC
-    """)
+@app.route("/admin/attendance/download")
+def download_attendance():
+    return export_table("attendance")
 
-    rows = cur.fetchall()
-    return jsonify([dict(r) for r in rows])
 
+# ============================ LEADERBOARD =================================
+# Score = completed * w_completed + in_progress * w_in_progress
+#         - overdue * w_overdue
+app.config.setdefault("LEADERBOARD_WEIGHTS", {
+    "completed": 3,
+    "in_progress": 1,
+    "overdue": 2
+})
+
+LEADERBOARD_WINDOWS = ["all", "week", "month", "quarter"]
 
-@app.route("/admin/attendance/download")
-def download_attendance():
-    if session.get("role") != "admin":
-        return jsonify({"status": "forbidden"}), 403
+# Results for the configured weights are cached per (day, window) together
+# with the tasks version from cache_versions, which triggers bump on every
+# task / employee write, so a cached entry is stale as soon as any worker
+# process writes. Custom ?<key>_weight= overrides are computed uncached, so
+# callers cannot grow the cache.
+_leaderboard_cache = {}
+_leaderboard_lock = threading.Lock()
 
-    conn = get_db()
-    cur = conn.cursor()
 
-    cur.execute("""
-        SELECT
-            users.name AS employee,
-            attendance.date,
-            attendance.check_in_time,
-            attendance.check_out_time,
-            attendance.day_type,
-            attendance.late_comment,
-
-            CASE
-                WHEN EXISTS (
-                    SELECT 1
-                    FROM approvals a
-                    WHERE a.employee_id = attendance.user_id
-                    AND a.type = 'regularisation'
-                    AND a.status = 'Approved'
-                    AND a.payload IS NOT NULL
-                    AND json_valid(a.payload)
-                    AND json_extract(a.payload, '$.date') = attendance.date
-                )
-                THEN 'Yes'
-                ELSE 'No'
-            END AS regularised
+def task_data_version(cur):
+    cur.execute("SELECT version FROM cache_versions WHERE name = 'tasks'")
+    row = cur.fetchone()
+    return row[0] if row else 0
 
-        FROM attendance
-        JOIN users ON users.id = attendance.user_id
-        ORDER BY attendance.date DESC
-    """)
 
-    rows = cur.fetchall()
+def invalidate_task_caches():
+    # Frees this process's entries early; correctness comes from the version
+    with _leaderboard_lock:
+        _leaderboard_cache.clear()
 
-    # Create CSV in memory
-    output = StringIO()
-    writer = csv.writer(output)
-
-    # Header
-    writer.writerow([
-        "Employee",
-        "Date",
-        "Check In",
-        "Check Out",
-        "Day Type",
-        "Late Reason",
-        "Regularised"
-    ])
 
-    # Data rows
-    for r in rows:
-        writer.writerow([
-            r["employee"],
-            r["date"],
-            r["check_in_time"] or "",
-            r["check_out_time"] or "",
-            r["day_type"],
-            r["late_comment"] or "",
-            r["regularised"]
-        ])
+def leaderboard_window_start(window, today):
+    if window == "week":
+        return (today - timedelta(days=today.weekday())).strftime("%Y-%m-%d")
+    if window == "month":
+        return today.replace(day=1).strftime("%Y-%m-%d")
+    if window == "quarter":
+        first_month = 3 * ((today.month - 1) // 3) + 1
+        return today.replace(month=first_month, day=1).strftime("%Y-%m-%d")
+    return None
 
-    output.seek(0)
 
-    return Response(
-        output,
-        mimetype="text/csv",
-        headers={
-            "Content-Disposition": "attachment; filename=attendance_log.csv"
-        }
-    )
+def compute_leaderboard(cur, today, window, weights, limit=5):
+    """
+    One grouped aggregate over tasks for every employee, scored and ranked
+    in SQL.
+    """
+    window_start = leaderboard_window_start(window, today)
+    today_str = today.strftime("%Y-%m-%d")
+
+    cur.execute("""
+        SELECT
+            name,
+            completed,
+            in_progress,
+            overdue,
+            (completed * ?) + (in_progress * ?) - (overdue * ?) AS score
+        FROM (
+            SELECT
+                u.id,
+                u.name,
+                COALESCE(SUM(CASE WHEN t.status = 'Completed' THEN 1 ELSE 0 END), 0) AS completed,
+                COALESCE(SUM(CASE WHEN t.status = 'In Progress' THEN 1 ELSE 0 END), 0) AS in_progress,
+                COALESCE(SUM(
+                    CASE WHEN t.status != 'Completed'
+                          AND t.due_date IS NOT NULL
+                          AND t.due_date < ?
+                    THEN 1 ELSE 0 END
+                ), 0) AS overdue
+            FROM users u
+            LEFT JOIN tasks t
+                ON t.assigned_to = u.id
+               AND (? IS NULL OR t.created_at >= ?)
+            WHERE u.role = 'employee'
+            GROUP BY u.id
+        )
+        ORDER BY score DESC, id
+        LIMIT ?
+    """, (
+        weights["completed"],
+        weights["in_progress"],
+        weights["overdue"],
+        today_str,
+        window_start,
+        window_start,
+        limit
+    ))
+
+    return [dict(row) for row in cur.fetchall()]
 
 
 @app.route("/employee/top-performers")
@@ -1500,70 +4114,77 @@ def employee_top_performers():
     if not user_id or role not in ["employee", "admin"]:
         return jsonify({"status": "forbidden"}), 403
 
-    today = now_ist().strftime("%Y-%m-%d")
+    window = request.args.get("window", "all")
+    if window not in LEADERBOARD_WINDOWS:
+        return jsonify({"status": "error", "message": "Invalid window"}), 400
 
-    conn = get_db()
-    cur = conn.cursor()
+    weights = dict(app.config["LEADERBOARD_WEIGHTS"])
+    for key in weights:
+        override = request.args.get(f"{key}_weight")
+        if override is None:
+            continue
+        try:
+            weights[key] = float(override)
+        except ValueError:
+            weights[key] = math.nan
+        if not math.isfinite(weights[key]):
+            return jsonify({"status": "error", "message": f"Invalid {key}_weight"}), 400
 
-    # Fetch all employees
-    cur.execute("""
-        SELECT id, name
-        FROM users
-        WHERE role = 'employee'
-    """)
-    employees = cur.fetchall()
+    today = now_ist().date()
+    cur = get_db().cursor()
 
-    leaderboard = []
+    if weights != app.config["LEADERBOARD_WEIGHTS"]:
+        return jsonify(compute_leaderboard(cur, today, window, weights))
 
-    for emp in employees:
-        emp_id = emp["id"]
-        emp_name = emp["name"]
+    cache_key = (today, window)
+    version = task_data_version(cur)
 
-        # Completed
-        cur.execute("""
-            SELECT COUNT(*) as count
-            FROM tasks
-            WHERE assigned_to = ?
-              AND status = 'Completed'
-        """, (emp_id,))
-        completed = cur.fetchone()["count"]
+    with _leaderboard_lock:
+        cached = _leaderboard_cache.get(cache_key)
+    if cached is not None and cached[0] == version:
+        return jsonify(cached[1])
 
-        # In Progress
-        cur.execute("""
-            SELECT COUNT(*) as count
-            FROM tasks
-            WHERE assigned_to = ?
-              AND status = 'In Progress'
-        """, (emp_id,))
-        in_progress = cur.fetchone()["count"]
+    leaderboard = compute_leaderboard(cur, today, window, weights)
 
-        # Overdue
-        cur.execute("""
-            SELECT COUNT(*) as count
-            FROM tasks
-            WHERE assigned_to = ?
-              AND status != 'Completed'
-              AND due_date IS NOT NULL
-              AND due_date < ?
-        """, (emp_id, today))
-        overdue = cur.fetchone()["count"]
-
-        score = (completed * 3) + (in_progress * 1) - (overdue * 2)
-
-        leaderboard.append({
-            "name": emp_name,
-            "completed": completed,
-            "in_progress": in_progress,
-            "overdue": overdue,
-            "score": score
-        })
+    with _leaderboard_lock:
+        for stale in [k for k in _leaderboard_cache if k[0] != today]:
+            del _leaderboard_cache[stale]
+        _leaderboard_cache[cache_key] = (version, leaderboard)
+
+    return jsonify(leaderboard)
 
-    # Sort by score DESC
-    leaderboard.sort(key=lambda x: x["score"], reverse=True)
 
-    # Return top 5
-    return jsonify(leaderboard[:5])
 
+# ============================ UNREAD COUNTERS =============================
+# user_counters holds, per user, how many items are new in each dashboard
+# section since the user last opened it. Write paths bump it in the same
+# transaction as the write; mark-seen resets it.
+COUNTER_SECTIONS = ["announcements", "files", "tasks", "approvals"]
+
+
+def bump_counters(cur, section, user_ids=None, role=None):
+    """
+    Increment `section` for the given users, or for every user with `role`.
+    Does not commit; call it before the write's own commit.
+    """
+    if section not in COUNTER_SECTIONS:
+        raise ValueError(f"Unknown counter section: {section}")
+
+    if role is not None:
+        cur.execute(f"""
+            UPDATE user_counters
+            SET {section} = {section} + 1
+            WHERE user_id IN (SELECT id FROM users WHERE role = ?)
+        """, (role,))
+        return
+
+    rows = [(int(u),) for u in user_ids if u is not None]
+    cur.executemany(
+        "INSERT OR IGNORE INTO user_counters (user_id) VALUES (?)", rows
+    )
+    cur.executemany(
+        f"UPDATE user_counters SET {section} = {section} + 1 WHERE user_id = ?", rows
+    )
 
 
 @app.route('/employee/mark-seen', methods=['POST'])
@@ -1577,16 +4198,14 @@ def mark_seen():
     data = request.get_json()
     section = data.get("section")
 
-    if section not in ["announcements", "files", "tasks", "approvals"]:
+    if section not in COUNTER_SECTIONS:
         return jsonify({"status": "error"}), 400
 
-    column = f"{section}_last_seen"
-
     conn = get_db()
     cur = conn.cursor()
     cur.execute(
-        f"UPDATE users SET {column}=? WHERE id=?",
-        (now_ts(), user_id)
+        f"UPDATE user_counters SET {section} = 0, {section}_seen_at = ? WHERE user_id = ?",
+        (int(now_ist().timestamp()), user_id)
     )
     conn.commit()
 
@@ -1594,83 +4213,32 @@ def mark_seen():
 
 
 
-@app.route("/employee/has-new")
-def has_new():
-    
-    user_id = session.get("user_id")
-    role = session.get("role")
-
-    if not user_id or role != "employee":
-        return jsonify({"status": "forbidden"}), 403
-
-    conn = get_db()
-    cur = conn.cursor()
-
+def compute_has_new(cur, user_id):
+    """
+    Per-section counts of items new since the user last looked.
+    """
     cur.execute("""
-        SELECT
-            announcements_last_seen,
-            files_last_seen,
-            tasks_last_seen,
-            approvals_last_seen
-        FROM users
-        WHERE id=?
+        SELECT announcements, files, tasks, approvals
+        FROM user_counters
+        WHERE user_id = ?
     """, (user_id,))
-    user = cur.fetchone()
-
-    ann_seen = user["announcements_last_seen"] or "1970-01-01T00:00:00+00:00"
-    file_seen = user["files_last_seen"] or "1970-01-01T00:00:00+00:00"
-    task_seen = user["tasks_last_seen"] or "1970-01-01T00:00:00+00:00"
-
-    cur.execute(
-        "SELECT 1 FROM announcements WHERE created_at > ? LIMIT 1",
-        (ann_seen,)
-    )
-    new_ann = cur.fetchone() is not None
+    row = cur.fetchone()
 
-    cur.execute(
-        "SELECT 1 FROM files WHERE uploaded_at > ? LIMIT 1",
-        (file_seen,)
-    )
-    new_files = cur.fetchone() is not None
+    if not row:
+        return {section: 0 for section in COUNTER_SECTIONS}
+    return dict(row)
 
-    cur.execute("""
-        SELECT 1 FROM tasks
-        WHERE assigned_to = ?
-        AND (
-            created_at > ?
-            OR (
-                updated_at > ?
-                AND updated_by_role = 'admin'
-            )
-        )
-        LIMIT 1
-    """, (user_id, task_seen, task_seen))
 
-    new_tasks = cur.fetchone() is not None
+@app.route("/employee/has-new")
+def has_new():
 
-    # --- approvals ---
-    cur.execute("""
-        SELECT 1
-        FROM approvals
-        WHERE employee_id = ?
-        AND (
-            approved_at IS NOT NULL
-            AND approved_at > ?
-        )
-        LIMIT 1
-    """, (
-        user_id,
-        user["approvals_last_seen"] or "1970-01-01 00:00:00"
-    ))
+    user_id = session.get("user_id")
+    role = session.get("role")
 
-    new_approvals = cur.fetchone() is not None
+    if not user_id or role != "employee":
+        return jsonify({"status": "forbidden"}), 403
 
-    return jsonify({
-    "announcements": new_ann,
-    "files": new_files,
-    "tasks": new_tasks,
-    "approvals": new_approvals
-})
+    return jsonify(compute_has_new(get_db().cursor(), user_id))
 
 
 @app.route("/employee/attendance")
@@ -1681,57 +4249,71 @@ def employee_attendance():
     if not user_id or role != "employee":
         return jsonify({"status": "forbidden"}), 403
 
+    limit, cursor, error = page_args()
+    if error:
+        return error
+
+    where = ["user_id = ?"]
+    params = [user_id]
+    list_filters(where, params, status="status", date="date")
+
+    # Unless ?from= starts inside the hot window, read through the archive
     conn = get_db()
+    source = history_source(conn, "attendance", request.args.get("from"))
     cur = conn.cursor()
 
+    # Counters cover every matching day, not just the page being returned
+    cur.execute(f"""
+        SELECT
+            COUNT(*) AS total,
+            COALESCE(SUM(CASE WHEN status = 'Present' THEN 1 ELSE 0 END), 0) AS present,
+            COALESCE(SUM(CASE WHEN status = 'Present' AND day_type = 'HALF' THEN 1 ELSE 0 END), 0) AS late
+        FROM {source}
+        WHERE {' AND '.join(where)}
+    """, params)
+    counts = cur.fetchone()
+
     # Fetch attendance records (latest first)
-    cur.execute("""
+    rows, _, next_cursor = keyset_page(
+        cur,
+        """
         SELECT
+            id,
             date,
             status,
             check_in_time,
             check_out_time,
             day_type,
             late_comment
-        FROM attendance
-        WHERE user_id = ?
-        ORDER BY date DESC
-    """, (user_id,))
-
-    rows = cur.fetchall()
-
-    # Counters
-    present = 0
-    absent = 0
-    late = 0
-
-    records = []
-
-    for r in rows:
-        if r["status"] == "Present":
-            present += 1
-            if r["day_type"] == "HALF":
-                late += 1
-        else:
-            absent += 1
+        FROM """ + source + """
+        """,
+        where, params,
+        sort=["date", "id"],
+        limit=limit, cursor=cursor
+    )
 
-        records.append({
+    records = [
+        {
+            "id": r["id"],
             "date": r["date"],
             "status": r["status"],
             "day_type": r["day_type"],
             "check_in": r["check_in_time"],
             "check_out": r["check_out_time"],
             "late_comment": r["late_comment"]
-        })
-    total = len(rows)
+        }
+        for r in rows
+    ]
 
-    return jsonify({
-        "present": present,
-        "absent": absent,
-        "late": late,
-        "total": total,
-        "records": records
+    response = jsonify({
+        "present": counts["present"],
+        "absent": counts["total"] - counts["present"],
+        "late": counts["late"],
+        "total": counts["total"],
+        "records": records,
+        "next_cursor": next_cursor
     })
+    return paginated(response, counts["total"], next_cursor)
 
 def is_on_approved_leave(user_id, date_str):
     conn = get_db()
@@ -1743,11 +4325,10 @@ def is_on_approved_leave(user_id, date_str):
         WHERE employee_id = ?
           AND type = 'leave'
           AND status = 'Approved'
-          AND ? BETWEEN
-              json_extract(payload, '$.from_date')
-              AND json_extract(payload, '$.to_date')
+          AND leave_from <= ?
+          AND leave_to >= ?
         LIMIT 1
-    """, (user_id, date_str))
+    """, (user_id, date_str, date_str))
 
     return cur.fetchone() is not None
 
@@ -1778,7 +4359,7 @@ def get_employee_approvals():
             LEFT JOIN users u ON a.approved_by = u.id
             WHERE a.employee_id = ?
               AND a.type = ?
-            ORDER BY datetime(a.created_at) DESC
+            ORDER BY a.created_key DESC, a.id DESC
         """, (session["user_id"], approval_type))
     else:
         cur.execute("""
@@ -1794,7 +4375,7 @@ def get_employee_approvals():
             FROM approvals a
             LEFT JOIN users u ON a.approved_by = u.id
             WHERE a.employee_id = ?
-            ORDER BY datetime(a.created_at) DESC
+            ORDER BY a.created_key DESC, a.id DESC
         """, (session["user_id"],))
 
     rows = cur.fetchall()
@@ -1875,7 +4456,7 @@ def submit_employee_approval():
                 employee_id = ?
                 AND type = 'regularisation'
                 AND status IN ('Pending', 'Approved')
-                AND json_extract(payload, '$.date') = ?
+                AND reg_date = ?
         """, (session["user_id"], reg_date))
 
         existing = cur.fetchone()
@@ -2004,18 +4585,7 @@ def employee_admins():
     if session.get("role") != "employee":
         return jsonify({"status": "forbidden"}), 403
 
-    conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT id, name, email
-        FROM users
-        WHERE role = 'admin'
-        ORDER BY name
-    """)
-
-    admins = [dict(row) for row in cur.fetchall()]
-    return jsonify(admins)
+    return reference_response(("admins",), load_admins)
 
 
 @app.route("/employee/notifications")
@@ -2028,14 +4598,47 @@ def get_employee_notifications():
     conn = get_db()
     cur = conn.cursor()
 
+    cur.execute("""
+        SELECT role, broadcast_read_upto, broadcast_cleared_upto
+        FROM users
+        WHERE id = ?
+    """, (user_id,))
+    user = cur.fetchone()
+
+    # Personal notifications plus the role's broadcasts that this user has
+    # not cleared; broadcasts at or below the read mark count as read.
     cur.execute("""
         SELECT *
-        FROM notifications
-        WHERE user_id = ?
-        AND archived = 0
+        FROM (
+            SELECT
+                id, user_id, actor_name, type, title, message,
+                reference_type, reference_id, is_read, created_at, archived,
+                0 AS broadcast
+            FROM notifications
+            WHERE user_id = ?
+            AND archived = 0
+
+            UNION ALL
+
+            SELECT
+                id, ? AS user_id, actor_name, type, title, message,
+                reference_type, reference_id,
+                CASE WHEN id <= ? THEN 1 ELSE 0 END AS is_read,
+                created_at, 0 AS archived,
+                1 AS broadcast
+            FROM broadcast_notifications
+            WHERE audience = ?
+            AND id > ?
+        )
         ORDER BY created_at DESC
         LIMIT 50
-    """, (user_id,))
+    """, (
+        user_id,
+        user_id,
+        user["broadcast_read_upto"] or 0,
+        user["role"],
+        user["broadcast_cleared_upto"] or 0
+    ))
 
     return jsonify([dict(row) for row in cur.fetchall()])
 
@@ -2052,7 +4655,13 @@ def mark_notifications_read():
     cur.execute("""
         UPDATE notifications
         SET is_read = 1
-        WHERE user_id = ?
+        WHERE user_id = ? AND is_read = 0
+    """, (session["user_id"],))
+
+    cur.execute("""
+        UPDATE users
+        SET broadcast_read_upto = (SELECT COALESCE(MAX(id), 0) FROM broadcast_notifications)
+        WHERE id = ?
     """, (session["user_id"],))
 
     conn.commit()
@@ -2073,7 +4682,13 @@ def clear_notifications():
     cur.execute("""
         UPDATE notifications
         SET archived = 1
-        WHERE user_id = ?
+        WHERE user_id = ? AND archived = 0
+    """, (user_id,))
+
+    cur.execute("""
+        UPDATE users
+        SET broadcast_cleared_upto = (SELECT COALESCE(MAX(id), 0) FROM broadcast_notifications)
+        WHERE id = ?
     """, (user_id,))
 
     conn.commit()
@@ -2086,8 +4701,19 @@ def submit_reimbursement():
         return jsonify({"status": "forbidden"}), 403
 
     bill = request.files["bill"]
-    filename = f"reimb_{int(datetime.now().timestamp())}_{bill.filename}"
-    bill.save(os.path.join(app.config["UPLOAD_FOLDER"], filename))
+    if reimbursement_amount(request.form) is None:
+        return jsonify({"status": "error", "message": "Invalid amount"}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+
+    filename, sha256, _ = blobstore.store_upload(
+        cur,
+        app.config["BLOB_ROOT"],
+        bill,
+        f"reimb_{int(datetime.now().timestamp())}_{secure_filename(bill.filename)}",
+        legacy_dir=app.config["UPLOAD_FOLDER"]
+    )
 
     payload = {
         "category": request.form["category"],
@@ -2096,9 +4722,6 @@ def submit_reimbursement():
         "bill_file": filename
     }
 
-    conn = get_db()
-    cur = conn.cursor()
-
     cur.execute("""
         INSERT INTO approvals
         (type, payload, status, employee_id, assigned_to, created_at)
@@ -2112,6 +4735,7 @@ def submit_reimbursement():
     ))
 
     conn.commit()
+    thumbnail_pool.submit(blobstore.blob_path(app.config["BLOB_ROOT"], sha256), sha256)
 
     create_notification(
         user_id=request.form["assigned_to"],
@@ -2158,19 +4782,327 @@ def employee_get_remunerations():
     if session.get("role") != "employee":
         return jsonify({"status": "forbidden"}), 403
 
-    conn = get_db()
+    limit, cursor, error = page_args()
+    if error:
+        return error
+
+    where = ["employee_id = ?"]
+    params = [session["user_id"]]
+    list_filters(where, params, status="status", date="created_at", text=("reason", "type"))
+
+    rows, total, next_cursor = keyset_page(
+        get_db().cursor(),
+        "SELECT * FROM remunerations",
+        where, params,
+        sort=["created_at", "id"],
+        limit=limit, cursor=cursor
+    )
+    return paginated(jsonify(rows), total, next_cursor)
+
+# =============================== DELTA SYNC ===============================
+# /sync?since=<seq> returns only the rows that changed after `seq`, read
+# from the change log of migration 15. The log says which rows changed and
+# for whom; each row is then re-read through its list's own visibility rule
+# (every `?` is the current user's id) and in its list's shape. A changed
+# row the caller can no longer see (deleted, reassigned, archived) comes
+# back as a delete. "everyone" kinds ignore the log's audience for that
+# role (admins see every task, not just their own).
+#
+# Clients take a seq (/sync with no `since`) before loading a list in full,
+# then ask for changes since it. Log rows older than SYNC_RETENTION_DAYS
+# are pruned; a client behind the pruned horizon gets "reset" and reloads.
+def approval_row(row):
+    item = dict(row)
+    item["payload"] = json.loads(item["payload"])
+    return item
+
+
+def attendance_row(row):
+    item = dict(row)
+    item["overtime_minutes"] = max(0, item["worked_minutes"] - STANDARD_DAY_MINUTES)
+    return item
+
+
+SYNC_ENTITIES = {
+    "tasks": {
+        "employee": {
+            "select": "SELECT * FROM tasks",
+            "visible": "assigned_to = ?",
+            "id": "id",
+            "order": "created_key DESC, id DESC"
+        },
+        "admin": {
+            "select": """
+                SELECT tasks.id, tasks.title, tasks.description, tasks.due_date, tasks.status,
+                       tasks.assigned_to, users.name AS employee_name
+                FROM tasks
+                JOIN users ON tasks.assigned_to = users.id
+            """,
+            "visible": "1",
+            "id": "tasks.id",
+            "order": "tasks.id DESC",
+            "everyone": True
+        }
+    },
+    "approvals": {
+        "employee": {
+            "select": """
+                SELECT a.id, a.type, a.status, a.payload, a.created_at, a.approved_at,
+                       a.rejection_reason, u.name AS approver_name
+                FROM approvals a
+                LEFT JOIN users u ON a.approved_by = u.id
+            """,
+            "visible": "a.employee_id = ?",
+            "id": "a.id",
+            "order": "a.created_key DESC, a.id DESC",
+            "row": approval_row
+        },
+        "admin": {
+            "select": """
+                SELECT a.id, u.name AS employee, a.type, a.status, a.payload, a.created_at
+                FROM approvals a
+                JOIN users u ON a.employee_id = u.id
+            """,
+            "visible": "a.assigned_to = ?",
+            "id": "a.id",
+            "order": "a.created_key DESC, a.id DESC",
+            "row": approval_row
+        }
+    },
+    "notifications": {
+        "employee": {
+            "select": """
+                SELECT
+                    id, user_id, actor_name, type, title, message,
+                    reference_type, reference_id, is_read, created_at, archived,
+                    0 AS broadcast
+                FROM notifications
+            """,
+            "visible": "user_id = ? AND archived = 0",
+            "id": "id",
+            "order": "created_at DESC"
+        }
+    },
+    "broadcasts": {
+        "employee": {
+            "select": """
+                SELECT
+                    b.id, u.id AS user_id, b.actor_name, b.type, b.title, b.message,
+                    b.reference_type, b.reference_id,
+                    CASE WHEN b.id <= COALESCE(u.broadcast_read_upto, 0) THEN 1 ELSE 0 END AS is_read,
+                    b.created_at, 0 AS archived,
+                    1 AS broadcast
+                FROM broadcast_notifications b
+                JOIN users u ON u.id = ? AND b.audience = u.role
+            """,
+            "visible": "b.id > COALESCE(u.broadcast_cleared_upto, 0)",
+            "id": "b.id",
+            "order": "b.created_at DESC"
+        }
+    },
+    "attendance": {
+        "employee": {
+            "select": """
+                SELECT
+                    id, date, status, day_type,
+                    check_in_time AS check_in,
+                    check_out_time AS check_out,
+                    late_comment
+                FROM attendance
+            """,
+            "visible": "user_id = ?",
+            "id": "id",
+            "order": "date DESC, id DESC"
+        },
+        "admin": {
+            "select": None,         # admin_attendance_sql()
+            "visible": "1",
+            "id": "attendance.id",
+            "order": "attendance.date DESC, attendance.id DESC",
+            "row": attendance_row,
+            "everyone": True
+        }
+    },
+    "announcements": {
+        "employee": {
+            "select": "SELECT * FROM announcements",
+            "visible": "1",
+            "id": "id",
+            "order": "created_key DESC, id DESC"
+        },
+        "admin": {
+            "select": "SELECT * FROM announcements",
+            "visible": "1",
+            "id": "id",
+            "order": "created_key DESC, id DESC",
+            "everyone": True
+        }
+    },
+    "files": {
+        "employee": {
+            "select": "SELECT * FROM files",
+            "visible": "shared_with IN ('all', CAST(? AS TEXT))",
+            "id": "id",
+            "order": "uploaded_at DESC"
+        },
+        "admin": {
+            "select": "SELECT * FROM files",
+            "visible": "1",
+            "id": "id",
+            "order": "uploaded_key DESC, id DESC",
+            "everyone": True
+        }
+    }
+}
+SYNC_MAX_CHANGES = 500
+SYNC_RETENTION_DAYS = 30
+
+
+def change_seq(cur):
+    """
+    Newest seq in the change log (AUTOINCREMENT never hands one out twice),
+    or the horizon once pruning has emptied the log.
+    """
+    cur.execute("SELECT MAX(seq) FROM changes")
+    return max(cur.fetchone()[0] or 0, change_horizon(cur))
+
+
+def change_horizon(cur):
+    cur.execute("SELECT version FROM cache_versions WHERE name = 'changes_horizon'")
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def prune_changes(conn):
+    """
+    Drop change log rows older than SYNC_RETENTION_DAYS and move the horizon
+    up to the newest seq dropped. Returns the number of rows removed. Runs
+    after each partition archiver pass, never on a /sync request.
+    """
     cur = conn.cursor()
+    cur.execute("""
+        SELECT MAX(seq) FROM changes
+        WHERE changed_at < datetime('now', ?)
+    """, (f"-{SYNC_RETENTION_DAYS} days",))
+    row = cur.fetchone()
+    if row[0] is None:
+        return 0
 
+    cur.execute("DELETE FROM changes WHERE seq <= ?", (row[0],))
+    removed = cur.rowcount
     cur.execute("""
-        SELECT *
-        FROM remunerations
-        WHERE employee_id = ?
-        ORDER BY created_at DESC
-    """, (session["user_id"],))
+        UPDATE cache_versions SET version = MAX(version, ?)
+        WHERE name = 'changes_horizon'
+    """, (row[0],))
+    conn.commit()
+    return removed
 
-    rows = cur.fetchall()
-    return jsonify([dict(r) for r in rows])
+
+partition_archiver.jobs.append(prune_changes)
+
+
+def changed_rows(cur, spec, user_id, ids):
+    """
+    The rows among `ids` that the user can see, in the list's shape.
+    """
+    select = spec["select"] or admin_attendance_sql()
+    visible = spec["visible"]
+    cur.execute(f"""
+        {select}
+        WHERE {visible} AND {spec["id"]} IN ({", ".join("?" for _ in ids)})
+        ORDER BY {spec["order"]}
+    """, [user_id] * (select.count("?") + visible.count("?")) + list(ids))
+
+    shape = spec.get("row", dict)
+    return [shape(row) for row in cur.fetchall()]
+
+
+@app.route("/sync")
+def sync():
+    """
+    ?since=   seq from the previous call; omit it to just get the current seq
+    ?types=   comma-separated kinds (default: every kind the role can see)
+
+    {"seq": next since, "more": true when another call is needed to catch
+     up, "changes": {kind: {"upserted": [rows], "deleted": [ids]}}}, or
+    {"seq": ..., "reset": true} when the client must reload its lists.
+    """
+    user_id = session.get("user_id")
+    role = session.get("role")
+    if not user_id or role not in ("admin", "employee"):
+        return jsonify({"status": "forbidden"}), 403
+
+    kinds = [k for k in request.args.get("types", ",".join(SYNC_ENTITIES)).split(",") if k]
+    unknown = [k for k in kinds if k not in SYNC_ENTITIES]
+    if unknown:
+        return jsonify({"status": "error", "message": f"Unknown type: {unknown[0]}"}), 400
+    specs = {k: SYNC_ENTITIES[k][role] for k in kinds if role in SYNC_ENTITIES[k]}
+
+    since = request.args.get("since")
+    if since is not None and not since.isdigit():
+        return jsonify({"status": "error", "message": "Invalid since"}), 400
+
+    conn = get_db()
+    cur = conn.cursor()
+
+    # Read first: anything committed after this is picked up next time
+    seq = change_seq(cur)
+    if since is None:
+        return jsonify({"seq": seq})
+
+    since = int(since)
+    if since < change_horizon(cur) or since > seq:
+        return jsonify({"seq": seq, "reset": True})
+
+    everyone = [k for k, spec in specs.items() if spec.get("everyone")]
+    own = [k for k in specs if k not in everyone]
+    audience = []
+    params = [since, seq]
+    if everyone:
+        audience.append(f"entity IN ({', '.join('?' for _ in everyone)})")
+        params.extend(everyone)
+    if own:
+        audience.append(f"(user_id IN (0, ?) AND entity IN ({', '.join('?' for _ in own)}))")
+        params.extend([user_id, *own])
+    if not audience:
+        return jsonify({"seq": seq, "more": False, "changes": {}})
+
+    cur.execute(f"""
+        SELECT seq, entity, row_id
+        FROM changes
+        WHERE seq > ? AND seq <= ? AND ({" OR ".join(audience)})
+        ORDER BY seq
+        LIMIT ?
+    """, params + [SYNC_MAX_CHANGES + 1])
+    log = cur.fetchall()
+
+    more = len(log) > SYNC_MAX_CHANGES
+    if more:
+        log = log[:SYNC_MAX_CHANGES]
+        seq = log[-1]["seq"]
+
+    changed = {}
+    for row in log:
+        changed.setdefault(row["entity"], {})[row["row_id"]] = True
+
+    changes = {}
+    for kind, ids in changed.items():
+        rows = changed_rows(cur, specs[kind], user_id, ids)
+        found = {row["id"] for row in rows}
+        changes[kind] = {
+            "upserted": rows,
+            "deleted": [i for i in ids if i not in found]
+        }
+
+    response = jsonify({"seq": seq, "more": more, "changes": changes})
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
 # ================================ RUN APP ================================
+# Development server. For production use the multi-worker launcher
+# (python serve.py, see serve.py) or a single ASGI process
+# (uvicorn asgi:application, see asgi.py).
 if __name__ == "__main__":
+    outbox_dispatcher.start()
+    partition_archiver.start()
     app.run()
@@ -0,0 +1,408 @@
+# ============================ PARTITION ARCHIVE ===========================
+"""
+Time-partitioned archival for the tables that only ever grow: attendance,
+notifications and activity_log.
+
+Rows of closed periods move out of database.db into one SQLite file per
+calendar year, <archive_dir>/<YYYY>.db, holding the same tables with the
+same ids. What counts as closed is a per-table policy (default_policies):
+an attendance year once it has been over for `grace_days`, notifications
+and activity log entries once they are older than `days`. The hot database
+then only holds recent rows and stays small enough to live in the page
+cache.
+
+Moving is online and resumable. Rows go over in batches of `batch_rows`,
+each as two short transactions: copy into the archive file (INSERT OR
+REPLACE, so repeating a batch is harmless), then delete from the hot table
+only the rows the archive now holds. A pass interrupted anywhere, even
+between the two, is finished by the next one; until then the read-through
+views hide the hot copy's duplicate.
+
+Reads: read_through(conn, table, since) returns the hot table when `since`
+is newer than everything archived, otherwise a TEMP <table>_history view
+(hot rows UNION ALL every attached partition) built on that connection.
+
+Usage:
+    python archive.py             # run one archival pass now
+    python archive.py --status    # partitions and row counts
+    python archive.py --compact   # switch database.db to incremental
+                                  # auto-vacuum and VACUUM it (offline)
+"""
+import argparse
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from migrations import migrate
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, "database.db")
+ARCHIVE_DIR = os.path.join(BASE_DIR, "archive", "partitions")
+
+TABLES = ("attendance", "notifications", "activity_log")
+
+
+def today_ist():
+    return datetime.now(ZoneInfo("Asia/Kolkata")).date()
+
+
+def closed_years(grace_days):
+    """
+    Cutoff for whole calendar years: a year is archived once it ended more
+    than `grace_days` ago (late regularisations land first).
+    """
+    return lambda today: f"{(today - timedelta(days=grace_days)).year}-01-01"
+
+
+def older_than(days):
+    return lambda today: (today - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def default_policies(attendance_grace_days=90, notification_days=90, activity_log_days=90):
+    """
+    table -> (date column, cutoff(today) -> 'YYYY-MM-DD'); rows dated
+    before the cutoff are archived.
+    """
+    return {
+        "attendance": ("date", closed_years(attendance_grace_days)),
+        "notifications": ("created_at", older_than(notification_days)),
+        "activity_log": ("timestamp", older_than(activity_log_days))
+    }
+
+
+def schema_name(period):
+    return f"archive_{period}"
+
+
+# ============================== READ-THROUGH ===============================
+def table_columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def attach(conn, path, schema):
+    """
+    Attach `path` as `schema` unless it already is. SQLite only allows this
+    outside a transaction.
+    """
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if schema in attached:
+        return
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    conn.execute(f"PRAGMA {schema}.journal_mode=WAL")
+
+
+def attach_archives(conn, archive_dir=ARCHIVE_DIR):
+    """
+    Attach every registered partition (newest first, up to SQLite's attach
+    limit) and build the TEMP <table>_history views over them. Views are
+    only rebuilt when the set of partitions they cover changed.
+    """
+    partitions = {}
+    for row in conn.execute("""
+        SELECT table_name, period FROM archive_partitions
+        ORDER BY period DESC
+    """):
+        partitions.setdefault(row[0], []).append(row[1])
+
+    periods = sorted({p for ps in partitions.values() for p in ps}, reverse=True)
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(periods) > limit:
+        print(f"⚠️ {len(periods) - limit} archive partition(s) beyond the attach limit are not readable")
+        periods = periods[:limit]
+
+    for period in periods:
+        attach(conn, os.path.join(archive_dir, f"{period}.db"), schema_name(period))
+
+    for table in TABLES:
+        covered = [p for p in partitions.get(table, []) if p in periods]
+        signature = f"/* partitions: {','.join(covered) or '-'} */"
+        current = conn.execute(
+            "SELECT sql FROM sqlite_temp_master WHERE type = 'view' AND name = ?",
+            (f"{table}_history",)
+        ).fetchone()
+        if current and signature in current[0]:
+            continue
+
+        columns = table_columns(conn, "main", table)
+        arms = [f"SELECT {', '.join(columns)} FROM main.{table}"]
+        for period in covered:
+            schema = schema_name(period)
+            present = set(table_columns(conn, schema, table))
+            select = ", ".join(c if c in present else f"NULL AS {c}" for c in columns)
+            # A batch copied but not yet deleted is read from the hot table only
+            arms.append(f"""
+                SELECT {select} FROM {schema}.{table} a
+                WHERE NOT EXISTS (SELECT 1 FROM main.{table} h WHERE h.id = a.id)
+            """)
+
+        conn.execute(f"DROP VIEW IF EXISTS temp.{table}_history")
+        conn.execute(f"""
+            CREATE TEMP VIEW {table}_history AS {signature}
+            {" UNION ALL ".join(arms)}
+        """)
+
+
+def read_through(conn, table, since=None, archive_dir=ARCHIVE_DIR):
+    """
+    Table or view name to read `table` from for rows dated `since`
+    (YYYY-MM-DD) or later; None means all of history.
+    """
+    horizon = conn.execute(
+        "SELECT MAX(cutoff) FROM archive_partitions WHERE table_name = ?", (table,)
+    ).fetchone()[0]
+    if horizon is None or (since and since >= horizon):
+        return table
+
+    attach_archives(conn, archive_dir)
+    return f"{table}_history"
+
+
+# ================================ ARCHIVER =================================
+class PartitionArchiver:
+
+    def __init__(
+        self,
+        connect,
+        archive_dir=ARCHIVE_DIR,
+        policies=None,
+        batch_rows=2000,
+        interval=3600.0,
+        start_delay=60.0,
+        jobs=None
+    ):
+        self.connect = connect
+        self.archive_dir = archive_dir
+        self.policies = policies if policies is not None else default_policies()
+        self.batch_rows = batch_rows
+        self.interval = interval
+        self.start_delay = start_delay
+        # Other retention work sharing the schedule: callables taking the
+        # pass's connection, run after the tables are archived
+        self.jobs = list(jobs or [])
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="partition-archiver", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Stop after the current batch; the next pass resumes from there.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        delay = self.start_delay
+        while not self._stop.wait(delay):
+            delay = self.interval
+            try:
+                self.run_once()
+            except Exception as e:
+                print("⚠️ Partition archiver error:", e)
+
+    def run_once(self, today=None):
+        """
+        One pass over every table. Returns {table: rows moved}.
+        """
+        today = today or today_ist()
+        moved = {}
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        with self.connect() as conn:
+            for table, (column, cutoff) in self.policies.items():
+                moved[table] = self.archive_table(conn, table, column, cutoff(today))
+                if moved[table]:
+                    print(f"🗄️ Archived {moved[table]} {table} rows dated before {cutoff(today)}")
+
+            for job in self.jobs:
+                try:
+                    job(conn)
+                except Exception as e:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    print(f"⚠️ Retention job {job.__name__} failed:", e)
+
+            if any(moved.values()):
+                self.reclaim(conn)
+        return moved
+
+    def archive_table(self, conn, table, column, cutoff):
+        moved = 0
+        prepared = {}
+        while not self._stop.is_set():
+            if conn.in_transaction:
+                conn.commit()
+            rows = conn.execute(f"""
+                SELECT id, substr({column}, 1, 4)
+                FROM main.{table}
+                WHERE {column} < ? AND {column} GLOB '[0-9][0-9][0-9][0-9]-*'
+                ORDER BY {column}
+                LIMIT ?
+            """, (cutoff, self.batch_rows)).fetchall()
+            if not rows:
+                break
+
+            by_period = {}
+            for row_id, period in rows:
+                by_period.setdefault(period, []).append(row_id)
+            batch = 0
+            for period, ids in sorted(by_period.items()):
+                if period not in prepared:
+                    prepared[period] = self.prepare(conn, table, column, period, cutoff)
+                batch += self.move(conn, table, period, *prepared[period], ids)
+
+            if not batch:
+                break       # nothing could be moved; don't spin on it
+            moved += batch
+        return moved
+
+    def prepare(self, conn, table, column, period, cutoff):
+        """
+        Attach the period's file, create or widen its copy of `table`, and
+        register the partition (so read-through views include it) before
+        any row moves. Returns (schema, columns).
+        """
+        schema = schema_name(period)
+        attach(conn, os.path.join(self.archive_dir, f"{period}.db"), schema)
+
+        columns = table_columns(conn, "main", table)
+        types = {
+            row[1]: row[2]
+            for row in conn.execute(f"PRAGMA main.table_info({table})")
+        }
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {schema}.{table} (
+                    id INTEGER PRIMARY KEY,
+                    {", ".join(f"{c} {types[c]}" for c in columns if c != "id")}
+                )
+            """)
+            present = set(table_columns(conn, schema, table))
+            for c in columns:
+                if c not in present:
+                    conn.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {c} {types[c]}")
+            conn.execute(f"""
+                CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_{column}
+                ON {table}({column})
+            """)
+            conn.execute("""
+                INSERT INTO main.archive_partitions (table_name, period, cutoff, rows, updated_at)
+                VALUES (?, ?, ?, 0, ?)
+                ON CONFLICT(table_name, period)
+                DO UPDATE SET cutoff = MAX(cutoff, excluded.cutoff)
+            """, (table, period, cutoff, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return schema, columns
+
+    def move(self, conn, table, period, schema, columns, ids):
+        cols = ", ".join(columns)
+        marks = ", ".join("?" for _ in ids)
+
+        # 1. Copy. Only the archive file is written, so this commits atomically.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {schema}.{table} ({cols})
+                SELECT {cols} FROM main.{table} WHERE id IN ({marks})
+            """, ids)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        # 2. Delete from the hot table whatever the archive holds now. The
+        #    guard row keeps the delete triggers (change feed, summary cache)
+        #    quiet: the rows moved, they were not deleted.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO main.trigger_guards (name) VALUES ('archive')")
+            removed = conn.execute(f"""
+                DELETE FROM main.{table}
+                WHERE id IN ({marks})
+                  AND id IN (SELECT id FROM {schema}.{table} WHERE id IN ({marks}))
+            """, ids + ids).rowcount
+            conn.execute("DELETE FROM main.trigger_guards WHERE name = 'archive'")
+            conn.execute("""
+                UPDATE main.archive_partitions
+                SET rows = rows + ?, updated_at = ?
+                WHERE table_name = ? AND period = ?
+            """, (removed, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), table, period))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return removed
+
+    def reclaim(self, conn):
+        """
+        Hand freed pages back to the filesystem when database.db uses
+        incremental auto-vacuum (see --compact); otherwise SQLite reuses
+        them for new rows and the file simply stops growing.
+        """
+        if conn.execute("PRAGMA main.auto_vacuum").fetchone()[0] == 2:
+            conn.execute("PRAGMA main.incremental_vacuum")
+            conn.commit()
+
+
+# ================================== CLI ===================================
+@contextmanager
+def connect_db(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive closed periods out of database.db")
+    parser.add_argument("--db", default=DB_PATH, help="path to the SQLite database")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--status", action="store_true", help="list partitions and exit")
+    parser.add_argument("--compact", action="store_true",
+                        help="enable incremental auto-vacuum and VACUUM (needs exclusive access)")
+    args = parser.parse_args()
+
+    with connect_db(args.db) as conn:
+        migrate(conn)
+        if args.status:
+            for table, period, rows, cutoff in conn.execute("""
+                SELECT table_name, period, rows, cutoff FROM archive_partitions
+                ORDER BY table_name, period
+            """):
+                print(f"{table:<15} {period}  {rows:>10} rows  (cutoff {cutoff})")
+            return 0
+
+        if args.compact:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            print("Compacted; freed pages are now returned after each archival pass.")
+            return 0
+
+    moved = PartitionArchiver(lambda: connect_db(args.db), args.archive_dir).run_once()
+    print(", ".join(f"{table}: {n}" for table, n in moved.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
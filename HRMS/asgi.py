@@ -0,0 +1,222 @@
+# ============================== ASGI ENTRY POINT ==========================
+"""
+ASGI entry point for running the HRMS app under uvicorn:
+
+    pip install uvicorn asgiref
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+
+The app's routes are WSGI (Flask) and run on a bounded thread pool
+(ASGI_THREADS), where SQLite and file I/O block only that thread. Request
+bodies are spooled by the adapter before Flask streams them to the blob store.
+
+Long-lived connections are what exhaust a thread-per-request server, so
+/events (Server-Sent Events) is served natively on the event loop: each open
+dashboard costs one asyncio queue instead of a thread. Its one database read
+(the snapshot) is offloaded to the thread pool. Sessions are the same signed
+Flask cookie, decoded with the app's own session serializer.
+
+Outbound WhatsApp calls never happen on the request path: they go through
+the outbox dispatcher thread (outbox.py), which is started at lifespan
+startup and reuses one pooled HTTP session. The partition archiver
+(archive.py) is started and stopped alongside it.
+"""
+import asyncio
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import (
+    app,
+    pooled_db,
+    event_broker,
+    events_snapshot,
+    sse_message,
+    outbox_dispatcher,
+    partition_archiver,
+    SSE_KEEPALIVE_SECONDS,
+    SSE_QUEUE_SIZE
+)
+
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 32))
+
+
+class ThreadPoolWsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs every WSGI call on one shared thread by default
+    # (thread_sensitive=True); Flask requests are independent, so fan them
+    # out over the loop's default executor instead.
+    run_wsgi_app = sync_to_async(
+        WsgiToAsgiInstance.__dict__["run_wsgi_app"].func,
+        thread_sensitive=False
+    )
+
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadPoolWsgiInstance(self.wsgi_application, self.duplicate_header_limit)(
+            scope, receive, send
+        )
+
+
+wsgi_application = ThreadPoolWsgiToAsgi(app)
+
+
+class AsyncSubscriberQueue:
+    """
+    EventBroker subscriber living on an event loop. Publishers call
+    put_nowait() from request threads; delivery hops onto the loop.
+    """
+    def __init__(self, loop, maxsize=SSE_QUEUE_SIZE):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def put_nowait(self, message):
+        if self.queue.full():
+            raise queue.Full
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass    # slow client; it resyncs from the snapshot on reconnect
+
+
+def load_session(scope):
+    """
+    Decode the Flask session cookie from raw ASGI headers, the same way
+    SecureCookieSessionInterface.open_session does.
+    """
+    serializer = app.session_interface.get_signing_serializer(app)
+    if serializer is None:
+        return {}
+
+    cookies = SimpleCookie()
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            cookies.load(value.decode("latin-1"))
+
+    morsel = cookies.get(app.config["SESSION_COOKIE_NAME"])
+    if morsel is None:
+        return {}
+
+    try:
+        return serializer.loads(
+            morsel.value,
+            max_age=int(app.permanent_session_lifetime.total_seconds())
+        )
+    except Exception:
+        return {}
+
+
+def read_snapshot(user_id, role):
+    with pooled_db() as conn:
+        return events_snapshot(conn.cursor(), user_id, role)
+
+
+async def send_text(send, text, more_body=True):
+    await send({
+        "type": "http.response.body",
+        "body": text.encode("utf-8"),
+        "more_body": more_body
+    })
+
+
+async def events(scope, receive, send):
+    """
+    Native async version of app.events(): same auth, snapshot and event
+    format.
+    """
+    session = load_session(scope)
+    user_id = session.get("user_id")
+    role = session.get("role")
+
+    if not user_id:
+        await send({
+            "type": "http.response.start",
+            "status": 403,
+            "headers": [(b"content-type", b"application/json")]
+        })
+        await send_text(send, '{"status": "forbidden"}', more_body=False)
+        return
+
+    loop = asyncio.get_running_loop()
+    snapshot = await loop.run_in_executor(None, read_snapshot, user_id, role)
+
+    q = AsyncSubscriberQueue(loop)
+    event_broker.subscribe(user_id, role, q)
+
+    # Resolves when the client goes away
+    disconnected = loop.create_future()
+
+    async def watch_disconnect():
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set_result(True)
+                return
+
+    watcher = asyncio.create_task(watch_disconnect())
+
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no")
+            ]
+        })
+        await send_text(send, "retry: 5000\n\n")
+        await send_text(send, sse_message("snapshot", snapshot))
+
+        while not disconnected.done():
+            getter = asyncio.ensure_future(q.queue.get())
+            done, _ = await asyncio.wait(
+                {getter, disconnected},
+                timeout=SSE_KEEPALIVE_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if getter not in done:
+                getter.cancel()
+                if not disconnected.done():
+                    await send_text(send, ": keep-alive\n\n")
+                continue
+
+            event, data = getter.result()
+            await send_text(send, sse_message(event, data))
+    except OSError:
+        pass    # client went away mid-write
+    finally:
+        watcher.cancel()
+        event_broker.unsubscribe(user_id, q)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            asyncio.get_running_loop().set_default_executor(
+                ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="wsgi")
+            )
+            outbox_dispatcher.start()
+            partition_archiver.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            outbox_dispatcher.stop()
+            partition_archiver.stop()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/events" and scope["method"] == "GET":
+        await events(scope, receive, send)
+    else:
+        await wsgi_application(scope, receive, send)
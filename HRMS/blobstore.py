@@ -0,0 +1,127 @@
+# ========================== CONTENT-ADDRESSED STORE ========================
+"""
+Content-addressed storage for uploads.
+
+Every upload is hashed (SHA-256) while it is streamed to a temp file, then
+moved to  <root>/<aa>/<bb>/<sha256>  where aa/bb are the first two byte
+pairs of the hash, so no directory grows past a few entries even with
+hundreds of thousands of files. Identical content is stored once.
+
+The public name used in /uploads/<name> URLs is mapped to its content in the
+blob_names table; blobs.refcount (kept by triggers on blob_names) counts how
+many names point at a blob. Files uploaded before this store existed are
+still served from the flat uploads folder.
+"""
+import hashlib
+import os
+import tempfile
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def blob_path(root, sha256):
+    return os.path.join(root, sha256[:2], sha256[2:4], sha256)
+
+
+def write_blob(root, stream, chunk_size=CHUNK_SIZE):
+    """
+    Stream `stream` into the store in fixed-size chunks, hashing as it is
+    written. Returns (sha256, size); the blob is only written once.
+    """
+    tmp_dir = os.path.join(root, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+
+        sha256 = digest.hexdigest()
+        final_path = blob_path(root, sha256)
+
+        if os.path.exists(final_path):
+            os.remove(tmp_path)              # duplicate content
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return sha256, size
+
+
+def claim_name(cur, name, sha256, legacy_dir=None):
+    """
+    Map a public name to `sha256` (no commit) and return it. A name already
+    mapped to the same content is reused; a clash with different content (or
+    with a legacy flat file) moves on to a _1, _2, ... suffix instead of
+    overwriting it. The name is claimed by the INSERT itself, so two uploads
+    racing for the same free name cannot both get it: the loser sees its
+    insert ignored and tries the next suffix.
+    """
+    stem, ext = os.path.splitext(name)
+    candidate, n = name, 0
+
+    while True:
+        legacy = legacy_dir and os.path.exists(os.path.join(legacy_dir, candidate))
+        if not legacy:
+            cur.execute("""
+                INSERT OR IGNORE INTO blob_names (name, sha256)
+                VALUES (?, ?)
+            """, (candidate, sha256))
+            if cur.rowcount == 1:
+                return candidate
+
+            cur.execute("SELECT sha256 FROM blob_names WHERE name = ?", (candidate,))
+            row = cur.fetchone()
+            if row is not None and row["sha256"] == sha256:
+                return candidate
+
+        n += 1
+        candidate = f"{stem}_{n}{ext}"
+
+
+def register_blob(cur, name, sha256, size, legacy_dir=None):
+    """
+    Record the blob and claim a public name for it (no commit). Returns the
+    name. Triggers on blob_names keep blobs.refcount up to date.
+    """
+    cur.execute("""
+        INSERT OR IGNORE INTO blobs (sha256, size, refcount, created_at)
+        VALUES (?, ?, 0, ?)
+    """, (sha256, size, datetime.now(ZoneInfo("Asia/Kolkata")).isoformat()))
+
+    return claim_name(cur, name, sha256, legacy_dir)
+
+
+def store_upload(cur, root, file_storage, name, legacy_dir=None):
+    """
+    Save a werkzeug FileStorage under `name` (made unique if needed).
+    Returns (public_name, sha256, size).
+    """
+    sha256, size = write_blob(root, file_storage.stream)
+    name = register_blob(cur, name, sha256, size, legacy_dir)
+    return name, sha256, size
+
+
+def resolve(cur, root, name):
+    """
+    Filesystem path of the blob behind public `name`, or None when the name
+    is not in the store (legacy upload).
+    """
+    cur.execute("SELECT sha256 FROM blob_names WHERE name = ?", (name,))
+    row = cur.fetchone()
+    return blob_path(root, row["sha256"]) if row else None
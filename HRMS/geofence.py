@@ -0,0 +1,373 @@
+# ============================= OFFICE GEOFENCES ===========================
+"""
+Office geofences (circles or polygons) and an in-memory grid index over them.
+
+Each site is registered in every cell of a fixed lat/lng grid that its
+bounding box overlaps, so a check-in only tests the one or two sites near
+it instead of every site:
+
+    index = GeofenceIndex(load_offices(cur))
+    office, distance = index.match(lat, lng)
+
+`distance` is meters from the site: from a circle's centre, or from a
+polygon's edge (0 inside). When no site contains the point, `office` is None
+and `distance` is to the nearest site (None when there are no sites).
+Where sites overlap, polygons win, then the circle with the nearest centre.
+
+match_many() is the batch version used to re-validate stored attendance
+locations; with NumPy installed it is vectorized over blocks of points.
+"""
+import json
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+    print("⚠️ NumPy not installed: geofence batch re-validation runs point by point")
+
+EARTH_RADIUS_METERS = 6371000
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_METERS / 180
+
+# ~1.1 km of latitude; a typical office circle touches one to four cells
+CELL_DEGREES = 0.01
+
+# nearest() searches NEAREST_RINGS rings of cells on each grid level, every
+# level 10x coarser than the last (~11 km, ~110 km, ~1100 km at CELL_DEGREES)
+NEAREST_RINGS = 10
+GRID_LEVELS = 3
+
+# Points per NumPy block in match_many (bounds the points x sites matrices)
+BATCH_ROWS = 4096
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lng2 - lng1)
+
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def parse_polygon(value):
+    """
+    [[lat, lng], ...] (a list or its JSON) as a list of float pairs, or
+    None when it is not a polygon of at least three points.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    try:
+        points = [(float(lat), float(lng)) for lat, lng in value]
+    except (TypeError, ValueError):
+        return None
+    if len(points) < 3 or not all(
+        -90 <= lat <= 90 and -180 <= lng <= 180 for lat, lng in points
+    ):
+        return None
+    return points
+
+
+class Office:
+    """
+    One active site. Polygons are also kept projected to local meters
+    (equirectangular around their centre), which is exact enough at
+    office scale for containment and edge distance.
+    """
+    __slots__ = ("id", "name", "kind", "lat", "lng", "radius", "polygon", "xy", "scale", "bbox")
+
+    def __init__(self, id, name, kind, lat=None, lng=None, radius=None, polygon=None):
+        self.id = id
+        self.name = name
+        self.kind = kind
+        self.polygon = None
+        self.xy = None
+
+        if kind == "polygon":
+            self.polygon = polygon
+            self.lat = sum(p[0] for p in polygon) / len(polygon)
+            self.lng = sum(p[1] for p in polygon) / len(polygon)
+            self.radius = 0.0
+            self.scale = math.cos(math.radians(self.lat)) * METERS_PER_DEGREE
+            self.xy = [
+                ((p_lng - self.lng) * self.scale, (p_lat - self.lat) * METERS_PER_DEGREE)
+                for p_lat, p_lng in polygon
+            ]
+            lats = [p[0] for p in polygon]
+            lngs = [p[1] for p in polygon]
+            self.bbox = (min(lats), min(lngs), max(lats), max(lngs))
+        else:
+            self.lat, self.lng, self.radius = lat, lng, radius
+            self.scale = math.cos(math.radians(lat)) * METERS_PER_DEGREE
+            dlat = radius / METERS_PER_DEGREE
+            dlng = radius / max(self.scale, 1e-9)
+            self.bbox = (lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+
+    def locate(self, lat, lng):
+        """
+        (inside, distance in meters) for one point.
+        """
+        if self.kind == "polygon":
+            x = (lng - self.lng) * self.scale
+            y = (lat - self.lat) * METERS_PER_DEGREE
+            if point_in_polygon(x, y, self.xy):
+                return True, 0.0
+            return False, edge_distance(x, y, self.xy)
+
+        distance = haversine(lat, lng, self.lat, self.lng)
+        return distance <= self.radius, distance
+
+
+def point_in_polygon(x, y, vertices):
+    inside = False
+    x1, y1 = vertices[-1]
+    for x2, y2 in vertices:
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def edge_distance(x, y, vertices):
+    best = math.inf
+    x1, y1 = vertices[-1]
+    for x2, y2 in vertices:
+        dx, dy = x2 - x1, y2 - y1
+        length = dx * dx + dy * dy
+        t = 0.0 if length == 0 else max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / length))
+        best = min(best, math.hypot(x - (x1 + t * dx), y - (y1 + t * dy)))
+        x1, y1 = x2, y2
+    return best
+
+
+def ring_cells(i, j, ring):
+    """
+    Grid cells at Chebyshev distance `ring` from cell (i, j).
+    """
+    if ring == 0:
+        return [(i, j)]
+    cells = []
+    for d in range(-ring, ring + 1):
+        cells += [(i - ring, j + d), (i + ring, j + d)]
+    for d in range(-ring + 1, ring):
+        cells += [(i + d, j - ring), (i + d, j + ring)]
+    return cells
+
+
+def load_offices(cur):
+    """
+    Active offices from the offices table, skipping rows whose geometry is
+    unusable.
+    """
+    cur.execute("""
+        SELECT id, name, kind, latitude, longitude, radius_meters, polygon
+        FROM offices
+        WHERE active = 1
+        ORDER BY id
+    """)
+    offices = []
+    for row in cur.fetchall():
+        if row["kind"] == "polygon":
+            polygon = parse_polygon(row["polygon"])
+            if polygon:
+                offices.append(Office(row["id"], row["name"], "polygon", polygon=polygon))
+        elif row["latitude"] is not None and row["longitude"] is not None and row["radius_meters"]:
+            offices.append(Office(
+                row["id"], row["name"], "circle",
+                row["latitude"], row["longitude"], row["radius_meters"]
+            ))
+    return offices
+
+
+class GeofenceIndex:
+
+    def __init__(self, offices, cell_degrees=CELL_DEGREES):
+        self.offices = offices
+        self.cell_degrees = cell_degrees
+        # Each level is (cell size in degrees, {(row, col): [offices]}): the
+        # finest answers match(), the coarser ones keep nearest() short for
+        # points far from every site
+        self.levels = [
+            (cell_degrees * 10 ** level, self._build(cell_degrees * 10 ** level))
+            for level in range(GRID_LEVELS)
+        ]
+        self.cells = self.levels[0][1]
+
+    def _build(self, degrees):
+        cells = {}
+        for office in self.offices:
+            min_lat, min_lng, max_lat, max_lng = office.bbox
+            for i in range(math.floor(min_lat / degrees), math.floor(max_lat / degrees) + 1):
+                for j in range(math.floor(min_lng / degrees), math.floor(max_lng / degrees) + 1):
+                    cells.setdefault((i, j), []).append(office)
+        return cells
+
+    def match(self, lat, lng):
+        """
+        (office, distance) for one point; see the module docstring.
+        """
+        key_cell = (math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees))
+        best, best_key = None, None
+        for office in self.cells.get(key_cell, ()):
+            inside, distance = office.locate(lat, lng)
+            key = (office.kind != "polygon", distance)
+            if inside and (best_key is None or key < best_key):
+                best, best_key = (office, distance), key
+        if best:
+            return best
+        return None, self.nearest(lat, lng)
+
+    def nearest(self, lat, lng):
+        """
+        Distance to the closest site, searching rings of cells outwards
+        (finest grid first) until no unseen site can be closer.
+        """
+        if not self.offices:
+            return None
+
+        shrink = min(1.0, math.cos(math.radians(lat)))
+        best, seen = None, set()
+
+        for degrees, cells in self.levels:
+            i, j = math.floor(lat / degrees), math.floor(lng / degrees)
+            cell_meters = degrees * METERS_PER_DEGREE * shrink
+
+            for ring in range(NEAREST_RINGS + 1):
+                # Sites not seen yet lie entirely in this ring or further out
+                if best is not None and best <= (ring - 1) * cell_meters:
+                    return best
+                for key in ring_cells(i, j, ring):
+                    for office in cells.get(key, ()):
+                        if office.id not in seen:
+                            seen.add(office.id)
+                            distance = office.locate(lat, lng)[1]
+                            best = distance if best is None else min(best, distance)
+
+        # Far from every site
+        return min(office.locate(lat, lng)[1] for office in self.offices)
+
+    def match_many(self, lats, lngs):
+        """
+        Batch match(): two lists (matched office id or None, distance) for
+        parallel lists of coordinates.
+        """
+        if np is None or not self.offices:
+            office_ids, distances = [], []
+            for lat, lng in zip(lats, lngs):
+                office, distance = self.match(lat, lng)
+                office_ids.append(office.id if office else None)
+                distances.append(distance)
+            return office_ids, distances
+
+        office_ids, distances = [], []
+        for start in range(0, len(lats), BATCH_ROWS):
+            ids, dist = self._match_block(
+                np.asarray(lats[start:start + BATCH_ROWS], dtype=float),
+                np.asarray(lngs[start:start + BATCH_ROWS], dtype=float)
+            )
+            office_ids.extend(ids)
+            distances.extend(dist)
+        return office_ids, distances
+
+    def _match_block(self, lats, lngs):
+        n = len(lats)
+        circles = [o for o in self.offices if o.kind != "polygon"]
+        polygons = [o for o in self.offices if o.kind == "polygon"]
+
+        office_ids = np.full(n, -1)
+        distance = np.full(n, np.inf)
+        matched = np.zeros(n, dtype=bool)
+
+        # Polygons first (they win overlaps); only points inside a polygon's
+        # bounding box can be inside it
+        for office in polygons:
+            min_lat, min_lng, max_lat, max_lng = office.bbox
+            candidates = np.flatnonzero(
+                ~matched & (lats >= min_lat) & (lats <= max_lat) & (lngs >= min_lng) & (lngs <= max_lng)
+            )
+            if len(candidates):
+                x, y, edges = polygon_frame(office, lats[candidates], lngs[candidates])
+                vx, vy, px, py = edges
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    hit = ((py > y) != (vy > y)) & (x < (vx - px) * (y - py) / (vy - py) + px)
+                inside = candidates[np.count_nonzero(hit, axis=1) % 2 == 1]
+                office_ids[inside] = office.id
+                distance[inside] = 0.0
+                matched[inside] = True
+
+        if circles:
+            # Great-circle distance falls as the dot product of unit vectors
+            # rises, so one matrix product ranks every circle for every point;
+            # exact haversine is then only computed for the chosen circle
+            points = unit_vectors(lats, lngs)
+            centres = unit_vectors(
+                np.array([o.lat for o in circles]), np.array([o.lng for o in circles])
+            )
+            dots = points @ centres.T
+            within = dots >= np.cos(np.array([o.radius for o in circles]) / EARTH_RADIUS_METERS)
+
+            inside_any = within.any(axis=1)
+            choice = np.where(
+                inside_any,
+                np.where(within, dots, -np.inf).argmax(axis=1),
+                dots.argmax(axis=1)
+            )
+            c_lat = np.array([o.lat for o in circles])[choice]
+            c_lng = np.array([o.lng for o in circles])[choice]
+            c_dist = haversine_many(lats, lngs, c_lat, c_lng)
+            c_ids = np.array([o.id for o in circles])[choice]
+            c_inside = inside_any & (c_dist <= np.array([o.radius for o in circles])[choice])
+
+            take = ~matched & (c_inside | (c_dist < distance))
+            office_ids[take] = c_ids[take]
+            distance[take] = c_dist[take]
+            matched |= c_inside
+
+        # Outside every site (rare for stored check-ins): distance to the
+        # nearest polygon edge, if closer than the nearest circle
+        rest = np.flatnonzero(~matched)
+        if len(rest):
+            for office in polygons:
+                x, y, (vx, vy, px, py) = polygon_frame(office, lats[rest], lngs[rest])
+                dx, dy = vx - px, vy - py
+                length = dx * dx + dy * dy
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    t = np.where(length > 0, ((x - px) * dx + (y - py) * dy) / length, 0.0)
+                t = np.clip(t, 0.0, 1.0)
+                edge = np.hypot(x - (px + t * dx), y - (py + t * dy)).min(axis=1)
+
+                closer = edge < distance[rest]
+                office_ids[rest[closer]] = office.id
+                distance[rest[closer]] = edge[closer]
+
+        out_ids = [int(i) if m else None for i, m in zip(office_ids, matched)]
+        return out_ids, distance.tolist()
+
+
+def polygon_frame(office, lats, lngs):
+    """
+    Points as columns in the polygon's local meter frame, and its edges as
+    (x, y, previous x, previous y) rows, ready to broadcast.
+    """
+    x = ((lngs - office.lng) * office.scale)[:, None]
+    y = ((lats - office.lat) * METERS_PER_DEGREE)[:, None]
+    vx = np.array([v[0] for v in office.xy])
+    vy = np.array([v[1] for v in office.xy])
+    return x, y, (vx, vy, np.roll(vx, 1), np.roll(vy, 1))
+
+
+def unit_vectors(lats, lngs):
+    phi, lam = np.radians(lats), np.radians(lngs)
+    return np.column_stack((np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)))
+
+
+def haversine_many(lat1, lng1, lat2, lng2):
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    a = (
+        np.sin((phi2 - phi1) / 2) ** 2
+        + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
@@ -1,105 +1,13 @@
 import sqlite3
 
-conn = sqlite3.connect("database.db")
-cur = conn.cursor()
-
-# Users table
-cur.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT,
-    email TEXT UNIQUE,
-    password TEXT,
-    role TEXT
-)
-""")
-
-# Tasks table
-cur.execute("""
-CREATE TABLE IF NOT EXISTS tasks (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    title TEXT,
-    description TEXT,
-    assigned_to INTEGER,
-    due_date TEXT,
-    status TEXT DEFAULT 'pending',
-    updated_at TEXT
-)
-""")
-
-# Announcements
-cur.execute("""
-CREATE TABLE IF NOT EXISTS announcements (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    title TEXT,
-    message TEXT,
-    created_at TEXT
-)
-""")
-
-# Files table
-cur.execute("""
-CREATE TABLE IF NOT EXISTS files (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    filename TEXT,
-    uploaded_by INTEGER,
-    uploaded_at TEXT,
-    shared_with TEXT DEFAULT 'all'
-)
-""")
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS activity_log (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_name TEXT,
-    action TEXT,
-    task_id INTEGER,
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-);
-""")
-
-
+from migrations import migrate, current_version
 
-# ========================= ATTENDANCE TABLE =========================
-cur.execute("""
-CREATE TABLE IF NOT EXISTS attendance (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER NOT NULL,
-    date TEXT NOT NULL,
-    check_in_time TEXT,
-    latitude REAL,
-    longitude REAL,
-    status TEXT,   -- Present / Outside / Absent
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-
-    UNIQUE(user_id, date)
-)
-""")
-
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS attendance_audit (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-
-    employee_id INTEGER NOT NULL,
-    date TEXT NOT NULL,
-
-    before_snapshot TEXT NOT NULL,
-    after_snapshot TEXT NOT NULL,
-
-    approval_id INTEGER NOT NULL,
-    approved_by INTEGER NOT NULL,
-    approved_at TEXT NOT NULL,
+conn = sqlite3.connect("database.db")
 
-    created_at TEXT NOT NULL,
+# Tables, columns and indexes are all defined as versioned migrations
+# in migrations.py; this just brings a fresh (or old) database up to date.
+migrate(conn)
 
-    FOREIGN KEY (employee_id) REFERENCES users(id),
-    FOREIGN KEY (approved_by) REFERENCES users(id),
-    FOREIGN KEY (approval_id) REFERENCES approvals(id)
-)
-""")
+print(f"Database initialized (schema version {current_version(conn)}).")
 
-conn.commit()
 conn.close()
-
-print("Database initialized.")
\ No newline at end of file
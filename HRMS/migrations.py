@@ -0,0 +1,1261 @@
+# ============================ SCHEMA MIGRATIONS ===========================
+"""
+Versioned schema migrations for database.db.
+
+The schema version lives in PRAGMA user_version and every applied step is
+also recorded in the schema_migrations table. Migrations are idempotent, run
+in order, and each one is applied inside its own transaction.
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # show current / latest version
+    python migrations.py --check    # EXPLAIN QUERY PLAN every SQL in app.py
+"""
+import argparse
+import ast
+import os
+import sqlite3
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, "database.db")
+APP_PATH = os.path.join(BASE_DIR, "app.py")
+
+
+# ================================ HELPERS =================================
+def table_columns(cur, table):
+    # table_xinfo (unlike table_info) also lists generated columns
+    cur.execute(f"PRAGMA table_xinfo({table})")
+    return {row[1] for row in cur.fetchall()}
+
+
+def add_column(cur, table, column, definition):
+    """
+    ALTER TABLE ... ADD COLUMN, but only when the column is missing, so
+    databases that were patched by hand upgrade cleanly.
+    """
+    if column not in table_columns(cur, table):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# =============================== MIGRATIONS ===============================
+def m001_baseline(cur):
+    """
+    Baseline schema: everything init_db.py used to create plus the columns
+    and tables that were added with ad hoc ALTERs since.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            email TEXT UNIQUE,
+            password TEXT,
+            role TEXT
+        )
+    """)
+    add_column(cur, "users", "announcements_last_seen", "TEXT")
+    add_column(cur, "users", "files_last_seen", "TEXT")
+    add_column(cur, "users", "tasks_last_seen", "TEXT")
+    add_column(cur, "users", "approvals_last_seen", "TEXT")
+    add_column(cur, "users", "whatsapp", "TEXT")
+    add_column(cur, "users", "whatsapp_opt_in", "INTEGER DEFAULT 0")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            description TEXT,
+            assigned_to INTEGER,
+            due_date TEXT,
+            status TEXT DEFAULT 'pending',
+            updated_at TEXT
+        )
+    """)
+    add_column(cur, "tasks", "created_at", "TEXT")
+    add_column(cur, "tasks", "updated_by_role", "TEXT")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS announcements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            message TEXT,
+            created_at TEXT
+        )
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT,
+            uploaded_by INTEGER,
+            uploaded_at TEXT,
+            shared_with TEXT DEFAULT 'all'
+        )
+    """)
+    add_column(cur, "files", "shared_with", "TEXT DEFAULT 'all'")
+    add_column(cur, "files", "file_type", "TEXT DEFAULT 'general'")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS activity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_name TEXT,
+            action TEXT,
+            task_id INTEGER,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            check_in_time TEXT,
+            latitude REAL,
+            longitude REAL,
+            status TEXT,   -- Present / Outside / Absent
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+
+            UNIQUE(user_id, date)
+        )
+    """)
+    add_column(cur, "attendance", "check_out_time", "TEXT")
+    add_column(cur, "attendance", "day_type", "TEXT")
+    add_column(cur, "attendance", "late_comment", "TEXT")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS approvals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+            employee_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+
+            status TEXT DEFAULT 'Pending',
+
+            approved_by INTEGER,
+            approved_at TEXT,
+
+            rejection_reason TEXT,
+
+            created_at TEXT NOT NULL,
+            updated_at TEXT,
+
+            FOREIGN KEY (employee_id) REFERENCES users(id),
+            FOREIGN KEY (approved_by) REFERENCES users(id)
+        )
+    """)
+    add_column(cur, "approvals", "assigned_to", "INTEGER")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_audit (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+            employee_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+
+            before_snapshot TEXT NOT NULL,
+            after_snapshot TEXT NOT NULL,
+
+            approval_id INTEGER NOT NULL,
+            approved_by INTEGER NOT NULL,
+            approved_at TEXT NOT NULL,
+
+            created_at TEXT NOT NULL,
+
+            FOREIGN KEY (employee_id) REFERENCES users(id),
+            FOREIGN KEY (approved_by) REFERENCES users(id),
+            FOREIGN KEY (approval_id) REFERENCES approvals(id)
+        )
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,           -- receiver
+            actor_name TEXT,                    -- Admin / System / Employee name
+            type TEXT NOT NULL,                 -- task | approval | file | attendance | announcement
+            title TEXT NOT NULL,
+            message TEXT,
+            reference_type TEXT,                -- task | approval | file
+            reference_id INTEGER,
+            is_read INTEGER DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+    """)
+    add_column(cur, "notifications", "archived", "INTEGER DEFAULT 0")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS remunerations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            type TEXT NOT NULL,                -- bonus | incentive | overtime | deduction | adjustment
+            amount REAL NOT NULL,
+            reason TEXT,
+            month TEXT NOT NULL,               -- YYYY-MM
+            status TEXT DEFAULT 'Pending',     -- Pending | Approved | Rejected
+            requested_by INTEGER,
+            approved_by INTEGER,
+            approved_at TEXT,
+            rejection_reason TEXT,
+            created_at TEXT NOT NULL,
+
+            FOREIGN KEY(employee_id) REFERENCES users(id),
+            FOREIGN KEY(requested_by) REFERENCES users(id),
+            FOREIGN KEY(approved_by) REFERENCES users(id)
+        )
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS push_subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            endpoint TEXT NOT NULL,
+            p256dh TEXT NOT NULL,
+            auth TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+
+
+def m002_hot_query_indexes(cur):
+    """
+    Composite indexes for the dashboard queries that used to scan whole
+    tables.
+    """
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_role ON users(role)")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tasks_assigned_to
+        ON tasks(assigned_to, status)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notifications_user
+        ON notifications(user_id, archived, created_at)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_approvals_employee
+        ON approvals(employee_id, type, status)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_approvals_assignee
+        ON approvals(assigned_to, status, created_at)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_activity_log_timestamp
+        ON activity_log(timestamp)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_activity_log_task
+        ON activity_log(task_id)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_files_shared_with
+        ON files(shared_with, uploaded_at)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_files_uploaded_at
+        ON files(uploaded_at)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_announcements_created_at
+        ON announcements(created_at)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_attendance_date
+        ON attendance(date)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_remunerations_status
+        ON remunerations(status, created_at)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_remunerations_employee
+        ON remunerations(employee_id, created_at)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_attendance_audit_lookup
+        ON attendance_audit(employee_id, date)
+    """)
+
+
+def m003_approval_payload_columns(cur):
+    """
+    Expose the JSON payload dates that leave / regularisation lookups filter
+    on as virtual generated columns, and index them so those lookups become
+    index range scans instead of json_extract() over every approval row.
+    """
+    add_column(cur, "approvals", "reg_date", """
+        TEXT GENERATED ALWAYS AS (
+            CASE WHEN type = 'regularisation' AND json_valid(payload)
+                 THEN json_extract(payload, '$.date') END
+        ) VIRTUAL
+    """)
+    add_column(cur, "approvals", "leave_from", """
+        TEXT GENERATED ALWAYS AS (
+            CASE WHEN type = 'leave' AND json_valid(payload)
+                 THEN json_extract(payload, '$.from_date') END
+        ) VIRTUAL
+    """)
+    add_column(cur, "approvals", "leave_to", """
+        TEXT GENERATED ALWAYS AS (
+            CASE WHEN type = 'leave' AND json_valid(payload)
+                 THEN json_extract(payload, '$.to_date') END
+        ) VIRTUAL
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_approvals_reg_date
+        ON approvals(employee_id, reg_date, status)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_approvals_leave_range
+        ON approvals(employee_id, status, leave_from, leave_to)
+    """)
+
+
+def m004_outbox(cur):
+    """
+    Persistent outbox for asynchronous third-party notifications.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,              -- whatsapp
+            recipient TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',  -- queued | sending | sent | failed
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL,               -- unix time
+            locked_at REAL,
+            last_error TEXT,
+            reference_type TEXT,                -- task
+            reference_id INTEGER,
+            created_at TEXT NOT NULL,
+            updated_at TEXT,
+            sent_at TEXT
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_outbox_due
+        ON outbox(status, next_attempt_at)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_outbox_reference
+        ON outbox(reference_type, reference_id)
+    """)
+
+
+def m005_broadcast_notifications(cur):
+    """
+    One row per broadcast (e.g. an announcement to every employee) instead
+    of one notification row per recipient. Per-user read / cleared state is
+    a pair of high-water marks on users: broadcasts with an id at or below
+    the mark count as read / cleared for that user.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            audience TEXT NOT NULL,             -- role that receives it: employee
+            actor_name TEXT,
+            type TEXT NOT NULL,
+            title TEXT NOT NULL,
+            message TEXT,
+            reference_type TEXT,
+            reference_id INTEGER,
+            created_at TEXT NOT NULL
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_broadcast_audience
+        ON broadcast_notifications(audience, id)
+    """)
+    add_column(cur, "users", "broadcast_read_upto", "INTEGER DEFAULT 0")
+    add_column(cur, "users", "broadcast_cleared_upto", "INTEGER DEFAULT 0")
+
+
+def _local_ts(expr):
+    """
+    SQL normalising the mixed timestamp formats in the data
+    ('2025-12-20 13:01:58' and '2025-12-20T13:01:58.123+05:30', both IST)
+    to comparable 'YYYY-MM-DD HH:MM:SS' text.
+    """
+    return f"substr(replace({expr}, 'T', ' '), 1, 19)"
+
+
+def m006_user_counters(cur):
+    """
+    Materialised per-user "new since last seen" counters, maintained by the
+    write paths and reset by /employee/mark-seen. Seeded once from the old
+    *_last_seen timestamp comparisons.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_counters (
+            user_id INTEGER PRIMARY KEY,
+            announcements INTEGER NOT NULL DEFAULT 0,
+            files INTEGER NOT NULL DEFAULT 0,
+            tasks INTEGER NOT NULL DEFAULT 0,
+            approvals INTEGER NOT NULL DEFAULT 0,
+            announcements_seen_at INTEGER,      -- unix time
+            files_seen_at INTEGER,
+            tasks_seen_at INTEGER,
+            approvals_seen_at INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+
+    # Every user gets a counter row, however the user was created
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_users_counters_insert
+        AFTER INSERT ON users
+        BEGIN
+            INSERT OR IGNORE INTO user_counters (user_id) VALUES (NEW.id);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_users_counters_delete
+        AFTER DELETE ON users
+        BEGIN
+            DELETE FROM user_counters WHERE user_id = OLD.id;
+        END
+    """)
+
+    seen = {
+        section: f"COALESCE({_local_ts(f'u.{section}_last_seen')}, '')"
+        for section in ("announcements", "files", "tasks", "approvals")
+    }
+
+    cur.execute(f"""
+        INSERT OR IGNORE INTO user_counters (user_id, announcements, files, tasks, approvals)
+        SELECT
+            u.id,
+            (SELECT COUNT(*) FROM announcements a
+             WHERE {_local_ts('a.created_at')} > {seen['announcements']}),
+            (SELECT COUNT(*) FROM files f
+             WHERE (f.shared_with = 'all' OR f.shared_with = CAST(u.id AS TEXT))
+               AND {_local_ts('f.uploaded_at')} > {seen['files']}),
+            (SELECT COUNT(*) FROM tasks t
+             WHERE t.assigned_to = u.id
+               AND ({_local_ts('t.created_at')} > {seen['tasks']}
+                    OR ({_local_ts('t.updated_at')} > {seen['tasks']}
+                        AND t.updated_by_role = 'admin'))),
+            (SELECT COUNT(*) FROM approvals ap
+             WHERE ap.employee_id = u.id
+               AND ap.approved_at IS NOT NULL
+               AND {_local_ts('ap.approved_at')} > {seen['approvals']})
+        FROM users u
+        WHERE u.role = 'employee'
+    """)
+    cur.execute("INSERT OR IGNORE INTO user_counters (user_id) SELECT id FROM users")
+
+
+def m007_blob_store(cur):
+    """
+    Content-addressed upload store (see blobstore.py): one blobs row per
+    distinct SHA-256, blob_names mapping public upload names to content, and
+    the hash/size recorded on files rows.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS blob_names (
+            name TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            FOREIGN KEY (sha256) REFERENCES blobs(sha256)
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_blob_names_sha256 ON blob_names(sha256)")
+
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_blob_names_insert
+        AFTER INSERT ON blob_names
+        BEGIN
+            UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = NEW.sha256;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_blob_names_delete
+        AFTER DELETE ON blob_names
+        BEGIN
+            UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = OLD.sha256;
+        END
+    """)
+
+    add_column(cur, "files", "sha256", "TEXT")
+    add_column(cur, "files", "size", "INTEGER")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_files_filename ON files(filename)")
+
+
+def m008_multi_worker(cur):
+    """
+    State that must be shared when several worker processes serve the app:
+    cache_versions (bumped by triggers, so every worker sees writes made by
+    the others) and event_relay (live events fanned out to every worker's
+    /events subscribers).
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cur.execute("INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('tasks', 0)")
+
+    bump = "UPDATE cache_versions SET version = version + 1 WHERE name = 'tasks';"
+    triggers = {
+        "trg_tasks_version_insert": "AFTER INSERT ON tasks",
+        "trg_tasks_version_update": "AFTER UPDATE ON tasks",
+        "trg_tasks_version_delete": "AFTER DELETE ON tasks",
+        # Leaderboards also show employee names
+        "trg_users_version_insert": "AFTER INSERT ON users",
+        "trg_users_version_update": "AFTER UPDATE OF name, role ON users",
+        "trg_users_version_delete": "AFTER DELETE ON users"
+    }
+    for name, when in triggers.items():
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {when} BEGIN {bump} END")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS event_relay (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event TEXT NOT NULL,
+            data TEXT NOT NULL,             -- JSON
+            user_ids TEXT,                  -- JSON list, or NULL for a role
+            role TEXT,
+            created_at REAL NOT NULL        -- unix time
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_event_relay_created ON event_relay(created_at)")
+
+
+ACTIVITY_KINDS = (
+    ("Added employee %", "employee_added"),
+    ("Updated employee %", "employee_updated"),
+    ("Deleted employee %", "employee_deleted"),
+    ("Created task %", "task_created"),
+    ("Updated task %", "task_updated"),
+    ("Deleted task %", "task_deleted"),
+    ("Changed task status %", "task_status_changed"),
+    ("Posted announcement %", "announcement_posted"),
+    ("Uploaded file %", "file_uploaded"),
+    ("% approval", "approval_decided")
+)
+
+
+def m009_activity_rollups(cur):
+    """
+    activity_log.kind (a stable action category) and the daily
+    activity_rollups counters kept by activitylog.py; both backfilled from
+    the existing log.
+    """
+    add_column(cur, "activity_log", "kind", "TEXT")
+
+    for pattern, kind in ACTIVITY_KINDS:
+        cur.execute(
+            "UPDATE activity_log SET kind = ? WHERE kind IS NULL AND action LIKE ?",
+            (kind, pattern)
+        )
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS activity_rollups (
+            day TEXT NOT NULL,              -- YYYY-MM-DD (IST)
+            user_name TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, user_name, kind)
+        )
+    """)
+    cur.execute("""
+        INSERT OR IGNORE INTO activity_rollups (day, user_name, kind, count)
+        SELECT substr(timestamp, 1, 10), COALESCE(user_name, ''), COALESCE(kind, 'other'), COUNT(*)
+        FROM activity_log
+        GROUP BY 1, 2, 3
+    """)
+
+
+def m010_attendance_summary(cur):
+    """
+    Cache of per-employee weekly / monthly attendance totals for closed
+    periods. A period is cached once its attendance_summary_periods marker
+    exists; triggers drop the marker whenever attendance inside it changes
+    (e.g. an approved regularisation), so the next read recomputes it.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_summary_periods (
+            period TEXT NOT NULL,           -- 'week' | 'month'
+            period_start TEXT NOT NULL,
+            period_end TEXT NOT NULL,
+            computed_at TEXT,
+            PRIMARY KEY (period, period_start)
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_attendance_summary_periods_range
+        ON attendance_summary_periods(period_start, period_end)
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_summary (
+            period TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            days_present INTEGER NOT NULL,
+            worked_minutes INTEGER NOT NULL,
+            late_count INTEGER NOT NULL,
+            half_days INTEGER NOT NULL,
+            overtime_minutes INTEGER NOT NULL,
+            PRIMARY KEY (period, period_start, user_id)
+        )
+    """)
+
+    invalidate = """
+        DELETE FROM attendance_summary_periods
+        WHERE {row}.date BETWEEN period_start AND period_end;
+    """
+    triggers = {
+        "trg_attendance_summary_insert": ("AFTER INSERT ON attendance", ["NEW"]),
+        "trg_attendance_summary_update": ("AFTER UPDATE ON attendance", ["OLD", "NEW"]),
+        "trg_attendance_summary_delete": ("AFTER DELETE ON attendance", ["OLD"])
+    }
+    for name, (when, rows) in triggers.items():
+        body = "".join(invalidate.format(row=row) for row in rows)
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {when} BEGIN {body} END")
+
+
+def m011_payroll_ledger(cur):
+    """
+    Monthly payroll ledger: one payroll_ledger row per employee per month
+    with running totals per category, fed by payroll_postings (one row per
+    approved remuneration / reimbursement, so every item is counted exactly
+    once and can be reversed). payroll_months records closed months.
+    Backfilled from everything already approved.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS payroll_postings (
+            source_type TEXT NOT NULL,          -- remuneration | reimbursement
+            source_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            month TEXT NOT NULL,                -- YYYY-MM
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            posted_at TEXT,
+            PRIMARY KEY (source_type, source_id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS payroll_ledger (
+            employee_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            bonus REAL NOT NULL DEFAULT 0,
+            incentive REAL NOT NULL DEFAULT 0,
+            overtime REAL NOT NULL DEFAULT 0,
+            deduction REAL NOT NULL DEFAULT 0,
+            adjustment REAL NOT NULL DEFAULT 0,
+            reimbursement REAL NOT NULL DEFAULT 0,
+            net REAL GENERATED ALWAYS AS (
+                bonus + incentive + overtime + adjustment + reimbursement - deduction
+            ) VIRTUAL,
+            items INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT,
+            closed_at TEXT,
+            PRIMARY KEY (month, employee_id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS payroll_months (
+            month TEXT PRIMARY KEY,
+            closed_at TEXT NOT NULL,
+            closed_by INTEGER,
+            employees INTEGER,
+            total_net REAL
+        )
+    """)
+
+    now = datetime.now().isoformat()
+    cur.execute("""
+        INSERT OR IGNORE INTO payroll_postings
+        (source_type, source_id, employee_id, month, category, amount, posted_at)
+        SELECT 'remuneration', id, employee_id, month, type, amount, ?
+        FROM remunerations
+        WHERE status = 'Approved'
+          AND type IN ('bonus', 'incentive', 'overtime', 'deduction', 'adjustment')
+    """, (now,))
+    cur.execute("""
+        INSERT OR IGNORE INTO payroll_postings
+        (source_type, source_id, employee_id, month, category, amount, posted_at)
+        SELECT
+            'reimbursement', id, employee_id,
+            substr(COALESCE(approved_at, created_at), 1, 7),
+            'reimbursement',
+            CAST(json_extract(payload, '$.amount') AS REAL),
+            ?
+        FROM approvals
+        WHERE type = 'reimbursement' AND status = 'Approved'
+    """, (now,))
+
+    cur.execute("""
+        INSERT OR IGNORE INTO payroll_ledger
+        (employee_id, month, bonus, incentive, overtime, deduction, adjustment,
+         reimbursement, items, updated_at)
+        SELECT
+            employee_id,
+            month,
+            SUM(CASE WHEN category = 'bonus' THEN amount ELSE 0 END),
+            SUM(CASE WHEN category = 'incentive' THEN amount ELSE 0 END),
+            SUM(CASE WHEN category = 'overtime' THEN amount ELSE 0 END),
+            SUM(CASE WHEN category = 'deduction' THEN amount ELSE 0 END),
+            SUM(CASE WHEN category = 'adjustment' THEN amount ELSE 0 END),
+            SUM(CASE WHEN category = 'reimbursement' THEN amount ELSE 0 END),
+            COUNT(*),
+            ?
+        FROM payroll_postings
+        GROUP BY employee_id, month
+    """, (now,))
+
+
+def m012_offices(cur):
+    """
+    Office geofences (geofence.py) replacing the single hard-coded site,
+    which is seeded as the first office. attendance records the matched
+    office and the distance from it; cache_versions('offices') tells every
+    worker to rebuild its in-memory index after an office changes.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS offices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            kind TEXT NOT NULL DEFAULT 'circle',   -- 'circle' | 'polygon'
+            latitude REAL,                  -- circle centre
+            longitude REAL,
+            radius_meters REAL,
+            polygon TEXT,                   -- JSON [[lat, lng], ...]
+            active INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT,
+            updated_at TEXT
+        )
+    """)
+
+    cur.execute("SELECT COUNT(*) FROM offices")
+    if cur.fetchone()[0] == 0:
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cur.execute("""
+            INSERT INTO offices (name, kind, latitude, longitude, radius_meters, created_at, updated_at)
+            VALUES ('Head Office', 'circle', 20.010681255547066, 73.7419943864044, 100, ?, ?)
+        """, (now, now))
+
+    add_column(cur, "attendance", "office_id", "INTEGER REFERENCES offices(id)")
+    add_column(cur, "attendance", "office_distance", "REAL")
+
+    cur.execute("INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('offices', 0)")
+    bump = "UPDATE cache_versions SET version = version + 1 WHERE name = 'offices';"
+    triggers = {
+        "trg_offices_version_insert": "AFTER INSERT ON offices",
+        "trg_offices_version_update": "AFTER UPDATE ON offices",
+        "trg_offices_version_delete": "AFTER DELETE ON offices"
+    }
+    for name, when in triggers.items():
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {when} BEGIN {bump} END")
+
+
+# Full-text indexes: FTS5 table -> (source table, {indexed column: SQL over
+# the source row}). Approvals index every string value of their JSON
+# payload (reasons, descriptions, categories) plus the rejection reason.
+SEARCH_INDEXES = {
+    "search_tasks": ("tasks", {
+        "title": "{row}.title",
+        "description": "{row}.description"
+    }),
+    "search_announcements": ("announcements", {
+        "title": "{row}.title",
+        "message": "{row}.message"
+    }),
+    "search_files": ("files", {
+        "filename": "{row}.filename"
+    }),
+    "search_approvals": ("approvals", {
+        "type": "{row}.type",
+        "body": """
+            COALESCE((
+                SELECT group_concat(value, ' ') FROM json_each(
+                    CASE WHEN json_valid({row}.payload) THEN {row}.payload ELSE '{{}}' END
+                ) WHERE type = 'text'
+            ), '') || ' ' || COALESCE({row}.rejection_reason, '')
+        """
+    }),
+    "search_users": ("users", {
+        "name": "{row}.name",
+        "email": "{row}.email"
+    })
+}
+
+
+def m013_search_index(cur):
+    """
+    FTS5 search over tasks, announcements, file names, approvals and users.
+    Each index is keyed by its source row id (rowid) and kept in sync by
+    triggers; visibility is applied at query time by joining the source.
+    """
+    for fts, (source, columns) in SEARCH_INDEXES.items():
+        cur.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {", ".join(columns)},
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        """)
+
+        names = ", ".join(columns)
+        values = ", ".join(sql.format(row="NEW") for sql in columns.values())
+        watched = ", ".join(sorted(
+            column for column in table_columns(cur, source)
+            if any(f"{{row}}.{column}" in sql for sql in columns.values())
+        ))
+
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {source}
+            BEGIN
+                INSERT INTO {fts} (rowid, {names}) VALUES (NEW.id, {values});
+            END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {watched} ON {source}
+            BEGIN
+                DELETE FROM {fts} WHERE rowid = OLD.id;
+                INSERT INTO {fts} (rowid, {names}) VALUES (NEW.id, {values});
+            END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {source}
+            BEGIN
+                DELETE FROM {fts} WHERE rowid = OLD.id;
+            END
+        """)
+
+        cur.execute(f"DELETE FROM {fts}")
+        cur.execute(f"""
+            INSERT INTO {fts} (rowid, {names})
+            SELECT id, {", ".join(sql.format(row=source) for sql in columns.values())}
+            FROM {source}
+        """)
+
+
+def m014_users_cache_version(cur):
+    """
+    cache_versions('users') for the in-process reference data cache: bumped
+    whenever a user is added, removed, renamed or changes email / role (not
+    on the frequent last-seen / read-marker updates).
+    """
+    cur.execute("INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('users', 0)")
+
+    bump = "UPDATE cache_versions SET version = version + 1 WHERE name = 'users';"
+    triggers = {
+        "trg_users_cache_insert": "AFTER INSERT ON users",
+        "trg_users_cache_update": "AFTER UPDATE OF name, email, role ON users",
+        "trg_users_cache_delete": "AFTER DELETE ON users"
+    }
+    for name, when in triggers.items():
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {when} BEGIN {bump} END")
+
+
+# Change feed: entity -> (source table, [SQL over the source row giving a
+# user id that can see it]). 0 means every user; NULL audiences are skipped.
+CHANGE_FEED = {
+    "tasks": ("tasks", ["{row}.assigned_to"]),
+    "approvals": ("approvals", ["{row}.employee_id", "{row}.assigned_to"]),
+    "notifications": ("notifications", ["{row}.user_id"]),
+    "broadcasts": ("broadcast_notifications", ["0"]),
+    "attendance": ("attendance", ["{row}.user_id"]),
+    "announcements": ("announcements", ["0"]),
+    "files": ("files", [
+        "CASE WHEN {row}.shared_with = 'all' THEN 0 ELSE CAST({row}.shared_with AS INTEGER) END"
+    ])
+}
+
+
+def m015_change_feed(cur):
+    """
+    Change log behind /sync. Triggers record every insert, update and delete
+    as one changes row per (entity, row, audience); a later change to the
+    same row replaces that row under a new seq, so the log stays one row per
+    audience per changed row. An update records the old audience too, so a
+    task reassigned away still reaches its previous assignee (as a delete).
+    cache_versions('changes_horizon') is the highest seq pruned so far.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,       -- audience; 0 = everyone
+            changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (entity, row_id, user_id)
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_changes_user ON changes(user_id, seq)")
+    cur.execute("INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('changes_horizon', 0)")
+
+    record = """
+        INSERT OR REPLACE INTO changes (entity, row_id, user_id)
+        SELECT '{entity}', {row}.id, audience
+        FROM (SELECT {audience} AS audience)
+        WHERE audience IS NOT NULL;
+    """
+    events = {
+        "insert": ("AFTER INSERT", ["NEW"]),
+        "update": ("AFTER UPDATE", ["OLD", "NEW"]),
+        "delete": ("AFTER DELETE", ["OLD"])
+    }
+    for entity, (source, audiences) in CHANGE_FEED.items():
+        for event, (when, rows) in events.items():
+            body = "".join(
+                record.format(entity=entity, row=row, audience=audience.format(row=row))
+                for row in rows
+                for audience in audiences
+            )
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{entity}_changes_{event} {when} ON {source}
+                BEGIN {body} END
+            """)
+
+    # Reading / clearing broadcasts moves a per-user mark instead of touching
+    # the rows; log the broadcasts it passed over for that user.
+    for mark in ("broadcast_read_upto", "broadcast_cleared_upto"):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_users_{mark}_changes
+            AFTER UPDATE OF {mark} ON users
+            BEGIN
+                INSERT OR REPLACE INTO changes (entity, row_id, user_id)
+                SELECT 'broadcasts', id, NEW.id
+                FROM broadcast_notifications
+                WHERE id > COALESCE(OLD.{mark}, 0) AND id <= COALESCE(NEW.{mark}, 0);
+            END
+        """)
+
+
+def m016_archive_partitions(cur):
+    """
+    Registry of the per-year archive files written by archive.py: one row
+    per (table, year) with the cutoff the rows were archived under (reads
+    dated before the highest cutoff go through the archive) and how many
+    rows moved. Plus the created_at index the notification archiver walks.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS archive_partitions (
+            table_name TEXT NOT NULL,
+            period TEXT NOT NULL,               -- YYYY, file archive/partitions/YYYY.db
+            cutoff TEXT NOT NULL,               -- rows dated before this were archived
+            rows INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT,
+            PRIMARY KEY (table_name, period)
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notifications_created_at
+        ON notifications(created_at)
+    """)
+
+
+def m017_list_sort_keys(cur):
+    """
+    Paginated lists sort newest first on a normalised timestamp. Expose
+    each list's sort key as a virtual generated column and index it
+    together with id (behind the filter the list always applies), so a
+    page is an index range scan instead of a sort of the whole table.
+    """
+    add_column(cur, "tasks", "created_key", """
+        TEXT GENERATED ALWAYS AS (COALESCE(datetime(created_at), '')) VIRTUAL
+    """)
+    add_column(cur, "approvals", "created_key", """
+        TEXT GENERATED ALWAYS AS (COALESCE(datetime(created_at), '')) VIRTUAL
+    """)
+    add_column(cur, "announcements", "created_key", """
+        TEXT GENERATED ALWAYS AS (COALESCE(created_at, '')) VIRTUAL
+    """)
+    add_column(cur, "files", "uploaded_key", """
+        TEXT GENERATED ALWAYS AS (COALESCE(uploaded_at, '')) VIRTUAL
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tasks_created_key
+        ON tasks(created_key, id)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tasks_assigned_created_key
+        ON tasks(assigned_to, created_key, id)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_approvals_employee_created_key
+        ON approvals(employee_id, created_key, id)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_approvals_assignee_created_key
+        ON approvals(assigned_to, status, created_key, id)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_announcements_created_key
+        ON announcements(created_key, id)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_files_uploaded_key
+        ON files(uploaded_key, id)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_files_shared_uploaded_key
+        ON files(shared_with, uploaded_key, id)
+    """)
+
+
+def m018_office_indexes(cur):
+    """
+    Index attendance by office so the per-office check-in counts on the
+    offices page are index lookups instead of a scan per office, and list
+    offices in index order.
+    """
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_attendance_office
+        ON attendance(office_id)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_offices_active_name
+        ON offices(active DESC, name)
+    """)
+
+
+def m019_change_log_age_index(cur):
+    """
+    Index the change log by age so pruning finds the expired rows with a
+    range scan instead of reading the whole log.
+    """
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_changes_changed_at
+        ON changes(changed_at)
+    """)
+
+
+def m020_archive_trigger_guard(cur):
+    """
+    Moving rows into the archive (archive.py) is not a change to the data:
+    the rows still exist, so synced clients must not be told they were
+    deleted and cached attendance summaries stay valid. The archiver holds
+    a trigger_guards row for the length of its delete transaction (no other
+    connection ever sees it), and the delete triggers skip while it exists.
+    """
+    cur.execute("CREATE TABLE IF NOT EXISTS trigger_guards (name TEXT PRIMARY KEY)")
+    unguarded = "WHEN NOT EXISTS (SELECT 1 FROM trigger_guards WHERE name = 'archive')"
+
+    for entity in ("attendance", "notifications"):
+        source, audiences = CHANGE_FEED[entity]
+        body = "".join(f"""
+            INSERT OR REPLACE INTO changes (entity, row_id, user_id)
+            SELECT '{entity}', OLD.id, audience
+            FROM (SELECT {audience.format(row="OLD")} AS audience)
+            WHERE audience IS NOT NULL;
+        """ for audience in audiences)
+        cur.execute(f"DROP TRIGGER IF EXISTS trg_{entity}_changes_delete")
+        cur.execute(f"""
+            CREATE TRIGGER trg_{entity}_changes_delete AFTER DELETE ON {source}
+            {unguarded}
+            BEGIN {body} END
+        """)
+
+    cur.execute("DROP TRIGGER IF EXISTS trg_attendance_summary_delete")
+    cur.execute(f"""
+        CREATE TRIGGER trg_attendance_summary_delete AFTER DELETE ON attendance
+        {unguarded}
+        BEGIN
+            DELETE FROM attendance_summary_periods
+            WHERE OLD.date BETWEEN period_start AND period_end;
+        END
+    """)
+
+
+def m021_attendance_summary_update_columns(cur):
+    """
+    Only updates to the columns a summary is computed from invalidate the
+    cached periods; re-matching offices (office_id / office_distance) does
+    not.
+    """
+    cur.execute("DROP TRIGGER IF EXISTS trg_attendance_summary_update")
+    cur.execute("""
+        CREATE TRIGGER trg_attendance_summary_update
+        AFTER UPDATE OF user_id, date, status, check_in_time, check_out_time, day_type, late_comment
+        ON attendance
+        BEGIN
+            DELETE FROM attendance_summary_periods
+            WHERE OLD.date BETWEEN period_start AND period_end;
+            DELETE FROM attendance_summary_periods
+            WHERE NEW.date BETWEEN period_start AND period_end;
+        END
+    """)
+
+
+# Append new migrations here; never reorder or edit released ones.
+MIGRATIONS = [
+    (1, "baseline schema", m001_baseline),
+    (2, "hot query indexes", m002_hot_query_indexes),
+    (3, "approval payload columns", m003_approval_payload_columns),
+    (4, "notification outbox", m004_outbox),
+    (5, "broadcast notifications", m005_broadcast_notifications),
+    (6, "per-user unread counters", m006_user_counters),
+    (7, "content-addressed blob store", m007_blob_store),
+    (8, "shared cache versions and event relay", m008_multi_worker),
+    (9, "activity log kinds and daily rollups", m009_activity_rollups),
+    (10, "attendance summary cache", m010_attendance_summary),
+    (11, "payroll ledger", m011_payroll_ledger),
+    (12, "office geofences", m012_offices),
+    (13, "full-text search", m013_search_index),
+    (14, "users cache version", m014_users_cache_version),
+    (15, "change feed", m015_change_feed),
+    (16, "archive partitions", m016_archive_partitions),
+    (17, "list sort keys", m017_list_sort_keys),
+    (18, "office listing indexes", m018_office_indexes),
+    (19, "change log age index", m019_change_log_age_index),
+    (20, "archive trigger guard", m020_archive_trigger_guard),
+    (21, "attendance summary update columns", m021_attendance_summary_update_columns),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ================================ RUNNER ==================================
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Apply every pending migration. Returns the list of versions applied.
+    BEGIN IMMEDIATE serialises concurrent runners (several app workers
+    starting at once), and the version is re-read under that lock.
+    """
+    applied = []
+
+    if current_version(conn) >= LATEST_VERSION:
+        return applied
+
+    if conn.in_transaction:
+        conn.commit()
+
+    for version, description, step in MIGRATIONS:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if current_version(conn) >= version:
+                conn.rollback()
+                continue
+
+            cur = conn.cursor()
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at TEXT NOT NULL
+                )
+            """)
+            step(cur)
+            cur.execute(
+                "INSERT OR REPLACE INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            cur.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+            applied.append(version)
+        except Exception:
+            conn.rollback()
+            raise
+
+    return applied
+
+
+# ============================== PLAN CHECKER ==============================
+def extract_sql(source_path=APP_PATH):
+    """
+    Yield (lineno, sql) for every literal SQL string passed to
+    .execute() / .executemany() in the given source file. f-strings are
+    skipped because their final text is only known at runtime.
+    """
+    with open(source_path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=source_path)
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call) or not node.args:
+            continue
+        func = node.func
+        if not isinstance(func, ast.Attribute) or func.attr not in ("execute", "executemany"):
+            continue
+        arg = node.args[0]
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            yield node.lineno, arg.value
+
+
+def check_query_plans(db_path=DB_PATH, source_path=APP_PATH):
+    """
+    Run EXPLAIN QUERY PLAN for each SQL statement found in app.py against an
+    in-memory, fully migrated copy of the database. Returns a list of
+    (lineno, sql, plan_details) for statements that still scan a table
+    without an index.
+    """
+    src = sqlite3.connect(db_path)
+    conn = sqlite3.connect(":memory:")
+    src.backup(conn)
+    src.close()
+    migrate(conn)
+
+    offenders = []
+    for lineno, sql in sorted(extract_sql(source_path)):
+        statement = sql.strip().rstrip(";")
+        if statement.upper().startswith("PRAGMA"):
+            continue
+        try:
+            params = [None] * statement.count("?")
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {statement}", params).fetchall()
+        except sqlite3.Error as e:
+            offenders.append((lineno, statement, [f"error: {e}"]))
+            continue
+
+        scans = [
+            row[3] for row in plan
+            if row[3].startswith("SCAN ") and "INDEX" not in row[3]
+        ]
+        if scans:
+            offenders.append((lineno, statement, scans))
+
+    conn.close()
+    return offenders
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HRMS schema migrations")
+    parser.add_argument("--db", default=DB_PATH, help="path to the SQLite database")
+    parser.add_argument("--status", action="store_true", help="print schema version and exit")
+    parser.add_argument("--check", action="store_true",
+                        help="report app.py queries that still do full table scans")
+    args = parser.parse_args()
+
+    if args.check:
+        offenders = check_query_plans(args.db)
+        for lineno, sql, details in offenders:
+            first_line = " ".join(sql.split())[:100]
+            print(f"app.py:{lineno}: {first_line}")
+            for d in details:
+                print(f"    {d}")
+        print(f"{len(offenders)} statement(s) with full table scans.")
+        return 1 if offenders else 0
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.status:
+            print(f"Schema version {current_version(conn)} (latest {LATEST_VERSION})")
+            return 0
+
+        applied = migrate(conn)
+        if applied:
+            print(f"Applied migrations: {', '.join(map(str, applied))}")
+        print(f"Schema is at version {current_version(conn)}.")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,222 @@
+# ============================ OUTBOUND OUTBOX =============================
+"""
+Persistent outbox for third-party notifications (WhatsApp today).
+
+Request handlers only INSERT a row into the `outbox` table inside their own
+transaction; a background OutboxDispatcher thread delivers queued rows with
+retries, exponential backoff and per-recipient rate limiting, reusing one
+keep-alive HTTP session. Delivery state stays in the table so the UI can
+show it.
+
+Row lifecycle:  queued -> sending -> sent
+                                  -> queued (retry later)
+                                  -> failed (permanent error / out of attempts)
+"""
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import requests
+
+
+def now_ts():
+    return datetime.now(ZoneInfo("Asia/Kolkata")).isoformat()
+
+
+class DeliveryError(Exception):
+    """
+    Raised by a sender when a message could not be delivered. Non-retryable
+    errors (bad request, missing credentials) fail the row immediately.
+    """
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def enqueue(cur, channel, recipient, payload, ref_type=None, ref_id=None):
+    """
+    Queue a message using the caller's cursor, so it commits (or rolls back)
+    together with the write that caused it. Returns the outbox id.
+    """
+    ts = now_ts()
+    cur.execute("""
+        INSERT INTO outbox (
+            channel, recipient, payload, status, attempts,
+            next_attempt_at, reference_type, reference_id,
+            created_at, updated_at
+        )
+        VALUES (?, ?, ?, 'queued', 0, ?, ?, ?, ?, ?)
+    """, (
+        channel,
+        recipient,
+        json.dumps(payload),
+        time.time(),
+        ref_type,
+        ref_id,
+        ts,
+        ts
+    ))
+    return cur.lastrowid
+
+
+class OutboxDispatcher:
+    """
+    Background delivery loop.
+
+    `connect` is a context manager factory yielding a SQLite connection
+    (app.pooled_db); `senders` maps a channel name to
+    sender(http_session, recipient, payload), which returns on success and
+    raises DeliveryError / requests exceptions on failure.
+    """
+
+    def __init__(
+        self,
+        connect,
+        senders,
+        max_attempts=5,
+        base_delay=2.0,
+        max_delay=600.0,
+        min_interval=1.0,
+        batch_size=20,
+        poll_interval=5.0,
+        stale_after=300.0
+    ):
+        self.connect = connect
+        self.senders = senders
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.min_interval = min_interval      # seconds between sends to one recipient
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after        # reclaim rows stuck in 'sending'
+
+        self.http = requests.Session()
+        self._last_sent = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # ------------------------------ lifecycle ------------------------------
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="outbox-dispatcher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                print("⚠️ Outbox dispatcher error:", e)
+                processed = 0
+
+            if not processed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    # ------------------------------ delivery -------------------------------
+    def backoff(self, attempts):
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def run_once(self):
+        """
+        Deliver one batch of due messages. Returns how many rows were
+        attempted; safe to call directly (e.g. from tests).
+        """
+        now = time.time()
+
+        with self.connect() as conn:
+            conn.execute("""
+                UPDATE outbox
+                SET status = 'queued'
+                WHERE status = 'sending' AND locked_at < ?
+            """, (now - self.stale_after,))
+            conn.commit()
+
+            rows = conn.execute("""
+                SELECT id, channel, recipient, payload, attempts
+                FROM outbox
+                WHERE status = 'queued' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id
+                LIMIT ?
+            """, (now, self.batch_size)).fetchall()
+
+            processed = 0
+            for row in rows:
+                if self._deliver(conn, row):
+                    processed += 1
+
+        return processed
+
+    def _deliver(self, conn, row):
+        recipient = row["recipient"]
+
+        wait = self._last_sent.get(recipient, 0) + self.min_interval - time.monotonic()
+        if wait > 0:
+            conn.execute(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+                (time.time() + wait, row["id"])
+            )
+            conn.commit()
+            return False
+
+        # Claim the row; another worker process may have raced us to it.
+        claimed = conn.execute("""
+            UPDATE outbox
+            SET status = 'sending', locked_at = ?
+            WHERE id = ? AND status = 'queued'
+        """, (time.time(), row["id"])).rowcount
+        conn.commit()
+        if not claimed:
+            return False
+
+        attempts = row["attempts"] + 1
+        sender = self.senders.get(row["channel"])
+
+        try:
+            if sender is None:
+                raise DeliveryError(f"No sender for channel '{row['channel']}'", retryable=False)
+            self._last_sent[recipient] = time.monotonic()
+            sender(self.http, recipient, json.loads(row["payload"]))
+        except (DeliveryError, requests.RequestException, ValueError) as e:
+            retryable = getattr(e, "retryable", True)
+            if retryable and attempts < self.max_attempts:
+                status, next_at = "queued", time.time() + self.backoff(attempts)
+            else:
+                status, next_at = "failed", None
+            conn.execute("""
+                UPDATE outbox
+                SET status = ?, attempts = ?, next_attempt_at = ?,
+                    last_error = ?, updated_at = ?
+                WHERE id = ?
+            """, (status, attempts, next_at, str(e)[:500], now_ts(), row["id"]))
+        else:
+            conn.execute("""
+                UPDATE outbox
+                SET status = 'sent', attempts = ?, last_error = NULL,
+                    sent_at = ?, updated_at = ?
+                WHERE id = ?
+            """, (attempts, now_ts(), now_ts(), row["id"]))
+
+        conn.commit()
+        return True
@@ -0,0 +1,174 @@
+# ============================ PRODUCTION LAUNCHER =========================
+"""
+Multi-worker launcher (gunicorn pre-fork master).
+
+Usage:
+    python serve.py                       # one worker per CPU core, port 8000
+    python serve.py --workers 4 --bind 0.0.0.0:8080
+    python serve.py --asgi                # uvicorn workers (needs uvicorn)
+    python serve.py --wsgi --sse-clients 100
+
+Requires gunicorn; uvicorn workers also need uvicorn, uvicorn-worker (the
+gunicorn worker class, split out of uvicorn) and asgiref:
+    pip install gunicorn uvicorn uvicorn-worker asgiref
+
+Worker type: uvicorn workers serving asgi.py are the default whenever
+uvicorn is installed. There each open /events stream is a coroutine on the
+event loop, so open dashboards never hold a request thread. Without uvicorn
+(or with --wsgi) workers are threaded WSGI (gthread), where every open
+/events stream pins one thread for its whole life: a worker serves at most
+`--threads` connections at once, SSE streams included. --threads defaults
+to --sse-clients (dashboards expected open per worker, HRMS_SSE_CLIENTS,
+default 32) plus HRMS_REQUEST_THREADS (default 8) for ordinary requests;
+size them for your users, since a worker whose threads are all held by
+streams stops answering anything else.
+
+The app, its migrations and every template are loaded once in the master
+and then forked, so workers start warm and share those pages copy-on-write.
+Idle SQLite connections are closed before forking (connections must never
+cross fork()); each worker then opens its own into the WAL database, and
+busy_timeout covers write contention between workers.
+
+Per worker, after fork: the outbox dispatcher (claims are atomic, so several
+dispatchers never send the same row), the event relay that fans live
+/events updates out across workers, and the partition archiver (its copy
+and delete steps are idempotent, so overlapping passes only repeat work).
+
+Signals to the master (pid in --pid, default serve.pid):
+    HUP          gracefully replace all workers (config reload)
+    USR2, QUIT   zero-downtime code upgrade: USR2 starts a new master with
+                 fresh code beside the old one; QUIT the old master once the
+                 new workers are up
+    TERM         graceful shutdown
+
+Workers are recycled after --max-requests (with jitter) to cap memory growth.
+"""
+import argparse
+import importlib.util
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_workers():
+    return multiprocessing.cpu_count()
+
+
+def asgi_available():
+    return all(importlib.util.find_spec(name) for name in ("uvicorn", "asgiref"))
+
+
+def uvicorn_worker_class():
+    if importlib.util.find_spec("uvicorn_worker"):
+        return "uvicorn_worker.UvicornWorker"
+    # Deprecated in uvicorn itself (warns on every worker boot)
+    print("⚠️ uvicorn-worker not installed: falling back to uvicorn.workers.UvicornWorker")
+    return "uvicorn.workers.UvicornWorker"
+
+
+def preload_templates(flask_app):
+    for name in flask_app.jinja_env.list_templates():
+        flask_app.jinja_env.get_template(name)
+
+
+def post_fork(server, worker):
+    import app as hrms
+
+    hrms.event_relay.start()
+    hrms.outbox_dispatcher.start()
+    hrms.partition_archiver.start()
+
+
+def worker_exit(server, worker):
+    import app as hrms
+
+    hrms.event_relay.stop()
+    hrms.outbox_dispatcher.stop()
+    hrms.partition_archiver.stop()
+    hrms.activity_writer.flush()
+
+
+class HRMSApplication(BaseApplication):
+    def __init__(self, options, asgi=False):
+        self.options = options
+        self.asgi = asgi
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None and key in self.cfg.settings:
+                self.cfg.set(key, value)
+
+    def load(self):
+        import app as hrms
+
+        preload_templates(hrms.app)
+        hrms.close_pool()
+
+        if self.asgi:
+            from asgi import application
+            return application
+        return hrms.app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the HRMS app with multiple workers.")
+    parser.add_argument("--bind", default=os.environ.get("HRMS_BIND", "127.0.0.1:8000"))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("HRMS_WORKERS", default_workers())))
+    parser.add_argument("--sse-clients", type=int, default=int(os.environ.get("HRMS_SSE_CLIENTS", 32)),
+                        help="open /events streams expected per worker (sizes --threads in WSGI mode)")
+    parser.add_argument("--threads", type=int, default=os.environ.get("HRMS_THREADS"),
+                        help="threads per worker (WSGI mode); each open /events stream holds one "
+                             "(default: --sse-clients + HRMS_REQUEST_THREADS)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--asgi", dest="asgi", action="store_true", default=None,
+                      help="serve asgi.py with uvicorn workers (default when uvicorn is installed)")
+    mode.add_argument("--wsgi", dest="asgi", action="store_false",
+                      help="serve the Flask app with threaded WSGI workers")
+    parser.add_argument("--max-requests", type=int, default=int(os.environ.get("HRMS_MAX_REQUESTS", 5000)))
+    parser.add_argument("--max-requests-jitter", type=int, default=500)
+    parser.add_argument("--timeout", type=int, default=60)
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    parser.add_argument("--pid", default=os.path.join(BASE_DIR, "serve.pid"))
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.asgi is None:
+        args.asgi = asgi_available()
+        if not args.asgi:
+            print("⚠️ uvicorn not installed: serving threaded WSGI workers; "
+                  "each open /events stream holds a thread")
+    if args.threads is None:
+        args.threads = args.sse_clients + int(os.environ.get("HRMS_REQUEST_THREADS", 8))
+
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "preload_app": True,
+        "chdir": BASE_DIR,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests_jitter,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "pidfile": args.pid,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+        "accesslog": "-"
+    }
+
+    if args.asgi:
+        options["worker_class"] = uvicorn_worker_class()
+    else:
+        options["worker_class"] = "gthread"
+        options["threads"] = args.threads
+
+    HRMSApplication(options, asgi=args.asgi).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,65 @@ let selectedKraEmpId = null;
 let allFiles = [];
 let currentApprovalStatus = "Pending";
 
+
+// ======================= PAGINATED LIST HELPERS ===========================
+// List endpoints return one page at a time (newest first). The cursor for
+// the next page comes back in the X-Next-Cursor header.
+function fetchPage(url, cursor = null) {
+    const sep = url.includes("?") ? "&" : "?";
+    const pageUrl = cursor ? `${url}${sep}cursor=${encodeURIComponent(cursor)}` : url;
+
+    return bootFetch(pageUrl).then(res =>
+        res.json().then(items => ({
+            items,
+            next: res.headers.get("X-Next-Cursor")
+        }))
+    );
+}
+
+// ========================= DASHBOARD BOOTSTRAP ============================
+// The first-paint reads arrive together from /admin/bootstrap?sections=employees,tasks,task_summary,activity in one round
+// trip. bootFetch(url) answers a GET from it once per section, while the
+// page has only just loaded; any other call is a plain fetch, so reloads
+// after a change always see fresh data.
+const BOOTSTRAP_TTL_MS = 10000;
+const bootstrapStarted = Date.now();
+const bootstrapSections = fetch("/admin/bootstrap?sections=employees,tasks,task_summary,activity")
+    .then(res => res.ok ? res.json() : {})
+    .catch(() => ({}));
+
+function bootFetch(url) {
+    if (Date.now() - bootstrapStarted > BOOTSTRAP_TTL_MS) return fetch(url);
+
+    return bootstrapSections.then(sections => {
+        const name = Object.keys(sections).find(key => sections[key].url === url);
+        const section = name && sections[name];
+        if (!section || section.status !== 200 || Date.now() - bootstrapStarted > BOOTSTRAP_TTL_MS) {
+            return fetch(url);
+        }
+        delete sections[name];
+        return new Response(JSON.stringify(section.data), {
+            status: section.status,
+            headers: { "Content-Type": "application/json", ...section.headers }
+        });
+    });
+}
+
+function renderLoadMore(container, next, onLoadMore) {
+    const anchor = container.closest("table") || container;
+    let btn = anchor.nextElementSibling;
+
+    if (!btn || !btn.classList.contains("load-more-btn")) {
+        btn = document.createElement("button");
+        btn.className = "load-more-btn";
+        btn.textContent = "Load more";
+        anchor.after(btn);
+    }
+
+    btn.style.display = next ? "" : "none";
+    btn.onclick = () => onLoadMore(next);
+}
+
 function showPage(pageName) {
     Object.values(pages).forEach(p => {
         if (p) p.style.display = "none";
@@ -51,55 +110,23 @@ function setActiveTab(id) {
 
 function loadDashboardStats() {
     // Load employees count
-    fetch("/admin/employees")
+    bootFetch("/admin/employees")
         .then(res => res.json())
         .then(list => {
             document.querySelector("#cardEmployees h2").textContent = list.length;
         });
 
-    // Load tasks summary
-    // Load tasks summary
-    fetch("/admin/all-tasks")
+    // Load tasks summary (counted server-side)
+    bootFetch("/admin/tasks/summary")
         .then(res => res.json())
-        .then(tasks => {
-            document.querySelector("#cardTasks h2").textContent = tasks.length;
-
-            const today = new Date().toISOString().split("T")[0];
-
-            let pending = 0;
-            let completed = 0;
-            let overdue = 0;
-            let dueToday = 0;
-            let dueWeek = 0;
-
-            tasks.forEach(t => {
-                const status = (t.status || "").toLowerCase();
-                const due = t.due_date;
-
-                if (status === "completed") {
-                    completed++;
-                    return;
-                }
-
-                pending++;
-
-                if (due) {
-                    if (due < today) overdue++;
-                    else if (due === today) dueToday++;
-                    else {
-                        const diff =
-                            (new Date(due) - new Date(today)) / (1000 * 60 * 60 * 24);
-                        if (diff > 0 && diff <= 7) dueWeek++;
-                    }
-                }
-            });
-
-            document.querySelector("#cardPending h2").textContent = pending;
-            document.querySelector("#cardCompleted h2").textContent = completed;
-
-            document.querySelector("#cardOverdue h2").textContent = overdue;
-            document.querySelector("#cardToday h2").textContent = dueToday;
-            document.querySelector("#cardWeek h2").textContent = dueWeek;
+        .then(summary => {
+            document.querySelector("#cardTasks h2").textContent = summary.total;
+            document.querySelector("#cardPending h2").textContent = summary.pending;
+            document.querySelector("#cardCompleted h2").textContent = summary.completed;
+
+            document.querySelector("#cardOverdue h2").textContent = summary.overdue;
+            document.querySelector("#cardToday h2").textContent = summary.due_today;
+            document.querySelector("#cardWeek h2").textContent = summary.due_week;
         });
 }
 
@@ -171,14 +198,14 @@ function attachDashboardCardHandlers() {
 }
 
 
-function loadAdminApprovals() {
-    fetch(`/admin/approvals?status=${currentApprovalStatus}`)
-        .then(res => res.json())
-        .then(rows => {
+function loadAdminApprovals(cursor = null) {
+    fetchPage(`/admin/approvals?status=${currentApprovalStatus}`, cursor)
+        .then(({ items: rows, next }) => {
             const tbody = document.getElementById("adminApprovalBody");
-            tbody.innerHTML = "";
+            if (!cursor) tbody.innerHTML = "";
+            renderLoadMore(tbody, next, loadAdminApprovals);
 
-            if (!rows.length) {
+            if (!rows.length && !cursor) {
                 tbody.innerHTML = `
                     <tr>
                         <td colspan="5" style="text-align:center;">
@@ -262,7 +289,13 @@ function renderReimbursementApproval(r) {
             </div>
 
             ${p.bill_file
-            ? `<a href="/uploads/${p.bill_file}"
+            ? `<a href="/uploads/${p.bill_file}" target="_blank">
+                     <img class="bill-thumb"
+                          src="/uploads/${p.bill_file}/thumb"
+                          loading="lazy" alt=""
+                          onerror="this.remove()">
+                   </a>
+                   <a href="/uploads/${p.bill_file}"
                      target="_blank"
                      class="view-bill-btn">
                      View Bill
@@ -605,7 +638,7 @@ document.getElementById("uploadBtnSpecific").onclick = () => {
 };
 
 function loadFileShareEmployees() {
-    fetch("/admin/employees")
+    bootFetch("/admin/employees")
         .then(res => res.json())
         .then(data => {
             const dropdown = document.getElementById("shareFileEmployee");
@@ -626,7 +659,7 @@ function loadFileShareEmployees() {
 
 
 // ==================== LOAD EMPLOYEES (FOR ASSIGNMENT) =======================
-fetch("/admin/employees")
+bootFetch("/admin/employees")
     .then(res => res.json())
     .then(data => {
         const dropdown = document.getElementById("assignedTo");
@@ -644,13 +677,24 @@ let allTasks = []; // store global list
 
 
 // ============================= LOAD ADMIN TASKS =============================
-function loadAdminTasks() {
-    fetch("/admin/all-tasks")
-        .then(res => res.json())
-        .then(tasks => {
-            allTasks = tasks;
-            renderTasks(tasks);
-            loadEmployeesForFilter(tasks);
+function adminTasksUrl() {
+    const params = new URLSearchParams();
+    const status = document.getElementById("filterStatus").value;
+    const employee = document.getElementById("filterEmployee").value;
+
+    if (status) params.set("status", status);
+    if (employee) params.set("employee", employee);
+
+    const query = params.toString();
+    return query ? `/admin/all-tasks?${query}` : "/admin/all-tasks";
+}
+
+function loadAdminTasks(cursor = null) {
+    fetchPage(adminTasksUrl(), cursor)
+        .then(({ items, next }) => {
+            allTasks = cursor ? allTasks.concat(items) : items;
+            renderTasks(allTasks);
+            renderLoadMore(document.getElementById("adminTaskBody"), next, loadAdminTasks);
         });
 }
 
@@ -663,39 +707,36 @@ function resetTaskPills() {
 }
 
 // ============================ FILTERING SUPPORT =============================
-function loadEmployeesForFilter(tasks) {
-    const empSelect = document.getElementById("filterEmployee");
-    empSelect.innerHTML = ""; // clear previous options
-    const defaultOpt = document.createElement("option");
-    defaultOpt.value = "";
-    defaultOpt.textContent = "All Employees";
-    empSelect.appendChild(defaultOpt);
-
-    const names = [...new Set(tasks.map(t => t.employee_name).filter(Boolean))];
-
-    names.forEach(name => {
-        const option = document.createElement("option");
-        option.value = name;
-        option.textContent = name;
-        empSelect.appendChild(option);
-    });
+function loadEmployeesForFilter() {
+    bootFetch("/admin/employees")
+        .then(res => res.json())
+        .then(employees => {
+            const empSelect = document.getElementById("filterEmployee");
+            empSelect.innerHTML = ""; // clear previous options
+            const defaultOpt = document.createElement("option");
+            defaultOpt.value = "";
+            defaultOpt.textContent = "All Employees";
+            empSelect.appendChild(defaultOpt);
+
+            employees.forEach(emp => {
+                const option = document.createElement("option");
+                option.value = emp.id;
+                option.textContent = emp.name;
+                empSelect.appendChild(option);
+            });
+        });
 }
 
 // ------- Employees: Load / Render / Search -------
 function loadEmployees(query = "") {
-    fetch("/admin/employees")
+    const url = query ? `/admin/employees?q=${encodeURIComponent(query)}` : "/admin/employees";
+
+    fetch(url)
         .then(res => res.json())
-        .then(data => {
+        .then(list => {
             const tbody = document.querySelector("#employeesTable tbody");
             tbody.innerHTML = "";
 
-            // optional basic client-side search
-            const list = data.filter(emp => {
-                if (!query) return true;
-                const q = query.toLowerCase();
-                return (emp.name || "").toLowerCase().includes(q) || (emp.email || "").toLowerCase().includes(q);
-            });
-
             list.forEach(emp => {
                 const tr = document.createElement("tr");
                 tr.innerHTML = `
@@ -842,16 +883,9 @@ document.getElementById("empSearch").addEventListener("input", (e) => {
 document.getElementById("filterStatus").addEventListener("change", filterTasks);
 document.getElementById("filterEmployee").addEventListener("change", filterTasks);
 
+// Filtering happens server-side; reload the first page with the new filters
 function filterTasks() {
-    const status = document.getElementById("filterStatus").value;
-    const employee = document.getElementById("filterEmployee").value;
-
-    let filtered = allTasks;
-
-    if (status) filtered = filtered.filter(t => (t.status || "").toLowerCase() === status.toLowerCase());
-    if (employee) filtered = filtered.filter(t => (t.employee_name || "").toLowerCase() === employee.toLowerCase());
-
-    renderTasks(filtered);
+    loadAdminTasks();
 }
 
 
@@ -1008,12 +1042,12 @@ function loadActivityLog() {
 }
 
 
-function loadTasksPage() {
-    fetch("/admin/all-tasks")
-        .then(res => res.json())
-        .then(tasks => {
+function loadTasksPage(cursor = null) {
+    fetchPage("/admin/all-tasks", cursor)
+        .then(({ items: tasks, next }) => {
             const tbody = document.getElementById("tasksPageBody");
-            tbody.innerHTML = "";
+            if (!cursor) tbody.innerHTML = "";
+            renderLoadMore(tbody, next, loadTasksPage);
 
             tasks.forEach(task => {
                 let badgeClass =
@@ -1035,12 +1069,12 @@ function loadTasksPage() {
 
 let employeesMap = {};
 
-function loadFilesPage() {
-    fetch("/files")
-        .then(res => res.json())
-        .then(files => {
-            allFiles = files;
+function loadFilesPage(cursor = null) {
+    fetchPage("/files", cursor)
+        .then(({ items, next }) => {
+            allFiles = cursor ? allFiles.concat(items) : items;
             renderFiles("all");
+            renderLoadMore(document.getElementById("filesPageBody"), next, loadFilesPage);
         });
 }
 
@@ -1094,12 +1128,12 @@ function renderFiles(filter) {
     });
 }
 
-function loadAnnouncementsPage() {
-    fetch("/announcements")
-        .then(res => res.json())
-        .then(anns => {
+function loadAnnouncementsPage(cursor = null) {
+    fetchPage("/announcements", cursor)
+        .then(({ items: anns, next }) => {
             const ul = document.getElementById("annPageList");
-            ul.innerHTML = "";
+            if (!cursor) ul.innerHTML = "";
+            renderLoadMore(ul, next, loadAnnouncementsPage);
 
             anns.forEach(a => {
                 const li = document.createElement("li");
@@ -1109,60 +1143,22 @@ function loadAnnouncementsPage() {
         });
 }
 
-function calculateWorkingHours(checkIn, checkOut) {
-    if (!checkIn || !checkOut) return "-";
-
-    const [inH, inM] = checkIn.split(":").map(Number);
-    const [outH, outM] = checkOut.split(":").map(Number);
-
-    let start = inH * 60 + inM;
-    let end = outH * 60 + outM;
-
-    // safety: handle overnight edge case
-    if (end < start) end += 24 * 60;
-
-    const diff = end - start;
-    const hours = Math.floor(diff / 60);
-    const mins = diff % 60;
-
-    return `${hours}h ${mins}m`;
+function formatMinutes(minutes) {
+    if (!minutes) return "-";
+    return `${Math.floor(minutes / 60)}h ${minutes % 60}m`;
 }
 
-function toMinutes(checkIn, checkOut) {
-    if (!checkIn || !checkOut) return 0;
-
-    const [inH, inM] = checkIn.split(":").map(Number);
-    const [outH, outM] = checkOut.split(":").map(Number);
+let attendanceRows = [];
 
-    let start = inH * 60 + inM;
-    let end = outH * 60 + outM;
-
-    if (end < start) end += 1440;
-    return end - start;
-}
-
-function getWeekKey(dateStr) {
-    const d = new Date(dateStr);
-    const firstDay = new Date(d.setDate(d.getDate() - d.getDay()));
-    return firstDay.toISOString().split("T")[0]; // week start
-}
+function loadAttendance(cursor = null) {
+    fetchPage("/admin/attendance", cursor)
+        .then(({ items, next }) => {
+            attendanceRows = cursor ? attendanceRows.concat(items) : items;
+            const rows = attendanceRows;
 
-function calculateOvertime(checkIn, checkOut) {
-    const worked = toMinutes(checkIn, checkOut);
-    const normal = 8 * 60;
-
-    if (worked <= normal) return "-";
-
-    const extra = worked - normal;
-    return `${Math.floor(extra / 60)}h ${extra % 60}m`;
-}
-
-function loadAttendance() {
-    fetch("/admin/attendance")
-        .then(res => res.json())
-        .then(rows => {
             const tbody = document.getElementById("attendanceBody");
             tbody.innerHTML = "";
+            renderLoadMore(tbody, next, loadAttendance);
 
             if (!rows.length) {
                 tbody.innerHTML = `
@@ -1174,135 +1170,66 @@ function loadAttendance() {
                 return;
             }
 
-            // ---- Weekly totals ----
-            const weeklyTotals = {};
-
-            rows.forEach(r => {
-                const key = `${r.employee}_${getWeekKey(r.date)}`;
-                weeklyTotals[key] =
-                    (weeklyTotals[key] || 0) +
-                    toMinutes(r.check_in_time, r.check_out_time);
-            });
-
-            // ---- Render rows ----
-            rows.forEach((r, index) => {
-                const tr = document.createElement("tr");
-                const srNo = index + 1;
-
-                const totalHours = calculateWorkingHours(
-                    r.check_in_time,
-                    r.check_out_time
-                );
-
-                const weekKey = `${r.employee}_${getWeekKey(r.date)}`;
-                const weeklyMinutes = weeklyTotals[weekKey] || 0;
-
-                const weeklyHours =
-                    Math.floor(weeklyMinutes / 60) +
-                    "h " +
-                    (weeklyMinutes % 60) +
-                    "m";
-
-                const overtime = calculateOvertime(
-                    r.check_in_time,
-                    r.check_out_time
-                );
-
-                tr.innerHTML = `
-                    <td>${srNo}</td>
-                    <td>${r.employee}</td>
-                    <td>${r.date}</td>
-                    <td>${r.check_in_time || "-"}</td>
-                    <td>${r.check_out_time || "-"}</td>
-                    <td>${totalHours}</td>
-                    <td>${weeklyHours}</td>
-                    <td>${overtime}</td>
-                    <td>${r.day_type || "-"}</td>
-                    <td>${r.late_comment || "-"}</td>
-                    <td>
-    ${r.regularised === 1
-                        ? `<span class="status-pill approved">Yes</span>
-           <button class="audit-btn"
-               data-emp="${r.user_id}"
-               data-date="${r.date}">
-               View
-           </button>`
-                        : 'No'
-                    }
-</td>
-                `;
+            // ---- Weekly totals (server-side summary for the loaded weeks) ----
+            const weeks = rows.map(r => r.week_start).sort();
+            const summaryUrl =
+                `/admin/attendance/summary?period=week` +
+                `&from=${weeks[0]}&to=${weeks[weeks.length - 1]}`;
 
-                tbody.appendChild(tr);
-            });
+            return fetch(summaryUrl)
+                .then(res => res.json())
+                .then(summary => {
+                    const weeklyTotals = {};
+                    summary.forEach(s => {
+                        weeklyTotals[`${s.user_id}_${s.period_start}`] = s.worked_minutes;
+                    });
+                    renderAttendanceRows(tbody, rows, weeklyTotals);
+                });
         })
         .catch(err => {
             console.error("Attendance load failed", err);
         });
 }
 
-
-function downloadAttendanceCSV(rows) {
-    let csv =
-        "Sr,Employee,Date,Check In,Check Out,Total Hours,Weekly Total,Overtime,Day Type,Late Reason\n";
-
-    // ---- Recalculate weekly totals (same logic as table) ----
-    const weeklyTotals = {};
-
+function renderAttendanceRows(tbody, rows, weeklyTotals) {
     rows.forEach((r, index) => {
         const tr = document.createElement("tr");
-
         const srNo = index + 1;
 
-        tr.innerHTML = `
-        <td>${srNo}</td>
-        <td>${r.name}</td>
-        <td>${r.date}</td>
-        <td>${r.check_in_time || "-"}</td>
-        <td>${r.check_out_time || "-"}</td>
-        <td>${totalHours}</td>
-        <td>${weeklyHours}</td>
-        <td>${overtime}</td>
-        <td>${r.day_type || "-"}</td>
-        <td>${r.late_comment || "-"}</td>
-    `;
-    });
-
-    // ---- Build CSV rows ----
-    rows.forEach((r, index) => {
-        const srNo = index + 1;
-
-        const total = calculateWorkingHours(
-            r.check_in_time,
-            r.check_out_time
-        );
-
-        const overtime = calculateOvertime(
-            r.check_in_time,
-            r.check_out_time
+        const totalHours = r.check_out_time
+            ? formatMinutes(r.worked_minutes) || "0h 0m"
+            : "-";
+        const weeklyHours = formatMinutes(
+            weeklyTotals[`${r.user_id}_${r.week_start}`] || 0
         );
+        const overtime = formatMinutes(r.overtime_minutes);
 
-        const weeklyMinutes =
-            weeklyTotals[`${r.name}_${getWeekKey(r.date)}`] || 0;
-
-        const weekly =
-            Math.floor(weeklyMinutes / 60) +
-            "h " +
-            (weeklyMinutes % 60) +
-            "m";
+        tr.innerHTML = `
+            <td>${srNo}</td>
+            <td>${r.employee}</td>
+            <td>${r.date}</td>
+            <td>${r.check_in_time || "-"}</td>
+            <td>${r.check_out_time || "-"}</td>
+            <td>${totalHours}</td>
+            <td>${weeklyHours}</td>
+            <td>${overtime}</td>
+            <td>${r.day_type || "-"}</td>
+            <td>${r.late_comment || "-"}</td>
+            <td>
+    ${r.regularised === 1
+                ? `<span class="status-pill approved">Yes</span>
+   <button class="audit-btn"
+       data-emp="${r.user_id}"
+       data-date="${r.date}">
+       View
+   </button>`
+                : 'No'
+            }
+</td>
+        `;
 
-        csv += `${srNo},${r.name},${r.date},${r.check_in_time || ""},${r.check_out_time || ""},${total},${weekly},${overtime},${r.day_type || ""},${r.late_comment || ""}\n`;
+        tbody.appendChild(tr);
     });
-
-    // ---- Trigger download ----
-    const blob = new Blob([csv], { type: "text/csv" });
-    const url = URL.createObjectURL(blob);
-
-    const a = document.createElement("a");
-    a.href = url;
-    a.download = "attendance_report.csv";
-    a.click();
-
-    URL.revokeObjectURL(url);
 }
 
 document.getElementById("clearActivityBtn").onclick = () => {
@@ -1380,7 +1307,7 @@ document.getElementById("closeAuditModal").onclick = () => {
 };
 
 function loadAdminActivity() {
-    fetch("/admin/activity")
+    bootFetch("/admin/activity")
         .then(res => res.json())
         .then(logs => {
             const ul = document.getElementById("adminActivityList");
@@ -1410,6 +1337,7 @@ showPage("dashboard");
 setActiveTab("navDashboard");
 attachDashboardCardHandlers();
 loadAdminTasks();
+loadEmployeesForFilter();
 loadDashboardStats();
 loadAdminActivity();
 loadFileShareEmployees();
\ No newline at end of file
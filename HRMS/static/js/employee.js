@@ -14,6 +14,142 @@ const pages = {
     remuneration: document.getElementById("empPageRemuneration")
 };
 
+// ======================= PAGINATED LIST HELPER ============================
+// List endpoints are paginated. Per-employee views need the full (small)
+// set, so follow X-Next-Cursor until the last page. Resolves to
+// { items, first } where `first` is the first page's response body.
+function fetchAllPages(url, pick = body => body) {
+    const items = [];
+    let first = null;
+
+    const step = cursor => {
+        const sep = url.includes("?") ? "&" : "?";
+        const pageUrl = cursor ? `${url}${sep}cursor=${encodeURIComponent(cursor)}` : url;
+
+        return bootFetch(pageUrl).then(res =>
+            res.json().then(body => {
+                if (first === null) first = body;
+                items.push(...pick(body));
+
+                const next = res.headers.get("X-Next-Cursor");
+                return next ? step(next) : { items, first };
+            })
+        );
+    };
+
+    return step(null);
+}
+
+// ========================= DASHBOARD BOOTSTRAP ============================
+// The first-paint reads arrive together from /employee/bootstrap in one round
+// trip. bootFetch(url) answers a GET from it once per section, while the
+// page has only just loaded; any other call is a plain fetch, so reloads
+// after a change always see fresh data.
+const BOOTSTRAP_TTL_MS = 10000;
+const bootstrapStarted = Date.now();
+const bootstrapSections = fetch("/employee/bootstrap")
+    .then(res => res.ok ? res.json() : {})
+    .catch(() => ({}));
+
+function bootFetch(url) {
+    if (Date.now() - bootstrapStarted > BOOTSTRAP_TTL_MS) return fetch(url);
+
+    return bootstrapSections.then(sections => {
+        const name = Object.keys(sections).find(key => sections[key].url === url);
+        const section = name && sections[name];
+        if (!section || section.status !== 200 || Date.now() - bootstrapStarted > BOOTSTRAP_TTL_MS) {
+            return fetch(url);
+        }
+        delete sections[name];
+        return new Response(JSON.stringify(section.data), {
+            status: section.status,
+            headers: { "Content-Type": "application/json", ...section.headers }
+        });
+    });
+}
+
+// ============================== DELTA SYNC ================================
+// Lists that every refresh reloads (tasks, attendance, approvals) are
+// downloaded in full once. Loading one again asks /sync for the rows that
+// changed since then and patches the copy kept here, so a refresh moves a
+// few hundred bytes instead of the whole list.
+const syncedLists = {};     // kind -> Promise<{ seq, rows: Map(id -> row) }>
+
+// The bootstrap's seq predates every list it carries, so it is safe for
+// whichever lists are still served from it
+const bootstrapSeq = bootFetch("/sync").then(res => res.json()).then(body => body.seq);
+
+function fullSync(kind, load) {
+    // Take the seq before reading the list, so nothing falls in between
+    const start = Date.now() - bootstrapStarted > BOOTSTRAP_TTL_MS
+        ? fetch("/sync").then(res => res.json()).then(body => body.seq)
+        : bootstrapSeq;
+
+    return start.then(seq => load().then(rows => ({
+        seq,
+        rows: new Map(rows.map(row => [row.id, row]))
+    })));
+}
+
+function applyChanges(state, delta) {
+    delta.deleted.forEach(id => state.rows.delete(id));
+
+    // Updated rows keep their place; new ones go first (lists are newest first)
+    const added = new Map();
+    delta.upserted.forEach(row => {
+        if (state.rows.has(row.id)) state.rows.set(row.id, row);
+        else added.set(row.id, row);
+    });
+    if (added.size) state.rows = new Map([...added, ...state.rows]);
+}
+
+function pullChanges(kind, load, state) {
+    return fetch(`/sync?since=${state.seq}&types=${kind}`)
+        .then(res => res.json())
+        .then(body => {
+            if (body.reset) return fullSync(kind, load);
+
+            applyChanges(state, body.changes[kind] || { upserted: [], deleted: [] });
+            state.seq = body.seq;
+            return body.more ? pullChanges(kind, load, state) : state;
+        });
+}
+
+function syncedList(kind, load) {
+    const previous = syncedLists[kind];
+    const next = previous
+        ? previous.then(state => pullChanges(kind, load, state))
+        : fullSync(kind, load);
+
+    // Start over with a full load next time if this one failed
+    syncedLists[kind] = next;
+    next.catch(() => {
+        if (syncedLists[kind] === next) delete syncedLists[kind];
+    });
+    return next.then(state => [...state.rows.values()]);
+}
+
+const fetchAllTasks = () =>
+    fetchAllPages("/employee/tasks?limit=500").then(({ items }) => items);
+
+const fetchAllAttendance = () =>
+    fetchAllPages("/employee/attendance?limit=500", body => body.records).then(({ items }) => items);
+
+const fetchAllApprovals = () =>
+    bootFetch("/employee/approvals").then(res => res.json());
+
+// Same counters /employee/attendance returns, from the synced records
+function attendanceSummary(records) {
+    const present = records.filter(r => r.status === "Present").length;
+    return {
+        present,
+        absent: records.length - present,
+        late: records.filter(r => r.status === "Present" && r.day_type === "HALF").length,
+        total: records.length,
+        records
+    };
+}
+
 function initLeaveData() {
     return loadApprovedLeaves();
 }
@@ -111,7 +247,7 @@ function parseDBDate(dt) {
 
 // ================= RENDER NOTIFICATIONS =================
 function renderNotifications(typeFilter = "all") {
-    fetch("/employee/notifications")
+    bootFetch("/employee/notifications")
         .then(res => res.json())
         .then(list => {
             list.sort((a, b) => {
@@ -278,15 +414,7 @@ function capitalize(str) {
 }
 
 // ================= NOTIFICATION UNREAD CHECK =================
-fetch("/employee/notifications")
-    .then(res => res.json())
-    .then(list => {
-        const unread = list.some(n => n.is_read === 0);
-        if (unread) {
-            notifBadge.style.display = "block";
-        }
-    })
-    .catch(() => { });
+// The unread badge comes from the /events snapshot (see connectEvents).
 
 // ================= NOTIFICATION DRAWER =================
 bell.onclick = () => {
@@ -392,7 +520,7 @@ document.getElementById("submitLeave").onclick = () => {
 
 
 function loadApprovalAdminsForRegularisation() {
-    fetch("/employee/admins")
+    bootFetch("/employee/admins")
         .then(res => res.json())
         .then(admins => {
             const select = document.getElementById("regAdmin");
@@ -409,7 +537,7 @@ function loadApprovalAdminsForRegularisation() {
 
 // ================= LOAD LEAVE APPROVALS =================
 function loadLeaveApprovals() {
-    fetch("/employee/approvals?type=leave")
+    bootFetch("/employee/approvals?type=leave")
         .then(res => res.json())
         .then(rows => {
             const tbody = document.getElementById("leaveTableBody");
@@ -470,7 +598,7 @@ function loadLeaveApprovals() {
 
 // ================= LOAD ADMINS FOR APPROVAL =================
 function loadApprovalAdmins() {
-    fetch("/employee/admins")
+    bootFetch("/employee/admins")
         .then(res => res.json())
         .then(admins => {
             const select = document.getElementById("leaveAdmin");
@@ -560,8 +688,7 @@ function submitRemuneration() {
 
 
 function loadAllApprovals() {
-    fetch("/employee/approvals")
-        .then(res => res.json())
+    syncedList("approvals", fetchAllApprovals)
         .then(rows => {
             allApprovalsCache = rows;
             renderAllApprovals();
@@ -1050,7 +1177,7 @@ function sendAttendance(lat, lng, lateComment) {
 
                 attendanceStatus.innerHTML = `
                 ✅ Checked in successfully<br>
-                📍 ${data.distance}m from office
+                📍 ${data.distance}m from ${data.office || "office"}
             `
                 loadAttendanceForCalendar(); // 🔄 update calendar instantly
 
@@ -1065,7 +1192,9 @@ function sendAttendance(lat, lng, lateComment) {
                 checkOutBtn.style.display = "inline-block";
             }
             else if (data.status === "Outside") {
-                attMsg.textContent = `❌ Outside office (${data.distance}m away)`;
+                attMsg.textContent = data.distance === null
+                    ? "❌ No office locations configured"
+                    : `❌ Outside office (${data.distance}m away)`;
                 attMsg.className = "attendance-msg error";
             }
             else if (data.status === "time_blocked") {
@@ -1088,7 +1217,7 @@ function sendAttendance(lat, lng, lateComment) {
 }
 
 function loadApprovalAdminsForReimbursement() {
-    fetch("/employee/admins")
+    bootFetch("/employee/admins")
         .then(res => res.json())
         .then(admins => {
             const select = document.getElementById("reimbAdmin");
@@ -1129,7 +1258,7 @@ checkOutBtn.onclick = () => {
 };
 
 function loadTodayAttendance() {
-    fetch("/employee/today-attendance")
+    bootFetch("/employee/today-attendance")
         .then(res => res.json())
         .then(data => {
             // reset UI
@@ -1162,9 +1291,10 @@ function loadTodayAttendance() {
 
 
 function loadAttendance() {
-    fetch("/employee/attendance")
-        .then(res => res.json())
-        .then(data => {
+    syncedList("attendance", fetchAllAttendance)
+        .then(records => {
+            const data = attendanceSummary(records);
+
             // Summary
             document.getElementById("attPresent").textContent = data.present;
             document.getElementById("attAbsent").textContent = data.absent;
@@ -1226,46 +1356,76 @@ function showToast(message) {
     }, 2000);
 }
 
-function checkNotifications() {
-    fetch("/employee/has-new")
-        .then(res => res.json())
-        .then(data => {
+function applySectionFlags(data) {
+    if (data.announcements) {
+        document.getElementById("annDot")?.style.setProperty("display", "inline-block");
+    }
 
-            if (data.announcements) {
-                document.getElementById("annDot")?.style.setProperty("display", "inline-block");
-            }
+    if (data.files) {
+        document.getElementById("fileDot")?.style.setProperty("display", "inline-block");
+    }
 
-            if (data.files) {
-                document.getElementById("fileDot")?.style.setProperty("display", "inline-block");
-            }
+    if (data.tasks) {
+        document.getElementById("taskBadge")?.style.setProperty("display", "inline-block");
+    }
 
-            if (data.tasks) {
-                document.getElementById("taskBadge")?.style.setProperty("display", "inline-block");
-            }
+    if (data.approvals) {
+        // parent approvals dot
+        document
+            .querySelector("#empNavApprovals .nav-dot")
+            ?.style.setProperty("display", "inline-block");
 
-            if (data.approvals) {
-                // parent approvals dot
-                document
-                    .querySelector("#empNavApprovals .nav-dot")
-                    ?.style.setProperty("display", "inline-block");
+        // all approvals submenu dot
+        document
+            .getElementById("allApprovalsDot")
+            ?.style.setProperty("display", "inline-block");
+    }
 
-                // all approvals submenu dot
-                document
-                    .getElementById("allApprovalsDot")
-                    ?.style.setProperty("display", "inline-block");
-            }
+    if (data.notifications) {
+        document.getElementById("notifBadge").style.display = "block";
+    }
+}
 
-            if (data.notifications) {
-                document.getElementById("notifBadge").style.display = "block";
-            }
+function checkNotifications() {
+    bootFetch("/employee/has-new")
+        .then(res => res.json())
+        .then(applySectionFlags);
+}
 
-        });
+// ================= LIVE UPDATES (SSE) =================
+// The server pushes a snapshot on connect and small deltas afterwards, so
+// the dashboard does not poll. Browsers without EventSource fall back to
+// checking once a minute.
+function connectEvents() {
+    if (!window.EventSource) {
+        checkNotifications();
+        setInterval(checkNotifications, 60000);
+        return;
+    }
+
+    const source = new EventSource("/events");
+
+    source.addEventListener("snapshot", e => {
+        const data = JSON.parse(e.data);
+        applySectionFlags({ ...(data.sections || {}), notifications: data.unread > 0 });
+    });
+
+    source.addEventListener("notification", e => {
+        const data = JSON.parse(e.data);
+        applySectionFlags({ ...data.sections, notifications: data.unread_delta > 0 });
+        if (data.notification?.title) {
+            showToast(data.notification.title);
+        }
+    });
+
+    source.addEventListener("sections", e => {
+        applySectionFlags(JSON.parse(e.data).sections);
+    });
 }
 
 // ====================== DASHBOARD STATS ======================
 function loadDashboardStats() {
-    fetch("/employee/tasks")
-        .then(res => res.json())
+    syncedList("tasks", fetchAllTasks)
         .then(tasks => {
             document.getElementById("cardTotal").textContent = tasks.length;
             document.getElementById("cardPending").textContent =
@@ -1338,7 +1498,7 @@ function loadDashboardStats() {
 }
 
 function loadRecentUpdates() {
-    fetch("/employee/recent-activity")
+    bootFetch("/employee/recent-activity")
         .then(res => res.json())
         .then(logs => {
             const ul = document.getElementById("recentUpdates");
@@ -1370,8 +1530,7 @@ function loadRecentUpdates() {
 
 // ====================== TASKS ======================
 function loadTasks() {
-    fetch("/employee/tasks")
-        .then(res => res.json())
+    syncedList("tasks", fetchAllTasks)
         .then(tasks => {
 
             // 🔒 HARD ORDER GUARANTEE (newest first, stable)
@@ -1457,7 +1616,7 @@ function loadTasks() {
 }
 
 function loadTopPerformers() {
-    fetch("/employee/top-performers")
+    bootFetch("/employee/top-performers")
         .then(res => res.json())
         .then(list => {
             const ul = document.getElementById("topPerformers");
@@ -1654,7 +1813,7 @@ function loadPriorityTasks(tasks) {
 function loadProfile() {
     showLoader();
 
-    fetch("/employee/profile")
+    bootFetch("/employee/profile")
         .then(res => res.json())
         .then(user => {
             const initials = user.name
@@ -1743,9 +1902,9 @@ function isTodayOnLeave() {
     return !!leaveMap[getTodayKey()];
 }
 function loadAttendanceForCalendar() {
-    fetch("/employee/attendance")
-        .then(res => res.json())
-        .then(data => {
+    syncedList("attendance", fetchAllAttendance)
+        .then(records => {
+            const data = attendanceSummary(records);
 
             attendanceMap = {}; // reset
             attendanceRecords = data.records;
@@ -1933,7 +2092,7 @@ function calculateTotalHours(checkIn, checkOut) {
 
 
 function loadApprovedLeaves() {
-    return fetch("/employee/approvals?type=leave")
+    return bootFetch("/employee/approvals?type=leave")
         .then(res => res.json())
         .then(rows => {
             leaveMap = {};
@@ -1991,6 +2150,12 @@ function loadReimbursements() {
                         </span>
                     </td>
                     <td>
+                        <a href="/uploads/${p.bill_file}" target="_blank">
+                            <img class="bill-thumb"
+                                 src="/uploads/${p.bill_file}/thumb"
+                                 loading="lazy" alt=""
+                                 onerror="this.remove()">
+                        </a>
                         <a class="download-btn"
                            href="/uploads/${p.bill_file}"
                            target="_blank">
@@ -2005,7 +2170,7 @@ function loadReimbursements() {
 
 
 function loadApprovalAdminsForRemuneration() {
-    fetch("/employee/admins")
+    bootFetch("/employee/admins")
         .then(res => res.json())
         .then(admins => {
             const select = document.getElementById("remAdmin");
@@ -2021,9 +2186,8 @@ function loadApprovalAdminsForRemuneration() {
 }
 
 function loadRemunerations() {
-    fetch("/employee/remuneration")
-        .then(res => res.json())
-        .then(rows => {
+    fetchAllPages("/employee/remuneration")
+        .then(({ items: rows }) => {
             const tbody = document.getElementById("remTableBody");
             tbody.innerHTML = "";
 
@@ -2166,7 +2330,7 @@ document.addEventListener("DOMContentLoaded", () => {
     loadDashboardStats();
     loadTodayAttendance();
     loadProfile();
-    checkNotifications();
+    connectEvents();
     initLeaveData();
 
     setTimeout(() => {
@@ -0,0 +1,171 @@
+# ============================ THUMBNAIL PIPELINE ==========================
+"""
+Background thumbnail / preview generation for uploads.
+
+Uploads are handed to a small worker pool right after they are stored. Each
+source is rendered once per content key (the upload's ETag, i.e. its SHA-256
+for blob-store files) into every size in SIZES:
+
+    images  ->  WebP (JPEG when Pillow lacks WebP support)
+    PDFs    ->  first page as PNG, when poppler's `pdftoppm` is installed
+
+Outputs are sharded like the blob store:  <root>/<aa>/<bb>/<key>.<size>.<ext>
+Anything that cannot be rendered simply has no thumbnail.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+    print("⚠️ Pillow not installed: image thumbnails disabled")
+
+# Longest edge in pixels
+SIZES = {
+    "thumb": 256,
+    "preview": 1024
+}
+
+MIMETYPES = {
+    "webp": "image/webp",
+    "jpg": "image/jpeg",
+    "png": "image/png"
+}
+
+PDF_RENDERER = shutil.which("pdftoppm")
+
+
+def sniff(path):
+    """
+    'pdf', 'image' or None, from the file's first bytes.
+    """
+    with open(path, "rb") as f:
+        head = f.read(16)
+
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if (
+        head.startswith(b"\xff\xd8\xff")                    # JPEG
+        or head.startswith(b"\x89PNG")
+        or head.startswith(b"GIF8")
+        or (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+        or head[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1")
+    ):
+        return "image"
+    return None
+
+
+class ThumbnailPool:
+    """
+    Renders thumbnails on `workers` background threads. submit() is
+    idempotent per key while a job is in flight.
+    """
+
+    def __init__(self, root, workers=2, quality=80):
+        self.root = root
+        self.quality = quality
+        self.image_format = "webp" if Image and features.check("webp") else "jpg"
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key, size, ext):
+        return os.path.join(self.root, key[:2], key[2:4], f"{key}.{size}.{ext}")
+
+    def find(self, key, size):
+        """
+        (path, mimetype) of an existing thumbnail, or None.
+        """
+        for ext, mimetype in MIMETYPES.items():
+            path = self._path(key, size, ext)
+            if os.path.exists(path):
+                return path, mimetype
+        return None
+
+    def submit(self, src_path, key):
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._executor.submit(self._run, src_path, key)
+                self._pending[key] = future
+            return future
+
+    def _run(self, src_path, key):
+        try:
+            return self.generate(src_path, key)
+        except Exception as e:
+            print("⚠️ Thumbnail generation failed:", key, e)
+            return False
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    # ------------------------------ rendering ------------------------------
+    def generate(self, src_path, key):
+        """
+        Render every size for `src_path`. Returns True when thumbnails exist
+        afterwards.
+        """
+        if all(self.find(key, size) for size in SIZES):
+            return True
+
+        kind = sniff(src_path)
+        if kind == "image" and Image is not None:
+            self._render_image(src_path, key)
+        elif kind == "pdf" and PDF_RENDERER:
+            self._render_pdf(src_path, key)
+        else:
+            return False
+        return True
+
+    def _publish(self, key, size, ext, write):
+        """
+        Write via a temp file in the target directory so readers never see
+        a half-written thumbnail.
+        """
+        final_path = self._path(key, size, ext)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(final_path), suffix=f".{ext}")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, final_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _render_image(self, src_path, key):
+        ext = self.image_format
+
+        with Image.open(src_path) as img:
+            img.draft("RGB", (SIZES["preview"], SIZES["preview"]))   # fast JPEG downscale on decode
+            img = ImageOps.exif_transpose(img)
+            if ext == "jpg" or img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGB")
+
+            # Largest first, so each smaller size is resampled from the previous one
+            for size, edge in sorted(SIZES.items(), key=lambda item: -item[1]):
+                img.thumbnail((edge, edge))
+                self._publish(key, size, ext, lambda path: img.save(
+                    path,
+                    "WEBP" if ext == "webp" else "JPEG",
+                    quality=self.quality,
+                    **({"method": 4} if ext == "webp" else {"optimize": True})
+                ))
+
+    def _render_pdf(self, src_path, key):
+        for size, edge in SIZES.items():
+            def render(path, edge=edge):
+                prefix = path[:-len(".png")]
+                subprocess.run(
+                    [PDF_RENDERER, "-png", "-f", "1", "-l", "1",
+                     "-scale-to", str(edge), "-singlefile", src_path, prefix],
+                    check=True, timeout=60,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+            self._publish(key, size, "png", render)